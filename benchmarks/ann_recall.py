@@ -0,0 +1,128 @@
+# benchmarks/ann_recall.py
+"""
+Recall@k and latency of the IVF index (rag.ann_index) against exact search
+in OpportunityVectorStore, on synthetic clustered vectors.
+
+    python -m benchmarks.ann_recall
+    python -m benchmarks.ann_recall --rows 300000 --dim 256 --n-probe 4 8 16 32
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from rag.ann_index import IVFIndex
+from rag.vector_store import OpportunityVectorStore
+
+from .vector_search import CAEN_CODES, TYPES
+
+
+def clustered_rows(rows: int, dim: int, clusters: int, spread: float, seed: int = 0) -> np.ndarray:
+    """Chunked documents are topical: overlapping gaussian blobs around random centres."""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dim), dtype="float32")
+    labels = rng.integers(0, clusters, rows)
+    return centres[labels] + spread * rng.standard_normal((rows, dim), dtype="float32")
+
+
+class QueryVectors:
+    """Embedder returning precomputed query vectors by name."""
+
+    def __init__(self, vectors: Dict[str, List[float]]):
+        self.vectors = vectors
+
+    def embed_text(self, text: str) -> List[float]:
+        return self.vectors[text]
+
+    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        return [self.vectors[t] for t in texts]
+
+
+def recall_at_k(store: OpportunityVectorStore, queries: np.ndarray, top_k: int, filters: List[Dict[str, Any]],
+                **kwargs) -> Dict[str, float]:
+    vectors = {f"q{i}": q.tolist() for i, q in enumerate(queries)}
+    store.embedder = QueryVectors(vectors)
+    names = list(vectors)
+    started = time.perf_counter()
+    exact = store.search_many(names, top_k, filters, exact=True)
+    exact_s = time.perf_counter() - started
+    started = time.perf_counter()
+    approx = store.search_many(names, top_k, filters, **kwargs)
+    approx_s = time.perf_counter() - started
+
+    hits = sum(
+        len({r["id"] for r in a} & {r["id"] for r in e})
+        for a, e in zip(approx, exact)
+    )
+    total = sum(len(e) for e in exact) or 1
+    return {
+        "recall": round(hits / total, 4),
+        "exact_ms_per_query": round(1000 * exact_s / len(names), 3),
+        "ann_ms_per_query": round(1000 * approx_s / len(names), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall@k of the IVF index vs. exact search.")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--clusters", type=int, default=500)
+    parser.add_argument("--spread", type=float, default=1.5, help="Noise around cluster centres.")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--n-lists", type=int, default=None)
+    parser.add_argument("--n-probe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    parser.add_argument("--output", help="Write results JSON to this file.")
+    args = parser.parse_args()
+
+    embeddings = clustered_rows(args.rows, args.dim, args.clusters, args.spread)
+    metadata = [
+        {
+            "id": f"chunk-{i}",
+            "type": TYPES[i % len(TYPES)],
+            "eligible_caen_codes": [CAEN_CODES[i % len(CAEN_CODES)]] if i % 4 else [],
+        }
+        for i in range(args.rows)
+    ]
+    store = OpportunityVectorStore.from_arrays(embeddings, metadata)
+
+    started = time.perf_counter()
+    store.ann = IVFIndex.build(store.unit_embeddings, args.n_lists)
+    build_s = time.perf_counter() - started
+
+    rng = np.random.default_rng(1)
+    queries = embeddings[rng.choice(args.rows, args.queries)] + args.spread * rng.standard_normal(
+        (args.queries, args.dim), dtype="float32"
+    )
+    filtered = [{"type": TYPES[i % len(TYPES)], "caen": CAEN_CODES[i % len(CAEN_CODES)]} for i in range(args.queries)]
+
+    results = []
+    for n_probe in args.n_probe:
+        for name, filters in (("unfiltered", None), ("filtered", filtered)):
+            results.append({
+                "n_probe": n_probe,
+                "filters": name,
+                **recall_at_k(store, queries, args.top_k, filters, n_probe=n_probe),
+            })
+
+    summary = {
+        "rows": args.rows,
+        "dim": args.dim,
+        "n_lists": store.ann.n_lists,
+        "build_s": round(build_s, 2),
+        "top_k": args.top_k,
+        "results": results,
+    }
+    text = json.dumps(summary, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+# benchmarks/coarse_rerank.py
+"""
+Memory, latency and recall@k of two-stage search (first pass on the leading
+dimensions, full-width rerank of a shortlist) against a full-width scan in
+OpportunityVectorStore, on a large synthetic catalogue.
+
+Rows are clustered like benchmarks.ann_recall, with the variance of each
+dimension decaying along the vector (--decay) the way it does in
+text-embedding-3 vectors, which are trained for truncation; --decay 0 gives
+isotropic rows, the worst case for truncation.
+
+    python -m benchmarks.coarse_rerank
+    python -m benchmarks.coarse_rerank --rows 200000 --dims 128 256 512 --decay 0
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from rag.ann_index import coarse_rows, rerank_shortlist
+from rag.vector_store import OpportunityVectorStore
+
+from .ann_recall import QueryVectors
+from .vector_search import CAEN_CODES, TYPES
+
+
+def decaying_rows(rows: int, dim: int, clusters: int, spread: float, decay: float, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    scale = ((1 + np.arange(dim, dtype="float32") / 64) ** -decay).astype("float32")
+    centres = rng.standard_normal((clusters, dim), dtype="float32")
+    labels = rng.integers(0, clusters, rows)
+    return (centres[labels] + spread * rng.standard_normal((rows, dim), dtype="float32")) * scale
+
+
+def timed(store: OpportunityVectorStore, names: List[str], top_k: int, filters, exact: bool):
+    started = time.perf_counter()
+    many = store.search_many(names, top_k, filters, exact=exact)
+    many_s = time.perf_counter() - started
+    started = time.perf_counter()
+    for i, name in enumerate(names):
+        f = (filters[i] if filters else None) or {}
+        store.search(name, top_k, filter_type=f.get("type"), filter_caen=f.get("caen"), exact=exact)
+    single_s = time.perf_counter() - started
+    return many, {
+        "search_ms_per_query": round(1000 * single_s / len(names), 3),
+        "search_many_ms_per_query": round(1000 * many_s / len(names), 3),
+    }
+
+
+def run(store: OpportunityVectorStore, queries: np.ndarray, top_k: int, dims: List[Optional[int]],
+        filters) -> List[Dict[str, Any]]:
+    vectors = {f"q{i}": q.tolist() for i, q in enumerate(queries)}
+    store.embedder = QueryVectors(vectors)
+    names = list(vectors)
+
+    store.coarse = None
+    exact, exact_times = timed(store, names, top_k, filters, exact=True)
+    results = [{
+        "dim": store.unit_embeddings.shape[1],
+        "first_pass_mb": round(store.unit_embeddings.nbytes / 2 ** 20, 1),
+        "recall": 1.0,
+        **exact_times,
+    }]
+    for dim in dims:
+        store.coarse = coarse_rows(store.unit_embeddings, dim)
+        approx, times = timed(store, names, top_k, filters, exact=False)
+        hits = sum(len({r["id"] for r in a} & {r["id"] for r in e}) for a, e in zip(approx, exact))
+        results.append({
+            "dim": dim,
+            "first_pass_mb": round(store.coarse.nbytes / 2 ** 20, 1),
+            "shortlist": rerank_shortlist(top_k),
+            "recall": round(hits / (sum(len(e) for e in exact) or 1), 4),
+            **times,
+        })
+    store.coarse = None
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Two-stage (coarse + rerank) vs. full-width vector search.")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--dims", type=int, nargs="+", default=[64, 128, 256, 512])
+    parser.add_argument("--clusters", type=int, default=500)
+    parser.add_argument("--spread", type=float, default=1.5)
+    parser.add_argument("--decay", type=float, default=0.5, help="Per-dimension variance decay (0 = isotropic).")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--output", help="Write results JSON to this file.")
+    args = parser.parse_args()
+
+    embeddings = decaying_rows(args.rows, args.dim, args.clusters, args.spread, args.decay)
+    metadata = [
+        {
+            "id": f"synthetic-{i}",
+            "type": TYPES[i % len(TYPES)],
+            "eligible_caen_codes": [CAEN_CODES[i % len(CAEN_CODES)]] if i % 4 else [],
+        }
+        for i in range(args.rows)
+    ]
+    store = OpportunityVectorStore.from_arrays(embeddings, metadata, embedder=QueryVectors({}))
+
+    rng = np.random.default_rng(1)
+    queries = embeddings[rng.choice(args.rows, args.queries)] + decaying_rows(
+        args.queries, args.dim, 1, args.spread, args.decay, seed=2
+    )
+    filtered = [{"type": TYPES[i % len(TYPES)], "caen": CAEN_CODES[i % len(CAEN_CODES)]} for i in range(args.queries)]
+
+    summary = {
+        "rows": args.rows,
+        "dim": args.dim,
+        "decay": args.decay,
+        "top_k": args.top_k,
+        "full_matrix_mb": round(store.unit_embeddings.nbytes / 2 ** 20, 1),
+        "unfiltered": run(store, queries, args.top_k, args.dims, None),
+        "filtered": run(store, queries, args.top_k, args.dims, filtered),
+    }
+    text = json.dumps(summary, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
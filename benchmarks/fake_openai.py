@@ -0,0 +1,267 @@
+# benchmarks/fake_openai.py
+"""
+Local stand-in for the OpenAI HTTP API: /v1/responses, /v1/chat/completions
+and /v1/embeddings with deterministic, schema-shaped answers, synthetic
+latency, optional 429s and a requests-per-minute limit of its own, so the
+LLM gateway (rag.llm_gateway) and the pipelines can be exercised without
+network or spend.
+
+    python -m benchmarks.fake_openai --port 8765 --latency-ms 300
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 python -m rag.run_match_opp --cif ...
+
+GET /stats returns the request, connection and 429 counters.
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+CHARS_PER_TOKEN = 4
+EMBEDDING_DIM = 1536
+
+
+def _seed(text: str) -> int:
+    return int(hashlib.sha1(text.encode("utf-8")).hexdigest()[:8], 16)
+
+
+def _tokens(value: Any) -> int:
+    return max(1, len(json.dumps(value, ensure_ascii=False)) // CHARS_PER_TOKEN)
+
+
+def instance_of(schema: Dict[str, Any], rng: random.Random) -> Any:
+    """A value matching a (strict) JSON schema; score/eligible stay consistent."""
+    kind = schema.get("type")
+    if kind == "object":
+        value = {key: instance_of(sub, rng) for key, sub in (schema.get("properties") or {}).items()}
+        if isinstance(value.get("score"), float) and "eligible" in value:
+            value["eligible"] = value["score"] >= 0.5
+        return value
+    if kind == "array":
+        return [instance_of(schema.get("items") or {"type": "string"}, rng) for _ in range(3)]
+    if kind == "number":
+        return round(rng.random(), 2)
+    if kind == "integer":
+        return rng.randint(0, 10)
+    if kind == "boolean":
+        return rng.random() >= 0.5
+    return f"Motiv sintetic {rng.randint(1, 99)}"
+
+
+def response_text(prompt: str, text_format: Optional[Dict[str, Any]]) -> str:
+    rng = random.Random(_seed(prompt))
+    if text_format and text_format.get("type") == "json_schema":
+        return json.dumps(instance_of(text_format.get("schema") or {}, rng), ensure_ascii=False)
+    if '"score"' in prompt:
+        return json.dumps({"score": round(rng.random(), 2)})
+    return "\n".join(f"- Motiv sintetic {i + 1}" for i in range(3))
+
+
+def chat_text(messages: List[Dict[str, Any]]) -> str:
+    prompt = json.dumps(messages, ensure_ascii=False)
+    if "ai_docs" in prompt:
+        return json.dumps({
+            "summary": "Rezumat sintetic.",
+            "ai_docs": [{"title": "Plan de afaceri", "content": "Draft sintetic."}],
+            "institutional_docs": [],
+            "questions_for_user": [],
+            "to_improve": [],
+            "extra_notes": "",
+        }, ensure_ascii=False)
+    # extraction prompts: nothing found
+    return json.dumps({"items": []})
+
+
+def embedding(text: str, dim: int) -> List[float]:
+    vec = np.random.default_rng(_seed(text)).standard_normal(dim)
+    return (vec / np.linalg.norm(vec)).round(6).tolist()
+
+
+class FakeOpenAIServer:
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency_ms: float = 200.0,
+        jitter_ms: float = 50.0,
+        fail_every: int = 0,
+        rpm: int = 0,
+    ):
+        """
+        fail_every: every n-th request gets a 429 (0 = never); rpm: answer
+        429 above this many requests in the last 60 s (0 = unlimited).
+        """
+        self.latency_s = latency_ms / 1000
+        self.jitter_s = jitter_ms / 1000
+        self.fail_every = fail_every
+        self.rpm = rpm
+        self.stats = {"requests": 0, "rate_limited": 0, "connections": 0, "max_in_flight": 0}
+        self._in_flight = 0
+        self._recent: deque = deque()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "FakeOpenAIServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeOpenAIServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _admit(self) -> bool:
+        with self._lock:
+            self.stats["requests"] += 1
+            now = time.monotonic()
+            while self._recent and now - self._recent[0] > 60:
+                self._recent.popleft()
+            limited = (self.fail_every and self.stats["requests"] % self.fail_every == 0) or (
+                self.rpm and len(self._recent) >= self.rpm
+            )
+            if limited:
+                self.stats["rate_limited"] += 1
+                return False
+            self._recent.append(now)
+            self._in_flight += 1
+            self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self._in_flight)
+            return True
+
+    def _answer(self, path: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        model = body.get("model", "")
+        if path.endswith("/embeddings"):
+            inputs = body.get("input")
+            inputs = [inputs] if isinstance(inputs, str) else inputs
+            dim = body.get("dimensions") or EMBEDDING_DIM
+            return {
+                "object": "list",
+                "model": model,
+                "data": [{"object": "embedding", "index": i, "embedding": embedding(t, dim)}
+                         for i, t in enumerate(inputs)],
+                "usage": {"prompt_tokens": _tokens(inputs), "total_tokens": _tokens(inputs)},
+            }
+        if path.endswith("/chat/completions"):
+            text = chat_text(body.get("messages") or [])
+            prompt_tokens, completion_tokens = _tokens(body.get("messages")), _tokens(text)
+            return {
+                "id": f"chatcmpl-fake-{_seed(text)}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": text}}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                          "total_tokens": prompt_tokens + completion_tokens},
+            }
+        prompt = body.get("input") if isinstance(body.get("input"), str) else json.dumps(body.get("input"))
+        text = response_text(prompt, (body.get("text") or {}).get("format"))
+        input_tokens, output_tokens = _tokens(prompt), _tokens(text)
+        return {
+            "id": f"resp-fake-{_seed(prompt)}",
+            "object": "response",
+            "created_at": int(time.time()),
+            "status": "completed",
+            "model": model,
+            "output": [{
+                "type": "message",
+                "id": f"msg-fake-{_seed(text)}",
+                "status": "completed",
+                "role": "assistant",
+                "content": [{"type": "output_text", "text": text, "annotations": []}],
+            }],
+            "parallel_tool_calls": True,
+            "tool_choice": "auto",
+            "tools": [],
+            "usage": {"input_tokens": input_tokens, "output_tokens": output_tokens,
+                      "total_tokens": input_tokens + output_tokens,
+                      "input_tokens_details": {"cached_tokens": 0},
+                      "output_tokens_details": {"reasoning_tokens": 0}},
+        }
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, so connection pooling shows
+
+            def setup(self):
+                super().setup()
+                with server._lock:
+                    server.stats["connections"] += 1
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                with server._lock:
+                    self._send(200, dict(server.stats))
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+                if not server._admit():
+                    self._send(429, {"error": {"message": "Rate limit reached (fake)", "type": "requests",
+                                               "code": "rate_limit_exceeded"}}, {"Retry-After": "1"})
+                    return
+                try:
+                    time.sleep(max(0.0, server.latency_s + random.uniform(-server.jitter_s, server.jitter_s)))
+                    self._send(200, server._answer(self.path, body))
+                finally:
+                    with server._lock:
+                        server._in_flight -= 1
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local fake OpenAI API server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--jitter-ms", type=float, default=50.0)
+    parser.add_argument("--fail-every", type=int, default=0, help="Every n-th request gets a 429.")
+    parser.add_argument("--rpm", type=int, default=0, help="Server-side requests-per-minute limit.")
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(args.host, args.port, args.latency_ms, args.jitter_ms, args.fail_every, args.rpm)
+    print(f"Fake OpenAI API on {server.base_url}")
+    server.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
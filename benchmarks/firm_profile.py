@@ -0,0 +1,65 @@
+# benchmarks/firm_profile.py
+"""
+Prompt tokens per match with the full firm record vs. the compact profile
+from rag.firm_profile (fake LLM, so nothing is billed).
+
+    python -m benchmarks.firm_profile
+    python -m benchmarks.firm_profile --cif 33945221 --limit 10
+"""
+from __future__ import annotations
+
+import argparse
+import json
+from types import SimpleNamespace
+
+from rag import recommendation
+from rag.catalogue import load_opportunities, with_raw_text
+from rag.firm_profile import build_firm_profile
+
+from .match_modes import FakeResponses, _tokens, run_mode, synthetic_firm, synthetic_opportunities
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark prompt size with full firm vs. firm profile.")
+    parser.add_argument("--cif", help="Firm from data/firms/<cif>.json (default: synthetic firm).")
+    parser.add_argument("--limit", type=int, default=20, help="Number of opportunities.")
+    parser.add_argument("--mode", choices=recommendation.MATCH_MODES, default=recommendation.DEFAULT_MATCH_MODE)
+    parser.add_argument("--output", help="Write results JSON to this file.")
+    args = parser.parse_args()
+
+    firm = recommendation.load_firm_by_cif(args.cif) if args.cif else synthetic_firm()
+    profile = build_firm_profile(firm)
+    catalogue = load_opportunities()
+    if catalogue:
+        opportunities = [with_raw_text(op) for op in catalogue[: args.limit]]
+    else:
+        opportunities = synthetic_opportunities(args.limit)
+
+    inner = SimpleNamespace(responses=FakeResponses())
+    before = run_mode(args.mode, firm, opportunities, inner)
+    after = run_mode(args.mode, profile, opportunities, inner)
+
+    summary = {
+        "mode": args.mode,
+        "firm_tokens": {
+            "full_record_indented": _tokens(json.dumps(firm, ensure_ascii=False, indent=2)),
+            "full_record": _tokens(recommendation.prompt_json(firm)),
+            "profile": _tokens(recommendation.prompt_json(profile)),
+        },
+        "input_tokens_per_pair": {
+            "full_record": before["input_tokens_per_pair"],
+            "profile": after["input_tokens_per_pair"],
+        },
+        "input_tokens_saved_ratio": 1 - after["input_tokens"] / max(before["input_tokens"], 1),
+        "profile": profile,
+    }
+
+    text = json.dumps(summary, indent=2, ensure_ascii=False)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
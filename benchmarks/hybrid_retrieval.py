@@ -0,0 +1,156 @@
+# benchmarks/hybrid_retrieval.py
+"""
+Latency and recall@k of RAGRetriever in lexical, vector and hybrid (RRF)
+mode on a synthetic fixture catalogue with known relevant results for three
+kinds of queries: call identifiers, CAEN codes and topics.
+
+The vector side uses the local embedding backend (rag.embeddings, no
+network) unless --live is given, in which case the fixture is embedded with
+the OpenAI embeddings API.
+
+    python -m benchmarks.hybrid_retrieval
+    python -m benchmarks.hybrid_retrieval --live --opportunities 200
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import time
+from typing import Any, Dict, List, Set, Tuple
+
+import numpy as np
+
+from rag.embeddings import LocalEmbeddings, OpenAIEmbeddings
+from rag.index_builder import build_metadata
+from rag.lexical_index import LexicalIndex
+from rag.retrieval import RAGRetriever, RETRIEVAL_MODES
+from rag.vector_store import OpportunityVectorStore
+
+TOPICS = {
+    "digital": (
+        "Digitalizarea IMM-urilor: achiziție de software, echipamente IT, comerț electronic și servicii cloud.",
+        "bani pentru transformare digitală și soluții software în firme mici",
+    ),
+    "energy": (
+        "Eficiență energetică și panouri fotovoltaice pentru consum propriu în întreprinderi.",
+        "sprijin pentru energie verde și reducerea consumului de energie",
+    ),
+    "agri": (
+        "Modernizarea exploatațiilor agricole, utilaje și procesarea produselor agroalimentare.",
+        "fonduri pentru fermieri și agricultură",
+    ),
+    "tourism": (
+        "Dezvoltarea structurilor de primire turistică și a serviciilor de alimentație în zone rurale.",
+        "finanțare pentru pensiuni și turism rural",
+    ),
+    "innovation": (
+        "Proiecte de cercetare-dezvoltare și inovare în parteneriat cu universități, transfer tehnologic.",
+        "granturi pentru cercetare și inovare tehnologică",
+    ),
+    "export": (
+        "Internaționalizare: participare la târguri externe, certificări și promovare pe piețe noi.",
+        "ajutor pentru export și extindere pe piețe externe",
+    ),
+}
+TOPIC_CAEN = {
+    "digital": ["6201", "6202", "6311"],
+    "energy": ["3511", "4321", "7112"],
+    "agri": ["0111", "0150", "1011"],
+    "tourism": ["5510", "5520", "5610"],
+    "innovation": ["7211", "7219", "7490"],
+    "export": ["4690", "4619", "7311"],
+}
+PROGRAMMES = ("PNRR-C9", "POCIDIF", "PR-NE", "AFIR-SM6", "POTJ", "HORIZON-EIC")
+TYPES = ("grant", "vc", "accelerator")
+
+
+def fixture_catalogue(n: int, seed: int = 0) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    topics = list(TOPICS)
+    catalogue = []
+    for i in range(n):
+        topic = topics[i % len(topics)]
+        code = f"{rng.choice(PROGRAMMES)}-{2024 + i % 3}-{i:04d}"
+        caen = rng.sample(TOPIC_CAEN[topic], 2)
+        catalogue.append({
+            "id": f"fixture-{i}",
+            "type": TYPES[i % len(TYPES)],
+            "title": f"Apel {code}: {TOPICS[topic][0].split(':')[0]}",
+            "summary": TOPICS[topic][0],
+            "eligibility_criteria": ["IMM înregistrat în România", f"Activitate în domeniile CAEN {', '.join(caen)}"],
+            "eligible_caen_codes": caen,
+            "raw_text": f"Cod apel {code}. {TOPICS[topic][0]} " * 3,
+            "topic": topic,
+            "call_code": code,
+        })
+    return catalogue
+
+
+def fixture_queries(catalogue: List[Dict[str, Any]], seed: int = 1) -> List[Tuple[str, str, Set[str]]]:
+    rng = random.Random(seed)
+    queries = []
+    for op in rng.sample(catalogue, min(30, len(catalogue))):
+        queries.append(("call_code", f"apelul {op['call_code']}", {op["id"]}))
+    for topic, codes in TOPIC_CAEN.items():
+        for code in codes:
+            relevant = {op["id"] for op in catalogue if code in op["eligible_caen_codes"]}
+            queries.append(("caen", f"finanțare pentru firme cu CAEN {code[:2]}.{code[2:]}", relevant))
+    for topic, (_, paraphrase) in TOPICS.items():
+        relevant = {op["id"] for op in catalogue if op["topic"] == topic}
+        queries.append(("topic", paraphrase, relevant))
+    return queries
+
+
+def build_retriever(catalogue: List[Dict[str, Any]], live: bool) -> RAGRetriever:
+    metadata = [build_metadata(op) for op in catalogue]
+    texts = [json.dumps(op, ensure_ascii=False) for op in catalogue]
+    embedder = OpenAIEmbeddings() if live else LocalEmbeddings().fit(texts)
+    embeddings = np.asarray(embedder.embed_texts(texts), dtype="float32")
+
+    # in-memory indices, the mode is passed per query
+    retriever = RAGRetriever("lexical")
+    retriever._store = OpportunityVectorStore.from_arrays(embeddings, metadata, embedder=embedder)
+    retriever._lexical = LexicalIndex.from_opportunities(catalogue, metadata)
+    return retriever
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lexical vs. vector vs. hybrid retrieval on a fixture catalogue.")
+    parser.add_argument("--opportunities", type=int, default=600)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--live", action="store_true", help="Real OpenAI embeddings (network, paid).")
+    parser.add_argument("--output", help="Write results JSON to this file.")
+    args = parser.parse_args()
+
+    catalogue = fixture_catalogue(args.opportunities)
+    queries = fixture_queries(catalogue)
+    retriever = build_retriever(catalogue, args.live)
+
+    results = []
+    for mode in RETRIEVAL_MODES:
+        by_kind: Dict[str, List[float]] = {}
+        latencies = []
+        for kind, query, relevant in queries:
+            started = time.perf_counter()
+            hits = retriever.retrieve_opportunities_for_query(query, top_k=args.top_k, mode=mode)
+            latencies.append(time.perf_counter() - started)
+            found = len({h["id"] for h in hits} & relevant)
+            by_kind.setdefault(kind, []).append(found / min(args.top_k, len(relevant)))
+        results.append({
+            "mode": mode,
+            "recall_at_k": {kind: round(sum(v) / len(v), 3) for kind, v in by_kind.items()},
+            "ms_per_query": round(1000 * sum(latencies) / len(latencies), 3),
+        })
+
+    summary = {"opportunities": len(catalogue), "queries": len(queries), "top_k": args.top_k,
+               "live_embeddings": args.live, "results": results}
+    text = json.dumps(summary, indent=2, ensure_ascii=False)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# benchmarks/llm_gateway.py
+"""
+Interactive latency and 429s under a concurrent batch load, with plain SDK
+clients (one per caller, as before rag.llm_gateway) vs. the shared gateway,
+against the local fake server (benchmarks/fake_openai.py) enforcing its own
+requests-per-minute limit.
+
+    python -m benchmarks.llm_gateway
+    python -m benchmarks.llm_gateway --rpm 300 --batch-workers 16 --duration 60
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+import openai
+
+from rag.llm_gateway import BATCH, INTERACTIVE, LLMGateway, llm_job
+
+from .fake_openai import FakeOpenAIServer
+
+MODEL = "gpt-4.1-mini"
+PROMPT = "Return a JSON object with a score. " * 20
+
+
+def _percentile(values: List[float], q: float) -> float:
+    return round(float(np.percentile(values, q)), 1) if values else None
+
+
+def run(mode: str, rpm: int, latency_ms: float, batch_workers: int, interactive_interval: float,
+        duration: float) -> Dict[str, Any]:
+    with FakeOpenAIServer(latency_ms=latency_ms, jitter_ms=latency_ms / 4, rpm=rpm) as server, \
+            tempfile.TemporaryDirectory() as tmp:
+        if mode == "gateway":
+            gateway = LLMGateway(
+                base_url=server.base_url,
+                limits_path=Path(tmp) / "limits.sqlite",
+                usage_dir=Path(tmp),
+                model_limits={MODEL: (rpm, 10_000_000)},
+            )
+            batch_client = interactive_client = gateway
+        else:
+            batch_client = openai.OpenAI(base_url=server.base_url, api_key="local")
+            interactive_client = openai.OpenAI(base_url=server.base_url, api_key="local")
+
+        stop = threading.Event()
+        counts = {"batch_ok": 0, "batch_failed": 0, "interactive_failed": 0}
+        interactive_ms: List[float] = []
+        lock = threading.Lock()
+
+        def call(client) -> bool:
+            try:
+                client.responses.create(model=MODEL, input=PROMPT, max_output_tokens=50)
+                return True
+            except openai.OpenAIError:
+                return False
+
+        def batch_worker():
+            with llm_job("bench-batch", priority=BATCH):
+                while not stop.is_set():
+                    ok = call(batch_client)
+                    with lock:
+                        counts["batch_ok" if ok else "batch_failed"] += 1
+
+        def interactive_worker():
+            with llm_job("bench-interactive", priority=INTERACTIVE):
+                while not stop.is_set():
+                    started = time.perf_counter()
+                    ok = call(interactive_client)
+                    elapsed = 1000 * (time.perf_counter() - started)
+                    with lock:
+                        if ok:
+                            interactive_ms.append(elapsed)
+                        else:
+                            counts["interactive_failed"] += 1
+                    stop.wait(interactive_interval)
+
+        threads = [threading.Thread(target=batch_worker) for _ in range(batch_workers)]
+        threads.append(threading.Thread(target=interactive_worker))
+        for t in threads:
+            t.start()
+        time.sleep(duration)
+        stop.set()
+        for t in threads:
+            t.join()
+
+        return {
+            "mode": mode,
+            "server_requests": server.stats["requests"],
+            "server_429s": server.stats["rate_limited"],
+            "connections": server.stats["connections"],
+            **counts,
+            "interactive_ok": len(interactive_ms),
+            "interactive_p50_ms": _percentile(interactive_ms, 50),
+            "interactive_p95_ms": _percentile(interactive_ms, 95),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plain SDK clients vs. the LLM gateway under batch load.")
+    parser.add_argument("--rpm", type=int, default=120, help="Requests-per-minute limit of the fake server.")
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    parser.add_argument("--batch-workers", type=int, default=8)
+    parser.add_argument("--interactive-interval", type=float, default=1.0, help="Seconds between page loads.")
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--output", help="Write results JSON to this file.")
+    args = parser.parse_args()
+
+    results = [
+        run(mode, args.rpm, args.latency_ms, args.batch_workers, args.interactive_interval, args.duration)
+        for mode in ("direct", "gateway")
+    ]
+    text = json.dumps({"rpm": args.rpm, "duration_s": args.duration, "results": results}, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
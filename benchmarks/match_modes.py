@@ -0,0 +1,180 @@
+# benchmarks/match_modes.py
+"""
+Compare the combined (score + reasons in one call) and two-call match modes
+of rag.recommendation: LLM calls, input/output tokens and wall time per
+(firm, opportunity) pair.
+
+    python -m benchmarks.match_modes                 # fake LLM, synthetic data
+    python -m benchmarks.match_modes --live --cif 33945221 --limit 5
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+from rag import recommendation
+from rag.catalogue import load_opportunities, with_raw_text
+
+CHARS_PER_TOKEN = 4
+
+
+def _tokens(text: str) -> int:
+    return max(1, len(text or "") // CHARS_PER_TOKEN)
+
+
+class FakeResponses:
+    """Stand-in for client.responses with deterministic output and simulated latency."""
+
+    def __init__(self, latency_s: float = 0.0, per_output_token_s: float = 0.0, seed: int = 0):
+        self.latency_s = latency_s
+        self.per_output_token_s = per_output_token_s
+        self.rng = random.Random(seed)
+
+    def create(self, model: str, input: str, max_output_tokens: int = 0, text: Any = None, **kwargs):
+        score = round(self.rng.random(), 2)
+        reasons = ["CAEN code matches the targeted sector", "Company size within limits", "Region is eligible"]
+        if text is not None:
+            output = json.dumps({"score": score, "eligible": score >= 0.5, "reasons": reasons})
+        elif '{"score": float}' in input:
+            output = json.dumps({"score": score})
+        else:
+            output = "\n".join(f"- {r}" for r in reasons)
+        time.sleep(self.latency_s + self.per_output_token_s * _tokens(output))
+        return SimpleNamespace(
+            output_text=output,
+            usage=SimpleNamespace(input_tokens=_tokens(input), output_tokens=_tokens(output)),
+        )
+
+
+class CountingClient:
+    """Wraps a client (real or fake) and accumulates calls and token usage."""
+
+    def __init__(self, inner):
+        self._inner = inner
+        self.calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self._lock = threading.Lock()
+        self.responses = SimpleNamespace(create=self._create)
+
+    def _create(self, **kwargs):
+        resp = self._inner.responses.create(**kwargs)
+        usage = getattr(resp, "usage", None)
+        with self._lock:
+            self.calls += 1
+            if usage is not None:
+                self.input_tokens += getattr(usage, "input_tokens", 0) or 0
+                self.output_tokens += getattr(usage, "output_tokens", 0) or 0
+        return resp
+
+
+def synthetic_firm() -> Dict[str, Any]:
+    """A firm record shaped like input/request.py output (flattened openapi.ro payload)."""
+    firm = {
+        "cif": "12345678",
+        "denumire": "EXEMPLU SOFTWARE SRL",
+        "adresa": "Str. Exemplu 1, Iasi",
+        "judet": "Iasi",
+        "numar_reg_com": "J22/1234/2016",
+        "caen_code": "6201",
+        "year": 2024,
+        "cifra_de_afaceri_neta": 850000,
+        "profit_net": 120000,
+        "numar_mediu_de_salariati": 12,
+    }
+    for i in range(60):
+        firm[f"indicatori_{i}_val_indicator"] = i * 1000
+        firm[f"indicatori_{i}_val_den_indicator"] = f"Indicator {i}"
+    return firm
+
+
+def synthetic_opportunities(n: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            "id": f"synthetic-{i}",
+            "type": "grant",
+            "title": f"Synthetic digitalisation grant {i}",
+            "summary": "Grants for SME digitalisation projects.",
+            "eligibility_criteria": ["SME registered in Romania", "At least 1 year of activity"],
+            "required_documents": ["Business plan", "Financial statements"],
+            "funding_max": 50000 + i,
+            "raw_text": "Call text. " * 400,
+        }
+        for i in range(n)
+    ]
+
+
+def run_mode(mode: str, firm: Dict[str, Any], opportunities: List[Dict[str, Any]], inner) -> Dict[str, Any]:
+    counting = CountingClient(inner)
+    original = recommendation.client
+    recommendation.client = counting
+    score_pair = (
+        recommendation.llm_match_score_and_reasons if mode == "combined" else recommendation.llm_match_two_calls
+    )
+    try:
+        started = time.perf_counter()
+        for opp in opportunities:
+            score_pair(firm, opp)
+        elapsed = time.perf_counter() - started
+    finally:
+        recommendation.client = original
+
+    pairs = len(opportunities) or 1
+    return {
+        "mode": mode,
+        "pairs": len(opportunities),
+        "calls": counting.calls,
+        "calls_per_pair": counting.calls / pairs,
+        "input_tokens": counting.input_tokens,
+        "input_tokens_per_pair": counting.input_tokens / pairs,
+        "output_tokens": counting.output_tokens,
+        "output_tokens_per_pair": counting.output_tokens / pairs,
+        "wall_s": round(elapsed, 4),
+        "wall_s_per_pair": round(elapsed / pairs, 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark combined vs two-call match scoring.")
+    parser.add_argument("--live", action="store_true", help="Use the real OpenAI client (paid calls).")
+    parser.add_argument("--cif", help="Firm from data/firms/<cif>.json (default: synthetic firm).")
+    parser.add_argument("--limit", type=int, default=20, help="Number of opportunities.")
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake LLM base latency in seconds.")
+    parser.add_argument("--output", help="Write results JSON to this file.")
+    args = parser.parse_args()
+
+    firm = recommendation.load_firm_by_cif(args.cif) if args.cif else synthetic_firm()
+    catalogue = load_opportunities()
+    if catalogue:
+        opportunities = [with_raw_text(op) for op in catalogue[: args.limit]]
+    else:
+        opportunities = synthetic_opportunities(args.limit)
+
+    inner = recommendation.client if args.live else SimpleNamespace(
+        responses=FakeResponses(latency_s=args.latency, per_output_token_s=0.0005)
+    )
+
+    results = [run_mode(mode, firm, opportunities, inner) for mode in recommendation.MATCH_MODES]
+    combined, two_call = results
+    summary = {
+        "live": args.live,
+        "results": results,
+        "calls_saved_ratio": 1 - combined["calls"] / max(two_call["calls"], 1),
+        "input_tokens_saved_ratio": 1 - combined["input_tokens"] / max(two_call["input_tokens"], 1),
+        "speedup": two_call["wall_s"] / combined["wall_s"] if combined["wall_s"] else None,
+    }
+
+    text = json.dumps(summary, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+# benchmarks/replay_pipeline.py
+"""
+Record / replay (rag.llm_cassette) of the LLM-driven pipeline: opportunity
+embeddings, firm-opportunity scoring, the documentation package and scraper
+extraction. The pipeline runs once against the fake OpenAI server (or the
+real API with --live) while recording, then twice offline from the
+cassette, with the recorded latencies and with none, and the outputs are
+compared with the recorded run.
+
+    python -m benchmarks.replay_pipeline
+    python -m benchmarks.replay_pipeline --live --cassette outputs/cassettes/pipeline
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from rag import documentation_rag, llm_gateway, recommendation
+from rag.firm_profile import build_firm_profile
+from rag.llm_cassette import Cassette
+from rag.llm_gateway import LLMGateway
+from rag.openai_client import embed_texts
+
+from .fake_openai import FakeOpenAIServer
+from .match_modes import synthetic_firm, synthetic_opportunities
+
+SCRAPER_DIR = Path(__file__).resolve().parents[1] / "scraper"
+CRAWLED_TEXT = (
+    "Apel de proiecte PNRR C9 I3: granturi pentru digitalizarea IMM-urilor, "
+    "valoare maximă 100.000 EUR, CAEN 6201, 6202, termen 30.06.2025. " * 40
+)
+
+
+@contextmanager
+def _cwd(path: Path):
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def use_gateway(gateway: LLMGateway):
+    """Point every module that captured the gateway at `gateway`."""
+    llm_gateway._gateway = gateway
+    recommendation.client = gateway
+    documentation_rag.client = gateway
+
+
+def run_pipeline(pairs: int) -> Dict[str, Any]:
+    firm = synthetic_firm()
+    opportunities = synthetic_opportunities(pairs)
+    outputs: Dict[str, Any] = {}
+    timings: Dict[str, float] = {}
+
+    started = time.perf_counter()
+    vectors = embed_texts([json.dumps(op, ensure_ascii=False) for op in opportunities])
+    outputs["embeddings_sha1"] = hashlib.sha1(json.dumps(vectors).encode()).hexdigest()
+    timings["embeddings_s"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    profile = build_firm_profile(firm)
+    outputs["scores"] = [recommendation.llm_match_score_and_reasons(profile, op) for op in opportunities]
+    timings["scoring_s"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    documentation_rag.load_firm_by_cif = lambda cif: firm
+    documentation_rag.load_opportunity_by_id = lambda op_id: opportunities[0]
+    documentation_rag.firm_profile_for = build_firm_profile  # no profile cache under data/
+    outputs["docs"] = documentation_rag.generate_docs_package(firm["cif"], opportunities[0]["id"])
+    timings["docs_s"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    if str(SCRAPER_DIR) not in sys.path:
+        sys.path.insert(0, str(SCRAPER_DIR))
+    from llm.grant_extractor import GrantExtractor
+
+    with _cwd(SCRAPER_DIR):
+        outputs["extracted"] = GrantExtractor().extract(CRAWLED_TEXT, site="benchmark")
+    timings["extraction_s"] = time.perf_counter() - started
+
+    return {"outputs": outputs, "timings": {k: round(v, 3) for k, v in timings.items()}}
+
+
+def timed_run(cassette: Cassette, pairs: int, base_url: Optional[str], usage_dir: Path) -> Dict[str, Any]:
+    use_gateway(LLMGateway(base_url=base_url, limits_path=usage_dir / "limits.sqlite", usage_dir=usage_dir,
+                           cassette=cassette))
+    started = time.perf_counter()
+    result = run_pipeline(pairs)
+    result["wall_s"] = round(time.perf_counter() - started, 3)
+    result["cassette"] = dict(cassette.stats)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record once, replay the LLM pipeline offline.")
+    parser.add_argument("--pairs", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="Fake server latency while recording.")
+    parser.add_argument("--live", action="store_true", help="Record against the real OpenAI API (paid).")
+    parser.add_argument("--cassette", help="Cassette directory to keep (default: temporary).")
+    parser.add_argument("--output", help="Write results JSON to this file.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        cassette_dir = Path(args.cassette) if args.cassette else tmp / "cassette"
+
+        if args.live:
+            recorded = timed_run(Cassette(cassette_dir, "record"), args.pairs, None, tmp)
+        else:
+            with FakeOpenAIServer(latency_ms=args.latency_ms, jitter_ms=args.latency_ms / 4) as server:
+                recorded = timed_run(Cassette(cassette_dir, "record"), args.pairs, server.base_url, tmp)
+
+        # offline from here on: an unreachable base URL, every call must hit the cassette
+        offline = "http://127.0.0.1:9/v1"
+        replayed = timed_run(Cassette(cassette_dir, "replay"), args.pairs, offline, tmp)
+        instant = timed_run(Cassette(cassette_dir, "replay", latency_ms=0), args.pairs, offline, tmp)
+
+    summary = {
+        "pairs": args.pairs,
+        "live": args.live,
+        "runs": {
+            name: {
+                "wall_s": run["wall_s"],
+                "timings": run["timings"],
+                "cassette": run["cassette"],
+                "identical_to_recorded": run["outputs"] == recorded["outputs"],
+            }
+            for name, run in (("record", recorded), ("replay_recorded_latency", replayed),
+                              ("replay_no_latency", instant))
+        },
+    }
+    text = json.dumps(summary, indent=2, ensure_ascii=False)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# benchmarks/reverse_match.py
+"""
+Latency of the steps of rag.reverse_match before any LLM call: rule mask of
+every opportunity over all firms, one (firms x opportunities) similarity
+product and the argpartition shortlist, on synthetic firms
+(benchmarks/synthetic.py) embedded with the local backend. Local vectors of
+a firm profile and a call text are far less similar than OpenAI ones, so the
+similarity floor defaults to 0 here: every rule-passing firm is ranked.
+
+    python -m benchmarks.reverse_match
+    python -m benchmarks.reverse_match --firms 50000 --opportunities 100
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import time
+from datetime import date
+
+import numpy as np
+
+from rag.embeddings import LocalEmbeddings
+from rag.firm_profile import build_firm_profile
+from rag.index_builder import build_canonical_text_for_embedding
+from rag.recommendation import prompt_json
+from rag.reverse_match import SHORTLIST_SIZE, FirmMatrix, firm_metadata, shortlist_firms
+
+from .synthetic import synthetic_firms, synthetic_opportunity
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the reverse-match shortlist (no LLM).")
+    parser.add_argument("--firms", type=int, default=5000)
+    parser.add_argument("--opportunities", type=int, default=20)
+    parser.add_argument("--shortlist", type=int, default=SHORTLIST_SIZE)
+    parser.add_argument("--min-similarity", type=float, default=0.0)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results JSON to this file.")
+    args = parser.parse_args()
+
+    today = date.today()
+    started = time.perf_counter()
+    firms = synthetic_firms(args.firms, args.seed)
+    rng = random.Random(args.seed)
+    opportunities = [synthetic_opportunity(i, "grants", rng, today) for i in range(args.opportunities)]
+    firm_texts = [prompt_json(build_firm_profile(firm)) for firm in firms]
+    opp_texts = [build_canonical_text_for_embedding(op) for op in opportunities]
+    embedder = LocalEmbeddings().fit(firm_texts + opp_texts)
+    matrix = FirmMatrix.from_arrays(
+        embedder.embed_texts(firm_texts), [firm_metadata(firm["cui"], firm, today) for firm in firms], today
+    )
+    vectors = np.asarray(embedder.embed_texts(opp_texts), dtype="float32")
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-10
+    setup_s = time.perf_counter() - started
+
+    samples = []
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        shortlists = shortlist_firms(opportunities, matrix, args.shortlist, args.min_similarity, vectors=vectors)
+        samples.append(time.perf_counter() - started)
+    ms = np.asarray(samples) * 1000
+
+    summary = {
+        "firms": len(matrix),
+        "opportunities": len(opportunities),
+        "dim": int(matrix.embeddings.shape[1]),
+        "shortlist_size": args.shortlist,
+        "setup_s": round(setup_s, 2),
+        "shortlist_ms": {
+            "runs": args.runs,
+            "p50_ms": round(float(np.percentile(ms, 50)), 2),
+            "p95_ms": round(float(np.percentile(ms, 95)), 2),
+            "max_ms": round(float(ms.max()), 2),
+        },
+        "shortlisted_per_opportunity": round(sum(len(s) for s in shortlists.values()) / len(opportunities), 1),
+    }
+    text = json.dumps(summary, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
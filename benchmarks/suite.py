@@ -0,0 +1,291 @@
+# benchmarks/suite.py
+"""
+End-to-end benchmark on synthetic catalogues (benchmarks/synthetic.py) of
+increasing size: catalogue build, index build (local embeddings + BM25),
+OpportunityVectorStore.search, recommend_opportunities_for_firm with a fake
+LLM, Flask /grants and /grants/<id> rendering, and PDF generation through
+rag.pdfGenerator.gen.generate_presentation. Everything is written under a
+temporary directory; the results are one JSON document, to be kept per
+commit and compared over time.
+
+    python -m benchmarks.suite
+    python -m benchmarks.suite --sizes 100 1000 10000 100000 --output outputs/bench/$(git rev-parse --short HEAD).json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+from rag import catalogue, match_store, recommendation
+from rag import firm_profile as firm_profiles
+from rag.embeddings import LocalEmbeddings
+from rag.index_builder import build_canonical_text_for_embedding, build_metadata, load_all_opportunities
+from rag.lexical_index import LexicalIndex
+from rag.vector_store import OpportunityVectorStore
+
+from .match_modes import FakeResponses
+from .synthetic import RAW_TEXT_MEDIAN_CHARS, SENTENCES, synthetic_catalogue, synthetic_firm
+
+BENCH_CUI = "12345678"
+SEARCH_QUERIES = (
+    "granturi pentru digitalizarea IMM-urilor",
+    "finanțare panouri fotovoltaice pentru firme",
+    "fonduri pentru modernizarea fermei",
+    "investiții în turism rural în Nord-Est",
+    "cercetare și inovare CAEN 7219",
+    "sprijin pentru export",
+)
+
+
+def _summary_ms(samples: List[float]) -> Dict[str, float]:
+    ms = np.asarray(samples) * 1000
+    return {
+        "runs": len(samples),
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(ms, 95)), 2),
+        "max_ms": round(float(ms.max()), 2),
+    }
+
+
+def _timed(fn: Callable[[], Any], runs: int) -> Dict[str, float]:
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return _summary_ms(samples)
+
+
+@contextmanager
+def data_root(root: Path):
+    """Point the catalogue, firm, profile and match store paths under `root`."""
+    patches = [
+        (catalogue, "SOURCES_FILE", root / "data" / "opportunities" / "sources.json"),
+        (catalogue, "CATALOGUE_DB", root / "data" / "opportunities" / "catalogue.sqlite"),
+        (catalogue, "RAW_TEXT_DB", root / "data" / "opportunities" / "raw_text.sqlite"),
+        (recommendation, "FIRMS_DIR", root / "data" / "firms"),
+        (firm_profiles, "PROFILES_DIR", root / "data" / "firms" / "profiles"),
+        (match_store, "MATCHES_DB", root / "outputs" / "matches.sqlite"),
+    ]
+    originals = [(module, name, getattr(module, name)) for module, name, _ in patches]
+    for module, name, value in patches:
+        setattr(module, name, value)
+    catalogue._cache.update({"mtime_ns": None, "rows": [], "by_id": {}})
+    try:
+        yield
+    finally:
+        for module, name, value in originals:
+            setattr(module, name, value)
+        catalogue._cache.update({"mtime_ns": None, "rows": [], "by_id": {}})
+
+
+def bench_index(search_runs: int, top_k: int) -> Dict[str, Any]:
+    """The steps of index_builder.build_index, in memory, then searches on the result."""
+    started = time.perf_counter()
+    opportunities = load_all_opportunities()
+    texts = [build_canonical_text_for_embedding(op) for op in opportunities]
+    embedder = LocalEmbeddings().fit(texts)
+    embeddings = np.asarray(embedder.embed_texts(texts), dtype="float32")
+    metadata = [build_metadata(op) for op in opportunities]
+    embed_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    store = OpportunityVectorStore.from_arrays(embeddings, metadata, embedder=embedder)
+    LexicalIndex.from_opportunities([catalogue.with_raw_text(op) for op in opportunities], metadata)
+    structures_s = time.perf_counter() - started
+
+    queries = [SEARCH_QUERIES[i % len(SEARCH_QUERIES)] for i in range(search_runs)]
+    samples = []
+    for query in queries:
+        started = time.perf_counter()
+        store.search(query, top_k=top_k)
+        samples.append(time.perf_counter() - started)
+    filtered = _timed(lambda: store.search(SEARCH_QUERIES[0], top_k=top_k, filter_type="grant",
+                                           filter_caen="6201"), search_runs)
+    return {
+        "index_build": {
+            "embed_s": round(embed_s, 3),
+            "vector_and_bm25_s": round(structures_s, 3),
+            "rows": len(metadata),
+            "embedding_dim": int(embeddings.shape[1]),
+        },
+        "search": _summary_ms(samples),
+        "search_filtered": filtered,
+    }
+
+
+def bench_recommend(top_k: int, llm_latency_s: float) -> Dict[str, Any]:
+    original = recommendation.client
+    recommendation.client = SimpleNamespace(responses=FakeResponses(latency_s=llm_latency_s))
+    try:
+        started = time.perf_counter()
+        recs = recommendation.recommend_opportunities_for_firm(BENCH_CUI, top_k=top_k)
+        elapsed = time.perf_counter() - started
+    finally:
+        recommendation.client = original
+    return {"wall_s": round(elapsed, 3), "returned": len(recs), "recommendations": recs}
+
+
+def bench_flask(root: Path, matches: List[Dict[str, Any]], ids: List[str], runs: int) -> Dict[str, Any]:
+    from frontend import app as web
+
+    # results as rag.run_match_opp leaves them for the page
+    out_dir = root / "outputs" / BENCH_CUI
+    out_dir.mkdir(parents=True, exist_ok=True)
+    with (out_dir / "match_opportunities.json").open("w", encoding="utf-8") as f:
+        json.dump(matches, f, ensure_ascii=False)
+
+    user = web.USERS["demo@example.com"]
+    original_base, original_run, original_cui = web.BASE_DIR, web.run_match_opp, user.get("cui")
+    (root / "frontend").mkdir(exist_ok=True)
+    web.BASE_DIR = str(root / "frontend")  # outputs/ and data/ resolve under root
+    web.run_match_opp = lambda cui, force=False: None  # never start matching from a page view
+    try:
+        if web.load_match_opportunities(BENCH_CUI) is None:
+            raise RuntimeError(f"match results not visible to the app under {root}")
+        client = web.app.test_client()
+        with client.session_transaction() as session:
+            session["user"] = "demo@example.com"
+        user["cui"] = BENCH_CUI
+
+        def get(path: str):
+            response = client.get(path)
+            if response.status_code != 200:
+                raise RuntimeError(f"GET {path} -> {response.status_code}")
+
+        rng = random.Random(0)
+        return {
+            "grants": _timed(lambda: get("/grants"), runs),
+            "grant_detail": _timed(lambda: get(f"/grants/{rng.choice(ids)}"), runs),
+        }
+    finally:
+        web.BASE_DIR, web.run_match_opp, user["cui"] = original_base, original_run, original_cui
+
+
+def bench_pdf(root: Path, runs: int) -> Dict[str, Any]:
+    from rag.pdfGenerator.gen import generate_presentation
+
+    doc_json = root / "plan_de_afaceri.json"
+    firm_json = root / "data" / "firms" / f"{BENCH_CUI}.json"
+    rng = random.Random(0)
+    with doc_json.open("w", encoding="utf-8") as f:
+        json.dump({
+            "company_name": "EXEMPLU SRL",
+            "tagline": "Plan de afaceri",
+            "sections": [
+                {"title": f"Secțiunea {i + 1}",
+                 "body": "\n".join(" ".join(rng.choices(SENTENCES, k=6)) for _ in range(4))}
+                for i in range(8)
+            ],
+        }, f, ensure_ascii=False)
+
+    def generate():
+        if generate_presentation(str(doc_json), str(root / "plan_de_afaceri.pdf"), None, str(firm_json)) != 1:
+            raise RuntimeError("generate_presentation failed")
+
+    result = _timed(generate, runs)
+    result["pdf_bytes"] = (root / "plan_de_afaceri.pdf").stat().st_size
+    return result
+
+
+def run_size(n: int, root: Path, args) -> Dict[str, Any]:
+    started = time.perf_counter()
+    combined = synthetic_catalogue(n, args.seed, args.raw_text_chars)
+    generate_s = time.perf_counter() - started
+    raw_chars = [len(op["raw_text"]) for ops in combined.values() for op in ops]
+
+    with data_root(root):
+        firms_dir = root / "data" / "firms"
+        firms_dir.mkdir(parents=True, exist_ok=True)
+        with (firms_dir / f"{BENCH_CUI}.json").open("w", encoding="utf-8") as f:
+            json.dump(synthetic_firm(BENCH_CUI, args.seed), f, ensure_ascii=False)
+
+        sources = catalogue.SOURCES_FILE
+        sources.parent.mkdir(parents=True, exist_ok=True)
+        with sources.open("w", encoding="utf-8") as f:
+            json.dump(combined, f, ensure_ascii=False)
+        sources_mb = sources.stat().st_size / 1e6
+        del combined
+
+        started = time.perf_counter()
+        catalogue.load_opportunities()  # first use compiles sources.json into SQLite
+        catalogue_s = time.perf_counter() - started
+
+        result: Dict[str, Any] = {
+            "opportunities": n,
+            "raw_text_chars": {"median": int(np.median(raw_chars)), "p95": int(np.percentile(raw_chars, 95))},
+            "sources_json_mb": round(sources_mb, 1),
+            "generate_s": round(generate_s, 3),
+            "catalogue_build_s": round(catalogue_s, 3),
+        }
+        result.update(bench_index(args.search_runs, args.top_k))
+
+        recommend = bench_recommend(args.top_k, args.llm_latency)
+        result["recommend"] = {k: v for k, v in recommend.items() if k != "recommendations"}
+
+        ids = [str(op["id"]) for op in catalogue.load_opportunities()]
+        result["flask"] = bench_flask(root, recommend["recommendations"], ids, args.page_runs)
+    return result
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).resolve().parents[1]).stdout.strip()
+    except OSError:
+        return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end benchmark on synthetic catalogues.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000],
+                        help="Catalogue sizes (number of opportunities).")
+    parser.add_argument("--raw-text-chars", type=int, default=RAW_TEXT_MEDIAN_CHARS,
+                        help="Median raw_text size of the synthetic calls.")
+    parser.add_argument("--top-k", type=int, default=20)
+    parser.add_argument("--search-runs", type=int, default=50)
+    parser.add_argument("--page-runs", type=int, default=30)
+    parser.add_argument("--pdf-runs", type=int, default=3)
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Fake LLM latency per call, seconds.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results JSON to this file.")
+    args = parser.parse_args()
+
+    results: Dict[str, Any] = {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "settings": {k: v for k, v in vars(args).items() if k != "output"},
+        "sizes": [],
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.sizes:
+            print(f"[bench] {n} opportunities...", file=sys.stderr)
+            results["sizes"].append(run_size(n, Path(tmp) / f"n{n}", args))
+        with data_root(Path(tmp) / f"n{args.sizes[-1]}"):
+            results["pdf"] = bench_pdf(Path(tmp) / f"n{args.sizes[-1]}", args.pdf_runs)
+
+    text = json.dumps(results, indent=2, ensure_ascii=False)
+    print(text)
+    if args.output:
+        path = Path(args.output)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text, encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+# benchmarks/synthetic.py
+"""
+Seeded synthetic data for the benchmarks: sources.json catalogues shaped
+like the scraper's output (grants / vcs / accelerators, crawled raw_text of
+realistic, long-tailed sizes) and firm records shaped like input/request.py
+output (flattened openapi.ro company + balances payload plus the form
+fields).
+
+    python -m benchmarks.synthetic --opportunities 10000 --output /tmp/sources.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import random
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Dict, List
+
+# share of each sources.json group, the real catalogue is mostly grants
+KIND_WEIGHTS = {"grants": 0.8, "vcs": 0.1, "accelerators": 0.1}
+KIND_TYPES = {"grants": "grant", "vcs": "vc", "accelerators": "accelerator"}
+
+# crawled call pages: median size and spread (log-normal) of raw_text
+RAW_TEXT_MEDIAN_CHARS = 6000
+RAW_TEXT_SIGMA = 0.9
+
+TOPICS = {
+    "digitalizare": ("digitalizarea IMM-urilor", ["6201", "6202", "6311", "4741"]),
+    "energie": ("eficiență energetică și panouri fotovoltaice", ["3511", "4321", "2711"]),
+    "agricultura": ("modernizarea exploatațiilor agricole", ["0111", "0113", "0150", "1011"]),
+    "turism": ("dezvoltarea turismului rural", ["5510", "5520", "5610"]),
+    "inovare": ("cercetare, dezvoltare și inovare", ["7211", "7219", "7490"]),
+    "export": ("internaționalizare și export", ["4690", "4619", "7311"]),
+    "productie": ("retehnologizarea unităților de producție", ["2511", "2562", "3109"]),
+}
+PROGRAMMES = ("PNRR-C9", "POCIDIF", "PR-NE", "PR-SE", "AFIR-SM6", "POTJ", "HORIZON-EIC", "PEO")
+REGIONS = ("Romania", "Nord-Est", "Sud-Est", "Sud-Muntenia", "Sud-Vest Oltenia", "Vest", "Nord-Vest", "Centru",
+           "Bucuresti-Ilfov")
+COUNTIES = ("Iasi", "Cluj", "Timis", "Brasov", "Constanta", "Bucuresti", "Dolj", "Bihor", "Suceava", "Arges")
+DOCUMENTS = ("Cerere de finanțare", "Plan de afaceri", "Declarație de eligibilitate", "Situații financiare",
+             "Certificat constatator ONRC", "Declarație de minimis", "Buget detaliat", "Scrisoare de intenție",
+             "CV-urile echipei", "Dovada cofinanțării")
+SENTENCES = (
+    "Solicitanții eligibili sunt întreprinderile mici și mijlocii înregistrate în România.",
+    "Valoarea maximă a finanțării nerambursabile este stabilită prin ghidul solicitantului.",
+    "Cererile de finanțare se depun exclusiv prin platforma electronică a programului.",
+    "Contribuția proprie a solicitantului trebuie asigurată din surse private.",
+    "Cheltuielile eligibile includ echipamente, software, servicii de consultanță și instruire.",
+    "Proiectul trebuie implementat în maximum 24 de luni de la semnarea contractului.",
+    "Evaluarea se face în ordinea depunerii, până la epuizarea bugetului alocat apelului.",
+    "Nu sunt eligibile firmele aflate în dificultate sau în procedură de insolvență.",
+    "Indicatorii de rezultat se mențin pe o perioadă de cel puțin trei ani după finalizare.",
+    "Activitatea finanțată trebuie să corespundă unui cod CAEN eligibil la data depunerii.",
+    "Ajutorul se acordă cu respectarea regulamentului de minimis al Comisiei Europene.",
+    "Clarificările privind ghidul se publică pe pagina oficială a autorității de management.",
+)
+
+FIRM_FORM_KEYS = tuple(f"additional_info_{i}" for i in range(1, 7))
+
+
+def raw_text(rng: random.Random, topic: str, median_chars: int = RAW_TEXT_MEDIAN_CHARS) -> str:
+    """Crawled call text, long-tailed length around `median_chars`."""
+    target = int(min(max(300, rng.lognormvariate(math.log(median_chars), RAW_TEXT_SIGMA)), 25 * median_chars))
+    parts = [f"Apel de proiecte pentru {TOPICS[topic][0]}."]
+    size = len(parts[0])
+    while size < target:
+        sentence = rng.choice(SENTENCES)
+        parts.append(sentence)
+        size += len(sentence) + 1
+    return " ".join(parts)
+
+
+def synthetic_opportunity(
+    i: int,
+    kind: str,
+    rng: random.Random,
+    today: date,
+    raw_text_chars: int = RAW_TEXT_MEDIAN_CHARS,
+) -> Dict[str, Any]:
+    topic = rng.choice(list(TOPICS))
+    description, caen = TOPICS[topic]
+    code = f"{rng.choice(PROGRAMMES)}-{today.year + rng.randint(-1, 1)}-{i:06d}"
+    funding_max = rng.choice((25_000, 50_000, 100_000, 200_000, 500_000, 1_000_000, 2_500_000))
+    opens = today + timedelta(days=rng.randint(-120, 60))
+    deadlines = [{"label": "Deschidere apel", "date": opens.isoformat()}]
+    if rng.random() < 0.9:  # the rest are continuous calls
+        deadlines.append({"label": "Termen limită", "date": (opens + timedelta(days=rng.randint(30, 240))).isoformat()})
+    return {
+        "id": f"synthetic-{kind}-{i}",
+        "type": KIND_TYPES[kind],
+        "title": f"Apel {code}: {description}",
+        "program_name": code.rsplit("-", 2)[0],
+        "source_url": f"https://finantare.example.ro/apeluri/{code.lower()}",
+        "region": rng.sample(REGIONS, rng.randint(1, 2)),
+        "eligible_countries": ["Romania"],
+        "eligible_caen_codes": rng.sample(caen, min(len(caen), rng.randint(1, 3))),
+        "funding_min": funding_max // 10,
+        "funding_max": funding_max,
+        "funding_currency": "EUR",
+        "non_dilutive": kind == "grants",
+        "cofinancing_required": rng.random() < 0.6,
+        "summary": f"Finanțare pentru {description}, până la {funding_max} EUR per proiect.",
+        "raw_text": raw_text(rng, topic, raw_text_chars),
+        "eligibility_criteria": [
+            "IMM înregistrat în România",
+            f"Cel puțin {rng.randint(1, 3)} ani de activitate",
+            f"Activitate în domeniile CAEN {', '.join(caen)}",
+        ],
+        "constraints": {
+            "caen_codes": caen,
+            "regions": [],
+            "min_employees": rng.choice((None, 1, 3, 10)),
+            "max_employees": rng.choice((None, 49, 249)),
+        },
+        "required_documents": rng.sample(DOCUMENTS, rng.randint(3, len(DOCUMENTS))),
+        "application_format": "online_portal",
+        "application_language": "ro",
+        "deadlines": deadlines,
+        "additional_notes": None,
+    }
+
+
+def synthetic_catalogue(
+    n: int,
+    seed: int = 0,
+    raw_text_chars: int = RAW_TEXT_MEDIAN_CHARS,
+    today: date | None = None,
+) -> Dict[str, List[Dict[str, Any]]]:
+    """A sources.json structure with `n` opportunities split across the groups."""
+    rng = random.Random(seed)
+    today = today or date.today()
+    combined: Dict[str, List[Dict[str, Any]]] = {kind: [] for kind in KIND_WEIGHTS}
+    kinds = rng.choices(list(KIND_WEIGHTS), weights=list(KIND_WEIGHTS.values()), k=n)
+    for i, kind in enumerate(kinds):
+        combined[kind].append(synthetic_opportunity(i, kind, rng, today, raw_text_chars))
+    return combined
+
+
+def synthetic_firm(cui: str = "12345678", seed: int = 0) -> Dict[str, Any]:
+    """A firm record shaped like input/request.py output."""
+    rng = random.Random(seed)
+    topic = rng.choice(list(TOPICS))
+    county = rng.choice(COUNTIES)
+    employees = rng.choice((2, 5, 12, 30, 80, 200))
+    turnover = employees * rng.randint(40_000, 120_000)
+    firm: Dict[str, Any] = {
+        "cif": cui,
+        "denumire": f"EXEMPLU {topic.upper()} SRL",
+        "numar_reg_com": f"J{rng.randint(1, 52):02d}/{rng.randint(100, 9999)}/{rng.randint(2005, 2022)}",
+        "adresa": f"Str. Exemplu {rng.randint(1, 200)}, {county}",
+        "judet": county,
+        "localitate": county,
+        "telefon": f"07{rng.randint(10_000_000, 99_999_999)}",
+        "cod_postal": f"{rng.randint(100_000, 999_999)}",
+        "stare": "INREGISTRAT din data 12 Martie 2016",
+        "tva": "2016-03-12",
+        "data_inregistrare": f"{rng.randint(2005, 2022)}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}",
+        "year": date.today().year - 1,
+        "balance_type": "BL",
+        "caen_code": rng.choice(TOPICS[topic][1]),
+        "cifra_de_afaceri_neta": turnover,
+        "venituri_totale": int(turnover * 1.05),
+        "profit_net": int(turnover * rng.uniform(-0.05, 0.2)),
+        "capitaluri_total": int(turnover * rng.uniform(0.1, 0.6)),
+        "datorii": int(turnover * rng.uniform(0.05, 0.5)),
+        "active_imobilizate_total": int(turnover * rng.uniform(0.1, 0.8)),
+        "active_circulante_total": int(turnover * rng.uniform(0.1, 0.5)),
+        "numar_mediu_de_salariati": employees,
+    }
+    # the balances' indicator table, flattened like request.flatten() does
+    for i in range(60):
+        firm[f"indicatori_{i}_indicator"] = f"I{i + 1}"
+        firm[f"indicatori_{i}_val_indicator"] = rng.randint(0, turnover)
+        firm[f"indicatori_{i}_val_den_indicator"] = f"Indicator {i + 1}"
+    # form fields (frontend/form_output.json) overwrite the API payload
+    firm.update({
+        "name": firm["denumire"],
+        "email": "demo@example.com",
+        "cui": cui,
+        "numar_angajati": employees,
+        "varsta_dezvoltator": rng.randint(22, 60),
+        **{key: "" for key in FIRM_FORM_KEYS},
+    })
+    firm["additional_info_1"] = f"Dorim finanțare pentru {TOPICS[topic][0]}."
+    return firm
+
+
+def synthetic_firms(n: int, seed: int = 0) -> List[Dict[str, Any]]:
+    return [synthetic_firm(f"{10_000_000 + i}", seed + i) for i in range(n)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic sources.json catalogue.")
+    parser.add_argument("--opportunities", type=int, default=1000)
+    parser.add_argument("--raw-text-chars", type=int, default=RAW_TEXT_MEDIAN_CHARS,
+                        help="Median raw_text size (log-normal).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", required=True, help="Path of the sources.json to write.")
+    args = parser.parse_args()
+
+    combined = synthetic_catalogue(args.opportunities, args.seed, args.raw_text_chars)
+    path = Path(args.output)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as f:
+        json.dump(combined, f, ensure_ascii=False)
+    print(f"Wrote {args.opportunities} opportunities → {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# benchmarks/vector_search.py
+"""
+Throughput of OpportunityVectorStore.search_many vs. a loop over search()
+on a synthetic index (random unit vectors, fake embeddings: only the
+in-memory scoring is measured).
+
+    python -m benchmarks.vector_search
+    python -m benchmarks.vector_search --rows 100000 --queries 2000 --dim 1536
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from rag.vector_store import OpportunityVectorStore
+
+TYPES = ("grant", "vc", "accelerator")
+CAEN_CODES = ("6201", "6202", "7022", "4711", "2511", "5610")
+
+
+def synthetic_index(rows: int, dim: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    embeddings = rng.standard_normal((rows, dim), dtype="float32")
+    metadata = [
+        {
+            "id": f"synthetic-{i}",
+            "type": TYPES[i % len(TYPES)],
+            "title": f"Synthetic opportunity {i}",
+            "eligible_caen_codes": [CAEN_CODES[i % len(CAEN_CODES)]] if i % 4 else [],
+        }
+        for i in range(rows)
+    ]
+    return embeddings, metadata
+
+
+class FakeEmbeddings:
+    """Deterministic query vectors, used as the store's embedder."""
+
+    def __init__(self, dim: int, seed: int = 1):
+        self.dim = dim
+        self.rng = np.random.default_rng(seed)
+        self.calls = 0
+
+    def embed_text(self, text: str) -> List[float]:
+        self.calls += 1
+        return self.rng.standard_normal(self.dim).tolist()
+
+    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        return self.rng.standard_normal((len(texts), self.dim)).tolist()
+
+
+def run(rows: int, queries: int, dim: int, top_k: int, filtered: bool) -> Dict[str, Any]:
+    embeddings, metadata = synthetic_index(rows, dim)
+    fake = FakeEmbeddings(dim)
+    store = OpportunityVectorStore.from_arrays(embeddings, metadata, embedder=fake)
+    texts = [f"firm profile {i}" for i in range(queries)]
+    filters = (
+        [{"type": TYPES[i % len(TYPES)], "caen": CAEN_CODES[i % len(CAEN_CODES)]} for i in range(queries)]
+        if filtered else None
+    )
+
+    started = time.perf_counter()
+    for i, text in enumerate(texts):
+        f = filters[i] if filters else {}
+        store.search(text, top_k, filter_type=f.get("type"), filter_caen=f.get("caen"))
+    loop_s = time.perf_counter() - started
+    loop_calls = fake.calls
+
+    fake.calls = 0
+    started = time.perf_counter()
+    store.search_many(texts, top_k, filters)
+    many_s = time.perf_counter() - started
+    many_calls = fake.calls
+
+    return {
+        "rows": rows,
+        "queries": queries,
+        "dim": dim,
+        "top_k": top_k,
+        "filtered": filtered,
+        "loop": {"seconds": round(loop_s, 4), "queries_per_s": round(queries / loop_s, 1), "embed_calls": loop_calls},
+        "search_many": {"seconds": round(many_s, 4), "queries_per_s": round(queries / many_s, 1), "embed_calls": many_calls},
+        "speedup": round(loop_s / many_s, 2) if many_s else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark search_many vs. looping over search.")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--output", help="Write results JSON to this file.")
+    args = parser.parse_args()
+
+    results = [run(args.rows, args.queries, args.dim, args.top_k, filtered) for filtered in (False, True)]
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
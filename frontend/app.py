@@ -1,7 +1,7 @@
 # inainte de demo:
 # 0.in .env pui api key nou de openapi
 # 1.stergi data/generated/<cui>/*
-# 2.stergi outputs/<cui>/match_opportunities.json
+# 2.stergi outputs/<cui>/ si randurile firmei din outputs/matches.sqlite
 # 3.source .venv/bin/activate
 # 4.source .env
 # 5.rulezi python3 app.py DIN FOLDERUL frontend
@@ -19,6 +19,8 @@ from flask import (
     url_for,
     render_template,
     send_from_directory,
+    g,
+    Response,
 )
 import sys
 import requests
@@ -27,8 +29,15 @@ import re
 import json
 import os
 import copy
-from datetime import datetime
 import subprocess
+from datetime import date
+
+# app.py rulează din frontend/, adăugăm root-ul proiectului ca să putem
+# importa pachetul `rag`
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from rag import catalogue, deadlines, match_store, tracing  # noqa: E402
+from rag.match_state import needs_rematch  # noqa: E402
 
 
 app = Flask(__name__, template_folder="../templates/", static_folder="../public/")
@@ -43,6 +52,10 @@ MATCH_SCRIPT = os.path.join(BASE_DIR, "..", "rag", "run_match_opp.py")
 # fișierul cu descrierile oficiale ale oportunităților
 SOURCES_PATH = os.path.join(BASE_DIR, "..", "data", "opportunities", "sources.json")
 
+# câte recomandări arată /grants; toate perechile evaluate rămân în
+# outputs/matches.sqlite (rag.match_store), top-ul se aplică la citire
+MATCH_TOP_K = 5
+
 
 # ------------------- USERS & PERSISTENȚĂ -------------------
 
@@ -168,15 +181,20 @@ def run_request_script():
 
     try:
         # rulează cu același interpreter de Python ca aplicația Flask
-        subprocess.Popen([sys.executable, REQUEST_SCRIPT])
+        subprocess.Popen([sys.executable, REQUEST_SCRIPT], env=tracing.child_env())
     except Exception as e:
         print(f"Error starting request.py: {e}")
 
 
-def run_match_opp(cui: str):
+def run_match_opp(cui: str, force: bool = False):
     """
     Rulează modulul rag.run_match_opp cu:
-      python -m rag.run_match_opp --cif <cui> --top-k 5
+      python -m rag.run_match_opp --cif <cui> --top-k MATCH_TOP_K
+
+    Fără force, nu pornește nimic dacă rezultatele salvate (rag.run_batch_match
+    sau o rulare anterioară) sunt la zi cu firma, catalogul și termenele
+    (rag.match_state.needs_rematch); altfel rularea re-evaluează doar
+    perechile afectate.
 
     Structură așteptată:
       <project_root>/
@@ -196,6 +214,12 @@ def run_match_opp(cui: str):
         print(f"[run_match_opp] {cui_json} not found, skipping.")
         return
 
+    with tracing.span("frontend.needs_rematch", cui=str(cui)) as span:
+        stale = force or needs_rematch(cui)
+        span.set(stale=stale)
+    if not stale:
+        return
+
     # root-ul proiectului (un nivel mai sus de frontend/)
     project_root = os.path.join(BASE_DIR, "..")
 
@@ -205,67 +229,43 @@ def run_match_opp(cui: str):
         return
 
     try:
-        subprocess.Popen(
-            [
-                sys.executable,
-                "-m",
-                "rag.run_match_opp",  # 👈 modulul, cu doi de p
-                "--cif",
-                str(cui),
-                "--top-k",
-                "5",
-            ],
-            cwd=project_root,  # rulează din root-ul proiectului
-        )
+        with tracing.span("frontend.start_match", cui=str(cui)):
+            subprocess.Popen(
+                [
+                    sys.executable,
+                    "-m",
+                    "rag.run_match_opp",  # 👈 modulul, cu doi de p
+                    "--cif",
+                    str(cui),
+                    "--top-k",
+                    str(MATCH_TOP_K),
+                ],
+                cwd=project_root,  # rulează din root-ul proiectului
+                env=tracing.child_env(),  # subprocesul continuă trace-ul cererii
+            )
         print(f"[run_match_opp] Started rag.run_match_opp for CUI={cui}")
     except Exception as e:
         print(f"[run_match_opp] Error starting rag.run_match_opp: {e}")
 
 
 def load_sources():
-    """Încarcă ../data/opportunities/sources.json."""
-    if not os.path.exists(SOURCES_PATH):
+    """
+    Încarcă catalogul de oportunități (câmpurile structurate, fără raw_text).
+    Catalogul SQLite e construit din sources.json la prima utilizare.
+    """
+    if not os.path.exists(SOURCES_PATH) and not catalogue.CATALOGUE_DB.exists():
         print(f"Warning: sources.json not found at {SOURCES_PATH}")
         return {}
     try:
-        with open(SOURCES_PATH, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return catalogue.load_grouped()
     except Exception as e:
-        print("Error loading sources.json:", e)
+        print("Error loading catalogue:", e)
         return {}
 
 
 SOURCES = load_sources()
 
 
-def parse_date_to_dateobj(raw):
-    """
-    Primește string de dată (ex: '2025-11-07', '2026-01-12T17:00:00+01:00')
-    și întoarce un datetime.date sau None.
-    """
-    if not raw or not isinstance(raw, str):
-        return None
-
-    s = raw.strip()
-    if s.lower() == "continuous":
-        return None
-
-    # Încercăm ISO full (inclusiv cu offset)
-    try:
-        # fromisoformat știe și de 'YYYY-MM-DD' și de 'YYYY-MM-DDTHH:MM:SS+HH:MM'
-        dt = datetime.fromisoformat(s.replace("Z", ""))
-        return dt.date()
-    except ValueError:
-        pass
-
-    # Încercăm doar primele 10 caractere (YYYY-MM-DD)
-    try:
-        dt = datetime.strptime(s[:10], "%Y-%m-%d")
-        return dt.date()
-    except ValueError:
-        return None
-
-
 def format_dmy(date_obj):
     """Formatăm data în stil european: zi.lună.an (ex: 07.11.2025)."""
     if not date_obj:
@@ -273,38 +273,64 @@ def format_dmy(date_obj):
     return date_obj.strftime("%d.%m.%Y")
 
 
+def format_application_period(record):
+    """
+    Perioada de aplicare (cea mai veche → cea mai nouă dată), din datele
+    normalizate la construirea catalogului (rag.deadlines), fără parsare.
+    """
+    start, end = deadlines.application_period(record)
+    if not start:
+        return ""
+    if start == end:
+        return format_dmy(start)
+    return f"{format_dmy(start)} → {format_dmy(end)}"
+
+
 def find_source_by_id(grant_id: str):
-    """Caută grantul după id în `grants`, `vcs`, `accelerators` din sources.json."""
-    data = SOURCES or {}
-    for key in ("grants", "vcs", "accelerators"):
-        for item in data.get(key, []):
-            if str(item.get("id")) == str(grant_id):
-                return item
-    return None
+    """Caută grantul după id în catalog (grants, vcs, accelerators)."""
+    try:
+        return catalogue.get_opportunity(grant_id)
+    except Exception as e:
+        print("Error reading catalogue:", e)
+        return None
 
 
 def load_match_opportunities(cui: str):
     """
-    Încărcă ../outputs/<cui>/match_opportunities.json.
+    Încarcă primele MATCH_TOP_K match-uri deschise azi ale firmei din
+    outputs/matches.sqlite (rag.match_store; apelurile închise sunt filtrate
+    înainte de LIMIT); dacă firma nu are încă perechi acolo, din
+    ../outputs/<cui>/match_opportunities.json, fără apelurile închise.
 
     Returnează:
-      - None  -> fișierul NU există (show loading page)
+      - None  -> nu există rezultate (show loading page)
       - []    -> fișierul există dar nu are rezultate / e gol
       - [..]  -> listă de match-uri valide
     """
     if not cui:
         return None
 
+    try:
+        with tracing.span("frontend.load_matches", cui=str(cui), source="store") as span:
+            stored = match_store.query_matches(cui, top_k=MATCH_TOP_K, open_on=date.today())
+            span.set(matches=len(stored))
+        # [] când toate perechile salvate sunt închise: nu cădem pe JSON-ul vechi
+        if stored or match_store.has_scores(cui):
+            return stored
+    except Exception as e:
+        print(f"Error reading match store for CUI {cui}: {e}")
+
     path = os.path.join(BASE_DIR, "..", "outputs", str(cui), "match_opportunities.json")
     if not os.path.exists(path):
         # fișierul nu există încă -> vrem pagina de loading
         return None
 
     try:
-        with open(path, "r", encoding="utf-8") as f:
+        with tracing.span("frontend.load_matches", cui=str(cui)) as span, open(path, "r", encoding="utf-8") as f:
             data = json.load(f)
+            span.set(matches=len(data) if isinstance(data, list) else 0)
         if isinstance(data, list):
-            return data
+            return drop_expired(data)
         return []
     except Exception as e:
         print(f"Error loading match_opportunities for CUI {cui}: {e}")
@@ -312,6 +338,60 @@ def load_match_opportunities(cui: str):
         return []
 
 
+def drop_expired(matches):
+    """
+    Scoate match-urile al căror termen a trecut, după indexul de termene al
+    catalogului (rag.deadlines.DeadlineIndex), fără să parseze datele. Doar
+    pentru match_opportunities.json; rag.match_store filtrează în query.
+    """
+    index = catalogue.deadline_index()
+    return [
+        m for m in matches
+        if str(m.get("id")) not in index or index.is_open(str(m.get("id")))
+    ]
+
+
+def find_match(cui: str, grant_id: str):
+    """
+    Match-ul firmei pentru o oportunitate, inclusiv pentru cele din afara
+    top-ului de pe /grants (toate perechile sunt în rag.match_store).
+    """
+    if not cui:
+        return None
+    try:
+        match = match_store.get_match(cui, grant_id)
+    except Exception as e:
+        print(f"Error reading match store for CUI {cui}: {e}")
+        match = None
+    if match is None:
+        matches = load_match_opportunities(cui) or []
+        match = next((m for m in matches if str(m.get("id")) == str(grant_id)), None)
+    return match
+
+
+def split_requirements(criteria, match):
+    """
+    Combină criteriile de eligibilitate ale oportunității cu verdictele
+    regulilor verificate local (deadline, CAEN, regiune, mărime firmă).
+
+    Returnează (requirements, met_requirements, unmet_requirements):
+      - regulile trecute        -> met
+      - regulile picate/necunoscute -> unmet
+      - criteriile text         -> met dacă firma e eligibilă, altfel unmet
+    """
+    criteria = list(criteria or [])
+    match = match or {}
+    passed = list(match.get("passed_rules") or [])
+    failed = list(match.get("failed_rules") or [])
+    unknown = list(match.get("unknown_rules") or [])
+    eligibility = bool(match.get("eligibility", False))
+
+    requirements = failed + unknown + passed + criteria
+    met = passed + (criteria if eligibility else [])
+    unmet = failed + unknown + ([] if eligibility else criteria)
+    return requirements, met, unmet
+
+
 def build_list_grants_from_matches(matches):
     """
     Pentru pagina /grants: mapăm direct din match_opportunities.json:
@@ -343,23 +423,11 @@ def build_list_grants_from_matches(matches):
             num_docs_int = 0
 
         # application period din deadlines: cea mai veche → cea mai nouă
-        deadlines = m.get("deadlines") or []
-        date_objs = []
-        for d in deadlines:
-            dt = parse_date_to_dateobj(d.get("date"))
-            if dt:
-                date_objs.append(dt)
-
-        application_period = ""
-        if date_objs:
-            start = min(date_objs)
-            end = max(date_objs)
-            if start == end:
-                application_period = format_dmy(start)
-            else:
-                application_period = f"{format_dmy(start)} → {format_dmy(end)}"
-
-        requirements = m.get("eligibility_criteria") or []
+        application_period = format_application_period(m)
+
+        requirements, met_requirements, unmet_requirements = split_requirements(
+            m.get("eligibility_criteria"), m
+        )
 
         grants.append(
             {
@@ -367,8 +435,8 @@ def build_list_grants_from_matches(matches):
                 "title": m.get("title"),
                 "description": None,
                 "requirements": requirements,
-                "met_requirements": [],
-                "unmet_requirements": requirements,
+                "met_requirements": met_requirements,
+                "unmet_requirements": unmet_requirements,
                 "sum_eur": sum_eur,
                 "funding_raw": funding_raw,
                 "required_documents": [
@@ -438,22 +506,8 @@ def build_grant_from_source_and_match(source, match):
         sum_eur = float(cash_stipend)
 
     # perioada aplicare din deadlines sau câmpuri text
-    application_period = ""
-    deadlines = source.get("deadlines") or []
-    date_objs = []
-    for d in deadlines:
-        dt = parse_date_to_dateobj(d.get("date"))
-        if dt:
-            date_objs.append(dt)
-
-    if date_objs:
-        start = min(date_objs)
-        end = max(date_objs)
-        if start == end:
-            application_period = format_dmy(start)
-        else:
-            application_period = f"{format_dmy(start)} → {format_dmy(end)}"
-    else:
+    application_period = format_application_period(source)
+    if not application_period:
         # fallback pe câmpuri text, fără oră
         raw_period = (
             source.get("application_period")
@@ -473,12 +527,10 @@ def build_grant_from_source_and_match(source, match):
         match_reasons = match.get("match_reasons") or []
         eligibility = bool(match.get("eligibility", False))
 
-    if eligibility and requirements:
-        met_requirements = requirements
-        unmet_requirements = []
-    else:
-        met_requirements = []
-        unmet_requirements = requirements
+    # verdictele regulilor locale (CAEN, regiune, deadline...) + criteriile text
+    requirements, met_requirements, unmet_requirements = split_requirements(
+        requirements, match
+    )
 
     title = source.get("title") or source.get("name") or "Untitled"
     description = source.get("summary") or ""
@@ -514,6 +566,41 @@ def get_current_user():
     return None
 
 
+# ------------------- Tracing -------------------
+
+
+@app.before_request
+def start_request_span():
+    """Un span per cerere (RAG_TRACE); subprocesele pornite din ea îl continuă."""
+    if tracing.enabled() and request.endpoint not in ("static", "metrics"):
+        g.trace_span = tracing.span(f"http {request.method} {request.url_rule or request.path}",
+                                    path=request.path)
+        g.trace_span.__enter__()
+
+
+@app.after_request
+def tag_request_span(response):
+    span = g.pop("trace_span", None)
+    if span is not None:
+        span.set(status_code=response.status_code)
+        span.__exit__(None, None, None)
+    return response
+
+
+@app.teardown_request
+def close_request_span(exc):
+    # after_request nu rulează când view-ul aruncă o excepție
+    span = g.pop("trace_span", None)
+    if span is not None:
+        span.__exit__(type(exc) if exc else None, exc, None)
+
+
+@app.route("/metrics")
+def metrics():
+    """Metrici Prometheus din span-uri (toate procesele care scriu în fișierul RAG_TRACE)."""
+    return Response(tracing.metrics_text(), mimetype="text/plain; version=0.0.4")
+
+
 # ------------------- Routes -------------------
 
 
@@ -626,7 +713,7 @@ def account():
 
         # dacă user-ul a apăsat "Find grants", rulăm și matcher-ul RAG
         if action == "find_grants":
-            run_match_opp(user.get("cui"))
+            run_match_opp(user.get("cui"), force=True)
             return redirect(url_for("grants"))
 
         message = "Changes saved successfully!"
@@ -642,8 +729,8 @@ def grants():
 
     cui = user.get("cui")
 
-    # la fiecare acces la /grants, dacă avem <cui>.json,
-    # pornim scriptul de matching cu RAG
+    # rezultatele vin precalculate (rag.run_batch_match); matching-ul pornește
+    # doar dacă firma, catalogul sau termenele s-au schimbat între timp
     run_match_opp(cui)
 
     matches = load_match_opportunities(cui)
@@ -673,7 +760,8 @@ def grants():
             ),
         )
 
-    return render_template("grants.html", grants=sorted_grants, user=user)
+    with tracing.span("frontend.render", template="grants.html", grants=len(sorted_grants)):
+        return render_template("grants.html", grants=sorted_grants, user=user)
 
 
 @app.route("/grants/<grant_id>")
@@ -681,8 +769,7 @@ def grant_detail(grant_id):
     user = get_current_user()
 
     cui = user.get("cui") if user else None
-    matches = load_match_opportunities(cui) if cui else []
-    match = next((m for m in matches if str(m.get("id")) == str(grant_id)), None)
+    match = find_match(cui, grant_id)
 
     source = find_source_by_id(grant_id)
     grant = None
@@ -701,7 +788,8 @@ def grant_detail(grant_id):
     if not grant:
         return "Grant not found", 404
 
-    return render_template("grant_detail.html", grant=grant, user=user)
+    with tracing.span("frontend.render", template="grant_detail.html"):
+        return render_template("grant_detail.html", grant=grant, user=user)
 
 
 @app.route("/grants/<grant_id>/documents")
@@ -713,8 +801,7 @@ def grant_documents(grant_id):
     cui = user.get("cui")
 
     # încercăm să reconstruim grant-ul ca înainte
-    matches = load_match_opportunities(cui) if cui else []
-    match = next((m for m in matches if str(m.get("id")) == str(grant_id)), None)
+    match = find_match(cui, grant_id)
 
     source = find_source_by_id(grant_id)
     grant = None
@@ -744,6 +831,7 @@ def grant_documents(grant_id):
                 str(grant_id),
             ],
             cwd=project_root,  # IMPORTANT: ensures the package `rag` is importable
+            env=tracing.child_env(),
         )
 
         print(
@@ -0,0 +1,154 @@
+# rag/ann_index.py
+"""
+Inverted-file (IVF) approximate nearest-neighbour index in NumPy.
+
+Rows (unit vectors) are clustered with spherical k-means into `n_lists`
+lists; a query scores the centroids, scans only the `n_probe` closest lists
+and ranks those rows exactly. Higher n_probe = better recall, slower query.
+
+Also the reduced-dimension copy used for two-stage search (coarse_rows):
+text-embedding-3 vectors are trained so that a prefix of the dimensions,
+re-normalised, is still a usable embedding, and every coordinate of the
+local backend is an independent random projection, so truncation works for
+both backends.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+
+KMEANS_ITERATIONS = 20
+# k-means is trained on at most this many rows per list
+TRAIN_ROWS_PER_LIST = 64
+DEFAULT_N_PROBE = 8
+# rows x centroids block when assigning rows to lists, in float32 cells
+ASSIGN_BLOCK_CELLS = 16 * 1024 * 1024
+
+# two-stage search: score `COARSE_DIM` leading dimensions first, rescore a
+# shortlist of max(top_k * RERANK_FACTOR, RERANK_MIN_SHORTLIST) at full width
+COARSE_DIM = 256
+RERANK_FACTOR = 10
+RERANK_MIN_SHORTLIST = 100
+# index_builder skips the coarse copy for smaller catalogues, a full-width
+# scan of them takes well under a millisecond
+COARSE_MIN_ROWS = 10000
+
+
+def default_n_lists(n_rows: int) -> int:
+    return max(1, int(np.sqrt(n_rows)))
+
+
+def _assign(rows: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    block = max(1, ASSIGN_BLOCK_CELLS // max(1, len(centroids)))
+    out = np.empty(len(rows), dtype="int32")
+    for start in range(0, len(rows), block):
+        out[start:start + block] = np.argmax(rows[start:start + block] @ centroids.T, axis=1)
+    return out
+
+
+def _normalise(matrix: np.ndarray) -> np.ndarray:
+    return matrix / (np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-10)
+
+
+def coarse_rows(rows: np.ndarray, dim: int = COARSE_DIM) -> np.ndarray:
+    """Leading `dim` dimensions of each row, re-normalised to unit length."""
+    return _normalise(np.asarray(rows[:, :dim], dtype="float32")).astype("float32")
+
+
+def rerank_shortlist(top_k: int) -> int:
+    return max(top_k * RERANK_FACTOR, RERANK_MIN_SHORTLIST)
+
+
+class IVFIndex:
+    def __init__(self, centroids: np.ndarray, list_offsets: np.ndarray, list_rows: np.ndarray):
+        self.centroids = centroids.astype("float32")
+        # rows of list l are list_rows[list_offsets[l]:list_offsets[l + 1]]
+        self.list_offsets = list_offsets.astype("int64")
+        self.list_rows = list_rows.astype("int64")
+
+    @property
+    def n_lists(self) -> int:
+        return len(self.centroids)
+
+    @classmethod
+    def build(
+        cls,
+        unit_rows: np.ndarray,
+        n_lists: Optional[int] = None,
+        n_iter: int = KMEANS_ITERATIONS,
+        seed: int = 0,
+    ) -> "IVFIndex":
+        n = len(unit_rows)
+        n_lists = min(n_lists or default_n_lists(n), n)
+        rng = np.random.default_rng(seed)
+
+        train_size = min(n, n_lists * TRAIN_ROWS_PER_LIST)
+        train = unit_rows[rng.choice(n, train_size, replace=False)] if train_size < n else unit_rows
+        centroids = train[rng.choice(len(train), n_lists, replace=False)].copy()
+
+        for _ in range(n_iter):
+            labels = _assign(train, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, train)
+            counts = np.bincount(labels, minlength=n_lists)
+            empty = counts == 0
+            # re-seed empty lists with random training rows
+            sums[empty] = train[rng.choice(len(train), int(empty.sum()))]
+            centroids = _normalise(sums).astype("float32")
+
+        labels = _assign(unit_rows, centroids)
+        order = np.argsort(labels, kind="stable")
+        counts = np.bincount(labels, minlength=n_lists)
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        return cls(centroids, offsets, order)
+
+    def save(self, path: Path):
+        np.savez(path, centroids=self.centroids, list_offsets=self.list_offsets, list_rows=self.list_rows)
+
+    @classmethod
+    def load(cls, path: Path) -> "IVFIndex":
+        data = np.load(path)
+        return cls(data["centroids"], data["list_offsets"], data["list_rows"])
+
+    def _probe_rows(self, query: np.ndarray, n_probe: int) -> np.ndarray:
+        n_probe = min(n_probe, self.n_lists)
+        scores = self.centroids @ query
+        if n_probe < self.n_lists:
+            lists = np.argpartition(-scores, n_probe - 1)[:n_probe]
+        else:
+            lists = np.arange(self.n_lists)
+        return np.concatenate(
+            [self.list_rows[self.list_offsets[l]:self.list_offsets[l + 1]] for l in lists]
+        )
+
+    def search(
+        self,
+        unit_rows: np.ndarray,
+        query: np.ndarray,
+        top_k: int,
+        n_probe: int = DEFAULT_N_PROBE,
+        mask: Optional[np.ndarray] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (row indices, similarities) of the approximate top_k for a unit
+        query. `mask` (bool per row) restricts the result to filtered rows;
+        probing widens until top_k filtered rows are found or every list
+        was scanned.
+        """
+        while True:
+            candidates = self._probe_rows(query, n_probe)
+            if mask is not None:
+                candidates = candidates[mask[candidates]]
+            if len(candidates) >= top_k or n_probe >= self.n_lists:
+                break
+            n_probe *= 2
+
+        if not len(candidates):
+            return np.empty(0, dtype="int64"), np.empty(0, dtype="float32")
+        sims = unit_rows[candidates] @ query
+        k = min(top_k, len(candidates))
+        top = np.argpartition(-sims, k - 1)[:k] if k < len(candidates) else np.arange(len(candidates))
+        top = top[np.argsort(-sims[top])]
+        return candidates[top], sims[top]
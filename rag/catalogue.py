@@ -0,0 +1,255 @@
+# rag/catalogue.py
+"""
+Opportunity catalogue storage.
+
+sources.json is compiled into two SQLite files:
+  - catalogue.sqlite: one row per opportunity with the structured fields
+    (everything except raw_text, plus the deadlines normalised by
+    rag.deadlines) as compact JSON, loaded at startup
+  - raw_text.sqlite: zlib-compressed raw_text blobs, fetched one at a time
+    only when a prompt needs the full official text
+
+so process startup and memory no longer scale with the crawled text.
+"""
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import zlib
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from . import tracing
+from .deadlines import DeadlineIndex, normalize_deadlines
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+DATA_DIR = BASE_DIR / "data" / "opportunities"
+
+SOURCES_FILE = DATA_DIR / "sources.json"
+CATALOGUE_DB = DATA_DIR / "catalogue.sqlite"
+RAW_TEXT_DB = DATA_DIR / "raw_text.sqlite"
+
+KINDS = ("grants", "vcs", "accelerators")
+
+# in-process cache of the structured rows and their deadline index,
+# invalidated by the db mtime; the index is swept of closed calls once a day
+_cache: Dict[str, Any] = {"mtime_ns": None, "rows": [], "by_id": {}, "deadlines": DeadlineIndex({}), "swept_on": None}
+
+
+def _connect(path: Path) -> sqlite3.Connection:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return sqlite3.connect(str(path))
+
+
+def _init_schema(conn: sqlite3.Connection, raw_conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS opportunities (
+            id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            type TEXT,
+            position INTEGER NOT NULL,
+            record TEXT NOT NULL
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_opportunities_type ON opportunities(type)")
+    conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+    raw_conn.execute("CREATE TABLE IF NOT EXISTS raw_text (id TEXT PRIMARY KEY, text BLOB)")
+
+
+def _split_record(op: Dict[str, Any]) -> tuple[str, Optional[bytes]]:
+    record = {k: v for k, v in op.items() if k != "raw_text"}
+    record.update(normalize_deadlines(op))
+    raw_text = op.get("raw_text")
+    record["raw_text_chars"] = len(raw_text) if isinstance(raw_text, str) else 0
+    blob = zlib.compress(raw_text.encode("utf-8")) if raw_text else None
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":")), blob
+
+
+def write_catalogue(
+    combined: Dict[str, List[Dict[str, Any]]],
+    version: Optional[int] = None,
+    only_ids: Optional[Iterable[str]] = None,
+    removed_ids: Iterable[str] = (),
+) -> None:
+    """
+    Write the combined sources structure into the SQLite catalogue.
+
+    With only_ids/removed_ids (a change-set from parse_input.compile_sources)
+    only those rows are upserted/deleted; otherwise the catalogue is rebuilt.
+    """
+    conn = _connect(CATALOGUE_DB)
+    raw_conn = _connect(RAW_TEXT_DB)
+    try:
+        _init_schema(conn, raw_conn)
+        wanted = set(only_ids) if only_ids is not None else None
+        if wanted is None:
+            conn.execute("DELETE FROM opportunities")
+            raw_conn.execute("DELETE FROM raw_text")
+
+        position = 0
+        for kind in KINDS:
+            for op in combined.get(kind, []):
+                position += 1
+                op_id = op.get("id")
+                if not op_id or (wanted is not None and op_id not in wanted):
+                    continue
+                record, blob = _split_record(op)
+                conn.execute(
+                    "INSERT OR REPLACE INTO opportunities (id, kind, type, position, record) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (op_id, kind, op.get("type"), position, record),
+                )
+                if blob is None:
+                    raw_conn.execute("DELETE FROM raw_text WHERE id = ?", (op_id,))
+                else:
+                    raw_conn.execute(
+                        "INSERT OR REPLACE INTO raw_text (id, text) VALUES (?, ?)", (op_id, blob)
+                    )
+
+        for op_id in removed_ids:
+            conn.execute("DELETE FROM opportunities WHERE id = ?", (op_id,))
+            raw_conn.execute("DELETE FROM raw_text WHERE id = ?", (op_id,))
+
+        if version is not None:
+            conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('version', ?)", (str(version),)
+            )
+        raw_conn.commit()
+        conn.commit()
+    finally:
+        conn.close()
+        raw_conn.close()
+
+
+def _ensure_catalogue() -> bool:
+    """
+    Build the SQLite catalogue from sources.json the first time it is needed,
+    and rebuild it when sources.json is newer than it: replaced by a data
+    pull, an edit or build_combined_sources rather than by
+    parse_input.compile_sources, which writes the catalogue right after.
+    """
+    if not SOURCES_FILE.exists():
+        return CATALOGUE_DB.exists()
+    stale = CATALOGUE_DB.exists()
+    if stale and os.stat(CATALOGUE_DB).st_mtime_ns >= os.stat(SOURCES_FILE).st_mtime_ns:
+        return True
+    with tracing.span("catalogue.build", source=SOURCES_FILE.name, stale=stale):
+        with SOURCES_FILE.open("r", encoding="utf-8") as f:
+            combined = json.load(f)
+        write_catalogue(combined)
+    if stale:
+        print(f"[catalogue] {SOURCES_FILE} is newer than {CATALOGUE_DB}, rebuilt it")
+    else:
+        print(f"[catalogue] Built {CATALOGUE_DB} from {SOURCES_FILE}")
+    return True
+
+
+def _rows() -> List[Dict[str, Any]]:
+    if not _ensure_catalogue():
+        return []
+    mtime_ns = os.stat(CATALOGUE_DB).st_mtime_ns
+    if _cache["mtime_ns"] != mtime_ns:
+        with tracing.span("catalogue.load") as span:
+            conn = sqlite3.connect(str(CATALOGUE_DB))
+            try:
+                rows = conn.execute(
+                    "SELECT kind, record FROM opportunities ORDER BY position"
+                ).fetchall()
+            finally:
+                conn.close()
+            _cache["rows"] = [(kind, json.loads(record)) for kind, record in rows]
+            _cache["by_id"] = {str(r.get("id")): r for _, r in _cache["rows"] if r.get("id")}
+            # ids merged into a canonical record by rag.dedup still resolve
+            for _, r in _cache["rows"]:
+                for dup_id in r.get("duplicate_ids") or []:
+                    _cache["by_id"].setdefault(str(dup_id), r)
+            _cache["deadlines"] = DeadlineIndex.from_opportunities(r for _, r in _cache["rows"])
+            _cache["swept_on"] = None
+            _cache["mtime_ns"] = mtime_ns
+            span.set(rows=len(rows))
+    if _cache["swept_on"] != date.today():
+        expired = _cache["deadlines"].sweep()
+        if expired:
+            print(f"[catalogue] {len(expired)} opportunities past their deadline")
+        _cache["swept_on"] = date.today()
+    return _cache["rows"]
+
+
+def catalogue_version() -> int:
+    if not _ensure_catalogue():
+        return 0
+    conn = sqlite3.connect(str(CATALOGUE_DB))
+    try:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+    finally:
+        conn.close()
+    return int(row[0]) if row else 0
+
+
+def load_grouped() -> Dict[str, List[Dict[str, Any]]]:
+    """Structured records grouped like sources.json (without raw_text)."""
+    grouped: Dict[str, List[Dict[str, Any]]] = {kind: [] for kind in KINDS}
+    for kind, record in _rows():
+        grouped.setdefault(kind, []).append(record)
+    return grouped
+
+
+def load_opportunities(opp_type: Optional[str] = None) -> List[Dict[str, Any]]:
+    """All structured records (without raw_text), optionally of one type."""
+    return [
+        record for _, record in _rows()
+        if opp_type is None or record.get("type") == opp_type
+    ]
+
+
+def deadline_index() -> DeadlineIndex:
+    """Closing dates of the catalogue (rag.deadlines.DeadlineIndex), swept today."""
+    _rows()
+    return _cache["deadlines"]
+
+
+def load_open_opportunities(opp_type: Optional[str] = None, today: Optional[date] = None) -> List[Dict[str, Any]]:
+    """load_opportunities() without the calls whose deadline has passed."""
+    index = deadline_index()
+    return [
+        record for record in load_opportunities(opp_type)
+        if index.is_open(str(record.get("id")), today)
+    ]
+
+
+def load_opportunities_by_id() -> Dict[str, Dict[str, Any]]:
+    _rows()
+    return dict(_cache["by_id"])
+
+
+def get_raw_text(opportunity_id: str) -> str:
+    if not RAW_TEXT_DB.exists():
+        return ""
+    conn = sqlite3.connect(str(RAW_TEXT_DB))
+    try:
+        row = conn.execute(
+            "SELECT text FROM raw_text WHERE id = ?", (str(opportunity_id),)
+        ).fetchone()
+    finally:
+        conn.close()
+    return zlib.decompress(row[0]).decode("utf-8") if row else ""
+
+
+def with_raw_text(op: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of a structured record with raw_text loaded from the blob store."""
+    full = {k: v for k, v in op.items() if k != "raw_text_chars"}
+    if op.get("raw_text_chars"):
+        full["raw_text"] = get_raw_text(op["id"])
+    return full
+
+
+def get_opportunity(opportunity_id: str, include_raw_text: bool = False) -> Optional[Dict[str, Any]]:
+    _rows()
+    record = _cache["by_id"].get(str(opportunity_id))
+    if record is None:
+        return None
+    return with_raw_text(record) if include_raw_text else record
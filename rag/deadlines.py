@@ -0,0 +1,191 @@
+# rag/deadlines.py
+"""
+Deadline parsing and the deadline index.
+
+The free-form deadline strings of a record are parsed once, when the
+catalogue is compiled: normalize_deadlines() adds first_date / last_date /
+closes_on (ISO dates) to every catalogue record, and closes_on() /
+application_period() read those instead of parsing again. DeadlineIndex
+keeps the closing dates in a sorted list for "open today", "closing within N
+days" and expiry sweeps.
+"""
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from sortedcontainers import SortedList
+
+# labels that mark the submission deadline (vs. opening / info-day dates)
+CLOSING_LABELS = ("deadline", "closing", "close", "termen", "limita", "sfarsit", "end")
+
+# normalised fields stored with each catalogue record
+DATE_FIELDS = ("first_date", "last_date", "closes_on")
+
+
+def parse_deadline_date(raw: Any) -> Optional[date]:
+    """
+    '2025-11-07', '2026-01-12T17:00:00+01:00' -> date;
+    'continuous', None or unparsable strings -> None.
+    """
+    if not raw or not isinstance(raw, str):
+        return None
+
+    s = raw.strip()
+    if s.lower() == "continuous":
+        return None
+
+    try:
+        return datetime.fromisoformat(s.replace("Z", "")).date()
+    except ValueError:
+        pass
+
+    try:
+        return datetime.strptime(s[:10], "%Y-%m-%d").date()
+    except ValueError:
+        return None
+
+
+def deadline_dates(op: Dict[str, Any]) -> List[date]:
+    dates = []
+    for d in op.get("deadlines") or []:
+        if isinstance(d, dict):
+            dt = parse_deadline_date(d.get("date"))
+            if dt:
+                dates.append(dt)
+    return dates
+
+
+def closing_date(op: Dict[str, Any]) -> Optional[date]:
+    """
+    Submission deadline of an opportunity: the latest date labelled as a
+    deadline, or the latest date at all; None for continuous calls.
+    """
+    labelled = []
+    for d in op.get("deadlines") or []:
+        if not isinstance(d, dict):
+            continue
+        label = str(d.get("label") or "").lower()
+        dt = parse_deadline_date(d.get("date"))
+        if dt and any(word in label for word in CLOSING_LABELS):
+            labelled.append(dt)
+    if labelled:
+        return max(labelled)
+    dates = deadline_dates(op)
+    return max(dates) if dates else None
+
+
+def normalize_deadlines(op: Dict[str, Any]) -> Dict[str, Optional[str]]:
+    """The DATE_FIELDS of a record, as ISO dates (None when unknown / continuous)."""
+    dates = deadline_dates(op)
+    closes = closing_date(op)
+    return {
+        "first_date": min(dates).isoformat() if dates else None,
+        "last_date": max(dates).isoformat() if dates else None,
+        "closes_on": closes.isoformat() if closes else None,
+    }
+
+
+def _stored_date(op: Dict[str, Any], field: str) -> Optional[date]:
+    value = op.get(field)
+    return date.fromisoformat(value) if value else None
+
+
+def closes_on(op: Dict[str, Any]) -> Optional[date]:
+    """closing_date() from the normalised fields; parses only records compiled without them."""
+    if "closes_on" in op:
+        return _stored_date(op, "closes_on")
+    return closing_date(op)
+
+
+def application_period(op: Dict[str, Any]) -> Tuple[Optional[date], Optional[date]]:
+    """Earliest and latest deadline date of a record, (None, None) without dates."""
+    if "first_date" in op:
+        return _stored_date(op, "first_date"), _stored_date(op, "last_date")
+    dates = deadline_dates(op)
+    return (min(dates), max(dates)) if dates else (None, None)
+
+
+def is_expired(op: Dict[str, Any], today: Optional[date] = None) -> bool:
+    closes = closes_on(op)
+    return closes is not None and closes < (today or date.today())
+
+
+class DeadlineIndex:
+    """
+    Closing dates of a set of opportunities, sorted. Continuous calls (no
+    closing date) are always open; sweep() moves the calls closed before a
+    day out of the sorted list, they stay known as expired.
+    """
+
+    def __init__(self, closes: Dict[str, Optional[date]]):
+        self._closes = dict(closes)
+        self._sorted = SortedList((d, op_id) for op_id, d in self._closes.items() if d is not None)
+        self._continuous = {op_id for op_id, d in self._closes.items() if d is None}
+        self._expired: Set[str] = set()
+
+    @classmethod
+    def from_opportunities(cls, opportunities: Iterable[Dict[str, Any]]) -> "DeadlineIndex":
+        return cls({str(op["id"]): closes_on(op) for op in opportunities if op.get("id") is not None})
+
+    def __len__(self) -> int:
+        return len(self._closes)
+
+    def __contains__(self, op_id: object) -> bool:
+        return str(op_id) in self._closes
+
+    def closes(self, op_id: str) -> Optional[date]:
+        return self._closes.get(str(op_id))
+
+    def is_open(self, op_id: str, today: Optional[date] = None) -> bool:
+        op_id = str(op_id)
+        if op_id not in self._closes or op_id in self._expired:
+            return False
+        closes = self._closes[op_id]
+        return closes is None or closes >= (today or date.today())
+
+    def open_ids(self, today: Optional[date] = None) -> Set[str]:
+        today = today or date.today()
+        return self._continuous | {op_id for _, op_id in self._sorted.irange(minimum=(today,))}
+
+    def closing_within(self, days: int, today: Optional[date] = None) -> List[str]:
+        """Ids closing between today and today + days (inclusive), soonest first."""
+        today = today or date.today()
+        end = today + timedelta(days=days + 1)
+        return [op_id for _, op_id in self._sorted.irange((today,), (end,), inclusive=(True, False))]
+
+    def expired_ids(self, today: Optional[date] = None) -> Set[str]:
+        today = today or date.today()
+        return self._expired | {op_id for _, op_id in self._sorted.irange(maximum=(today,), inclusive=(True, False))}
+
+    def sweep(self, today: Optional[date] = None) -> List[str]:
+        """Drop the calls closed before `today` from the sorted list; returns their ids."""
+        cut = self._sorted.bisect_left((today or date.today(),))
+        swept = [op_id for _, op_id in self._sorted[:cut]]
+        del self._sorted[:cut]
+        self._expired.update(swept)
+        return swept
+
+
+def main():
+    import argparse
+
+    from .catalogue import deadline_index, get_opportunity
+
+    parser = argparse.ArgumentParser(description="Termenele oportunităților din catalog.")
+    parser.add_argument("--within", type=int, default=14, help="Apelurile care se închid în următoarele N zile.")
+    parser.add_argument("--expired", action="store_true", help="Listează apelurile cu termenul depășit.")
+    args = parser.parse_args()
+
+    index = deadline_index()
+    today = date.today()
+    ids = sorted(index.expired_ids(today)) if args.expired else index.closing_within(args.within, today)
+    print(f"[deadlines] {len(index)} opportunities, {len(index.open_ids(today))} open")
+    for op_id in ids:
+        closes = index.closes(op_id)
+        op = get_opportunity(op_id) or {}
+        print(f"{closes.isoformat() if closes else '-':<10}  {op_id}  {op.get('title') or op.get('name') or ''}")
+
+
+if __name__ == "__main__":
+    main()
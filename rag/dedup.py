@@ -0,0 +1,318 @@
+# rag/dedup.py
+"""
+Near-duplicate opportunities across portals.
+
+The same call is published on several sites (both EC portals, national
+mirrors) and each extraction gives a slightly different record with its own
+id. dedupe_records() clusters them and keeps one canonical record per
+cluster, with every source URL (source_urls) and the absorbed ids
+(duplicate_ids):
+
+  1. blocking: records of one type share a block when they have the same
+     closing date, the same maximum funding, one of their rarest title
+     tokens or one LSH band of their embedding (random hyperplanes over
+     rag.embeddings.LocalEmbeddings of title + programme + summary);
+     blocks larger than MAX_BLOCK are skipped, so comparisons stay close to
+     linear in the catalogue size
+  2. each candidate pair is a duplicate when deadlines (one record may list
+     only some of the other's dates) and funding do not contradict each
+     other, the call codes in the titles (PNRR-C9-2025-...) do not differ,
+     and the embeddings are near-identical, or similar with near-identical
+     titles (either one is enough with the same call code)
+  3. duplicate pairs are merged with union-find
+
+    python -m rag.dedup                     # report on data/opportunities/sources.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import re
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+from itertools import combinations
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from .deadlines import closes_on, deadline_dates
+from .embeddings import LocalEmbeddings
+from .lexical_index import normalize_text, tokenize
+
+DEDUP_DIM = 256
+# LSH over the embeddings: bands of sign bits of random hyperplanes
+LSH_BANDS = 8
+LSH_ROWS = 12
+LSH_SEED = 0
+# title tokens per record used as blocking keys (the rarest ones)
+TITLE_KEYS = 2
+# blocks larger than this are skipped (a common date or amount says nothing)
+MAX_BLOCK = 100
+
+EMBED_SIM_DUPLICATE = 0.92
+EMBED_SIM_WITH_TITLE = 0.75
+TITLE_SIM = 0.85
+FUNDING_TOLERANCE = 0.1
+
+_CODE_RE = re.compile(r"[a-z0-9]+(?:[-/.][a-z0-9]+)+")
+
+
+class UnionFind:
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+
+    def find(self, i: int) -> int:
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, i: int, j: int) -> None:
+        ri, rj = self.find(i), self.find(j)
+        if ri != rj:
+            self.parent[max(ri, rj)] = min(ri, rj)
+
+
+def _title(op: Dict[str, Any]) -> str:
+    return normalize_text(op.get("title") or op.get("name") or "")
+
+
+def _text(op: Dict[str, Any]) -> str:
+    return " ".join(str(op.get(k) or "") for k in ("title", "name", "program_name", "summary"))
+
+
+def _funding(op: Dict[str, Any]) -> Optional[float]:
+    for key in ("funding_max", "funding"):
+        value = op.get(key)
+        if isinstance(value, (int, float)) and not isinstance(value, bool) and value > 0:
+            return float(value)
+    return None
+
+
+def _codes(title: str) -> Set[str]:
+    """Call codes in a normalised title: compound tokens with a digit."""
+    return {c for c in _CODE_RE.findall(title) if any(ch.isdigit() for ch in c)}
+
+
+class _Features:
+    """What the blocking and the pair checks need, computed once per record."""
+
+    def __init__(self, records: List[Dict[str, Any]]):
+        self.records = records
+        self.titles = [_title(op) for op in records]
+        self.codes = [_codes(t) for t in self.titles]
+        self.closes = [closes_on(op) for op in records]
+        self.dates = [frozenset(deadline_dates(op)) for op in records]
+        self.funding = [_funding(op) for op in records]
+        self.title_tokens = [set(tokenize(t)) for t in self.titles]
+        self.vectors = np.zeros((len(records), DEDUP_DIM), dtype="float32")
+
+    def embed(self, rows: List[int]) -> None:
+        """Embeddings of `rows` (the others stay zero and out of the LSH blocks)."""
+        texts = [_text(self.records[i]) for i in rows]
+        embedder = LocalEmbeddings(dim=DEDUP_DIM).fit(texts)
+        self.vectors[rows] = embedder.embed_texts(texts)
+
+
+def _key_blocks(f: _Features) -> Dict[Tuple, List[int]]:
+    """Blocks on closing date, funding and the rarest title tokens."""
+    blocks: Dict[Tuple, List[int]] = defaultdict(list)
+    df = Counter(token for tokens in f.title_tokens for token in tokens)
+    for i, op in enumerate(f.records):
+        kind = op.get("type")
+        if f.closes[i] is not None:
+            blocks[(kind, "closes", f.closes[i])].append(i)
+        if f.funding[i] is not None:
+            blocks[(kind, "funding", f.funding[i])].append(i)
+        for token in sorted(f.title_tokens[i], key=lambda t: (df[t], t))[:TITLE_KEYS]:
+            blocks[(kind, "title", token)].append(i)
+    return blocks
+
+
+def _lsh_blocks(f: _Features, rows: List[int]) -> Dict[Tuple, List[int]]:
+    blocks: Dict[Tuple, List[int]] = defaultdict(list)
+    planes = np.random.default_rng(LSH_SEED).standard_normal((DEDUP_DIM, LSH_BANDS * LSH_ROWS)).astype("float32")
+    bits = (f.vectors[rows] @ planes) > 0
+    weights = 1 << np.arange(LSH_ROWS, dtype="int64")
+    bands = bits.reshape(len(rows), LSH_BANDS, LSH_ROWS) @ weights
+    for i, row_bands in zip(rows, bands):
+        if f.vectors[i].any():
+            kind = f.records[i].get("type")
+            for band, value in enumerate(row_bands):
+                blocks[(kind, "lsh", band, int(value))].append(i)
+    return blocks
+
+
+def _is_duplicate(i: int, j: int, f: _Features) -> bool:
+    # a portal listing only some of the dates (no deadline yet) is no contradiction
+    if f.closes[i] and f.closes[j] and f.closes[i] != f.closes[j] \
+            and not (f.dates[i] <= f.dates[j] or f.dates[j] <= f.dates[i]):
+        return False
+    if f.funding[i] and f.funding[j] and abs(f.funding[i] - f.funding[j]) > FUNDING_TOLERANCE * max(f.funding[i], f.funding[j]):
+        return False
+    if f.codes[i] and f.codes[j] and not f.codes[i] & f.codes[j]:
+        return False
+    similarity = float(f.vectors[i] @ f.vectors[j])
+    if similarity >= EMBED_SIM_DUPLICATE:
+        return True
+    similar_titles = SequenceMatcher(None, f.titles[i], f.titles[j]).ratio() >= TITLE_SIM
+    if f.codes[i] & f.codes[j]:
+        # same call code: either the text or the title has to agree
+        return similar_titles or similarity >= EMBED_SIM_WITH_TITLE
+    return similar_titles and similarity >= EMBED_SIM_WITH_TITLE
+
+
+def find_clusters(records: List[Dict[str, Any]], focus: Optional[Set[int]] = None) -> Tuple[List[List[int]], Dict[str, int]]:
+    """
+    Clusters of near-duplicate records (indices, only clusters of two or
+    more) and comparison stats. With `focus`, only pairs involving one of
+    those indices are checked (incremental compilation: the rest was
+    deduplicated before), and only the focus records and those sharing a
+    date / funding / title block with them are embedded.
+    """
+    if len(records) < 2:
+        return [], {"candidate_pairs": 0, "duplicate_pairs": 0}
+    f = _Features(records)
+    key_blocks = [m for m in _key_blocks(f).values() if 1 < len(m) <= MAX_BLOCK]
+    if focus is None:
+        rows = list(range(len(records)))
+    else:
+        near = set(focus)
+        for members in key_blocks:
+            if focus.intersection(members):
+                near.update(members)
+        rows = sorted(near)
+    f.embed(rows)
+
+    pairs: Set[Tuple[int, int]] = set()
+    lsh_blocks = [m for m in _lsh_blocks(f, rows).values() if 1 < len(m) <= MAX_BLOCK]
+    for members in key_blocks + lsh_blocks:
+        for i, j in combinations(sorted(set(members)), 2):
+            if focus is None or i in focus or j in focus:
+                pairs.add((i, j))
+
+    uf = UnionFind(len(records))
+    duplicates = 0
+    for i, j in pairs:
+        if _is_duplicate(i, j, f):
+            uf.union(i, j)
+            duplicates += 1
+
+    groups: Dict[int, List[int]] = defaultdict(list)
+    for i in range(len(records)):
+        groups[uf.find(i)].append(i)
+    clusters = [members for members in groups.values() if len(members) > 1]
+    return clusters, {"candidate_pairs": len(pairs), "duplicate_pairs": duplicates}
+
+
+def _filled(op: Dict[str, Any]) -> int:
+    return sum(1 for v in op.values() if v not in (None, "", [], {}, "unspecified"))
+
+
+def merge_records(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    One record for a cluster: the one merged before if any, else the most
+    complete (longest raw_text, then first seen on ties), with its empty
+    fields filled from the others, every source URL and the absorbed ids.
+    """
+    ranked = sorted(records, key=lambda op: (op.get("first_seen") or "~", str(op.get("id"))))
+    ranked.sort(
+        key=lambda op: (bool(op.get("duplicate_ids")), _filled(op), len(op.get("raw_text") or "")),
+        reverse=True,
+    )
+    canonical = dict(ranked[0])
+    for other in ranked[1:]:
+        for key, value in other.items():
+            if canonical.get(key) in (None, "", [], {}, "unspecified") and value not in (None, "", [], {}):
+                canonical[key] = value
+
+    urls: List[str] = []
+    ids: Set[str] = set()
+    for op in ranked:
+        for url in [op.get("source_url"), *(op.get("source_urls") or [])]:
+            if url and url not in urls:
+                urls.append(url)
+        ids.update(str(i) for i in [op.get("id"), *(op.get("duplicate_ids") or [])] if i)
+    canonical["source_urls"] = urls
+    canonical["duplicate_ids"] = sorted(ids - {str(canonical.get("id"))})
+    return canonical
+
+
+def dedupe_records(
+    records: List[Dict[str, Any]],
+    focus_ids: Optional[Iterable[str]] = None,
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Records with each cluster of near-duplicates replaced by its merged
+    record (in the position of the first member), plus a report:
+
+        {"records", "unique", "clusters", "reduction_ratio",
+         "candidate_pairs", "duplicate_pairs", "merged": {canonical id: [absorbed ids]}}
+    """
+    focus = None
+    if focus_ids is not None:
+        wanted = {str(i) for i in focus_ids}
+        focus = {i for i, op in enumerate(records) if str(op.get("id")) in wanted}
+    clusters, stats = find_clusters(records, focus)
+
+    replaced: Dict[int, Optional[Dict[str, Any]]] = {}
+    merged_ids: Dict[str, List[str]] = {}
+    for members in clusters:
+        merged = merge_records([records[i] for i in members])
+        merged_ids[str(merged["id"])] = merged["duplicate_ids"]
+        first, *rest = sorted(members)
+        replaced[first] = merged
+        for i in rest:
+            replaced[i] = None
+
+    out = [replaced.get(i, op) for i, op in enumerate(records) if replaced.get(i, op) is not None]
+    report = {
+        "records": len(records),
+        "unique": len(out),
+        "clusters": len(clusters),
+        "reduction_ratio": round(1 - len(out) / len(records), 4) if records else 0.0,
+        **stats,
+        "merged": merged_ids,
+    }
+    return out, report
+
+
+def dedupe_combined(
+    combined: Dict[str, List[Dict[str, Any]]],
+    focus_ids: Optional[Iterable[str]] = None,
+) -> Tuple[Dict[str, List[Dict[str, Any]]], Dict[str, Any]]:
+    """dedupe_records() per sources.json group, with a combined report."""
+    focus = None if focus_ids is None else set(focus_ids)
+    out: Dict[str, List[Dict[str, Any]]] = {}
+    report: Dict[str, Any] = {"records": 0, "unique": 0, "clusters": 0, "candidate_pairs": 0,
+                              "duplicate_pairs": 0, "merged": {}}
+    for kind, records in combined.items():
+        out[kind], kind_report = dedupe_records(records, focus)
+        for key in ("records", "unique", "clusters", "candidate_pairs", "duplicate_pairs"):
+            report[key] += kind_report[key]
+        report["merged"].update(kind_report["merged"])
+    report["reduction_ratio"] = round(1 - report["unique"] / report["records"], 4) if report["records"] else 0.0
+    return out, report
+
+
+def main():
+    from .parse_input import OUTPUT_FILE, load_json_file
+
+    parser = argparse.ArgumentParser(description="Raport de duplicate aproape identice în sources.json.")
+    parser.add_argument("--sources", default=str(OUTPUT_FILE), help="Fișierul sources.json analizat.")
+    parser.add_argument("--show", type=int, default=10, help="Câte clustere se afișează.")
+    args = parser.parse_args()
+
+    combined = load_json_file(Path(args.sources))
+    titles = {str(op.get("id")): op.get("title") or op.get("name") for ops in combined.values() for op in ops}
+    _, report = dedupe_combined(combined)
+    print(json.dumps({k: v for k, v in report.items() if k != "merged"}, indent=2))
+    for canonical, absorbed in list(report["merged"].items())[:args.show]:
+        print(f"\n{canonical}: {titles.get(canonical)}")
+        for op_id in absorbed:
+            print(f"  = {op_id}: {titles.get(op_id)}")
+
+
+if __name__ == "__main__":
+    main()
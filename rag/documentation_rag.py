@@ -8,10 +8,14 @@ from pathlib import Path
 from typing import Any, Dict, List
 
 from dotenv import load_dotenv
-from openai import OpenAI
+
+from . import tracing
+from .catalogue import get_opportunity
+from .firm_profile import firm_profile_for
+from .llm_gateway import INTERACTIVE, get_gateway, llm_job
 
 load_dotenv()
-client = OpenAI()  # folosește OPENAI_API_KEY din .env
+client = get_gateway()  # folosește OPENAI_API_KEY din .env
 
 BASE_DIR = Path(__file__).resolve().parents[1]
 FIRMS_DIR = BASE_DIR / "data" / "firms"
@@ -27,19 +31,10 @@ def load_firm_by_cif(cif: str) -> Dict[str, Any]:
 
 
 def load_opportunity_by_id(opportunity_id: str) -> Dict[str, Any]:
-    for fname in ["sources.json"]:
-        path = OPP_DIR / fname
-        if not path.exists():
-            continue
-        with path.open("r", encoding="utf-8") as f:
-            items = json.load(f)
-        all_opps = []
-        for opp_type in ["grants", "accelerators", "vcs"]:
-            all_opps = all_opps + items.get(opp_type, [])
-        for op in all_opps:
-            if op.get("id") == opportunity_id:
-                return op
-    raise KeyError(f"Opportunity {opportunity_id} not found")
+    op = get_opportunity(opportunity_id, include_raw_text=True)
+    if op is None:
+        raise KeyError(f"Opportunity {opportunity_id} not found")
+    return op
 
 
 def build_docs_prompt(firm: Dict[str, Any], opp: Dict[str, Any]) -> str:
@@ -52,12 +47,20 @@ def build_docs_prompt(firm: Dict[str, Any], opp: Dict[str, Any]) -> str:
     - to_improve
     - extra_notes
     """
-    firm_name = firm.get("denumire")
-    caen_descriere = firm.get("caen_descriere")
-    caen_code = firm.get("caen_code")
-    cifra_afaceri = firm.get("cifra_de_afaceri_neta")
-    profit_net = firm.get("profit_net")
-    year = firm.get("year")
+    profile = firm_profile_for(firm)
+    identity = profile.get("identitate", {})
+    caen = profile.get("caen", {})
+    financials = profile.get("financiar", {})
+
+    firm_name = identity.get("denumire")
+    caen_descriere = caen.get("descriere")
+    caen_code = caen.get("cod")
+    cifra_afaceri = financials.get("cifra_de_afaceri_neta")
+    profit_net = financials.get("profit_net")
+    year = financials.get("an")
+    answers_str = "\n".join(
+        f"- {key}: {value}" for key, value in profile.get("raspunsuri_utilizator", {}).items()
+    )
 
     opp_title = opp.get("title") or opp.get("name")
     opp_type = opp.get("type")
@@ -164,6 +167,10 @@ Nume: {firm_name}
 Cod CAEN: {caen_code} ({caen_descriere})
 Cifră de afaceri netă {year}: {cifra_afaceri}
 Profit net {year}: {profit_net}
+Numar angajati: {financials.get("numar_angajati")}
+
+Raspunsurile utilizatorului:
+{answers_str}
 
 # Date despre oportunitatea de finantare
 
@@ -200,25 +207,27 @@ def generate_docs_package(cif: str, opportunity_id: str) -> Dict[str, Any]:
     - to_improve
     - extra_notes
     """
-    firm = load_firm_by_cif(cif)
-    opp = load_opportunity_by_id(opportunity_id)
-
-    user_prompt = build_docs_prompt(firm, opp)
-
-    resp = client.chat.completions.create(
-        model="gpt-4.1",  # modelul pe care îl folosești în proiect
-        messages=[
-            {
-                "role": "system",
-                "content": (
-                    "You are a JSON-only assistant. "
-                    "You ALWAYS respond with valid JSON that matches the requested schema."
-                ),
-            },
-            {"role": "user", "content": user_prompt},
-        ],
-        response_format={"type": "json_object"},
-    )
+    with tracing.span("docs.load", cif=cif, opportunity_id=opportunity_id):
+        firm = load_firm_by_cif(cif)
+        opp = load_opportunity_by_id(opportunity_id)
+        user_prompt = build_docs_prompt(firm, opp)
+
+    # generated while the user waits on the documents page
+    with llm_job(f"docs-{cif}", priority=INTERACTIVE):
+        resp = client.chat.completions.create(
+            model="gpt-4.1",  # modelul pe care îl folosești în proiect
+            messages=[
+                {
+                    "role": "system",
+                    "content": (
+                        "You are a JSON-only assistant. "
+                        "You ALWAYS respond with valid JSON that matches the requested schema."
+                    ),
+                },
+                {"role": "user", "content": user_prompt},
+            ],
+            response_format={"type": "json_object"},
+        )
 
     content = resp.choices[0].message.content
     package = json.loads(content)
@@ -241,49 +250,52 @@ if __name__ == "__main__":
     example_cif = sys.argv[1]
     example_opp_id = sys.argv[2]  # id-ul tău de test
 
-    package = generate_docs_package(example_cif, example_opp_id)
-    print(json.dumps(package, ensure_ascii=False, indent=2))
-
-    # Save each AI-generated document to a file
-    output_dir = BASE_DIR / "data" / "generated" / example_cif
-    output_dir.mkdir(parents=True, exist_ok=True)
-
-    for doc in package.get("ai_docs", []):
-        doc_name = doc.get("name", "unknown")
-        # Sanitize filename: remove special chars and use lowercase with underscores
-        safe_name = doc_name.lower().replace(" ", "_").replace("/", "_")
-
-        # Save JSON
-        output_json = output_dir / f"{safe_name}.json"
-        with output_json.open("w", encoding="utf-8") as f:
-            json.dump(doc, f, ensure_ascii=False, indent=2)
-        print(f"Saved document to: {output_json}")
-
-        # Generate PDF using gen.py
-        output_pdf = output_dir / f"{safe_name}.pdf"
-        firm_json = FIRMS_DIR / f"{example_cif}.json"
-        pdf_generator = BASE_DIR / "rag" / "pdfGenerator" / "gen.py"
-
-        try:
-            # Convert doc structure to format expected by gen.py
-
-            # Call PDF generator
-            result = subprocess.run(
-                [
-                    sys.executable,
-                    str(pdf_generator),
-                    str(output_json),
-                    str(firm_json),
-                    str(output_pdf),
-                ],
-                capture_output=True,
-                text=True,
-            )
-
-            if result.returncode == 1:
-                print(f"Generated PDF: {output_pdf}")
-            else:
-                print(f"Failed to generate PDF for {doc_name}: {result.stderr}")
-
-        except Exception as e:
-            print(f"Error generating PDF for {doc_name}: {e}")
+    with tracing.span("docs.run", cif=example_cif, opportunity_id=example_opp_id):
+        package = generate_docs_package(example_cif, example_opp_id)
+        print(json.dumps(package, ensure_ascii=False, indent=2))
+
+        # Save each AI-generated document to a file
+        output_dir = BASE_DIR / "data" / "generated" / example_cif
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        for doc in package.get("ai_docs", []):
+            doc_name = doc.get("name", "unknown")
+            # Sanitize filename: remove special chars and use lowercase with underscores
+            safe_name = doc_name.lower().replace(" ", "_").replace("/", "_")
+
+            # Save JSON
+            output_json = output_dir / f"{safe_name}.json"
+            with output_json.open("w", encoding="utf-8") as f:
+                json.dump(doc, f, ensure_ascii=False, indent=2)
+            print(f"Saved document to: {output_json}")
+
+            # Generate PDF using gen.py
+            output_pdf = output_dir / f"{safe_name}.pdf"
+            firm_json = FIRMS_DIR / f"{example_cif}.json"
+            pdf_generator = BASE_DIR / "rag" / "pdfGenerator" / "gen.py"
+
+            try:
+                # Convert doc structure to format expected by gen.py
+
+                # Call PDF generator
+                with tracing.span("docs.pdf", cif=example_cif, document=safe_name):
+                    result = subprocess.run(
+                        [
+                            sys.executable,
+                            str(pdf_generator),
+                            str(output_json),
+                            str(firm_json),
+                            str(output_pdf),
+                        ],
+                        capture_output=True,
+                        text=True,
+                        env=tracing.child_env(),  # gen.py continues this trace
+                    )
+
+                if result.returncode == 1:
+                    print(f"Generated PDF: {output_pdf}")
+                else:
+                    print(f"Failed to generate PDF for {doc_name}: {result.stderr}")
+
+            except Exception as e:
+                print(f"Error generating PDF for {doc_name}: {e}")
@@ -0,0 +1,370 @@
+# rag/eligibility_rules.py
+"""
+Hard eligibility constraints checked locally, before any LLM call.
+
+Opportunity constraints (the `constraints` object emitted by the scraper
+extractors, plus the deadline) are compiled once into NumPy columns over the
+whole catalogue; a firm is then evaluated against every opportunity at once.
+Each rule yields PASS / FAIL / UNKNOWN (firm data missing, or a constraint
+that cannot be compared) / NA (the opportunity has no such constraint).
+
+The constraint parsing (opportunity_constraints) and the column-wise
+verdicts (bound_verdicts, caen_prefixes) are shared with
+rag.reverse_match.FirmMatrix, which evaluates one opportunity over all firms.
+"""
+from __future__ import annotations
+
+import re
+import unicodedata
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Set, Union
+
+import numpy as np
+
+from .deadlines import closes_on
+
+PASS, FAIL, UNKNOWN, NA = 1, 0, 2, 3
+
+# numeric limits: (rule, firm attribute, constraints key, is lower bound)
+BOUND_RULES = (
+    ("employees_min", "employees", "min_employees", True),
+    ("employees_max", "employees", "max_employees", False),
+    ("turnover_min", "turnover", "min_turnover", True),
+    ("turnover_max", "turnover", "max_turnover", False),
+    ("company_age_min", "age_years", "min_company_age_years", True),
+    ("company_age_max", "age_years", "max_company_age_years", False),
+)
+
+RULES = ("deadline", "caen", "region") + tuple(rule for rule, _, _, _ in BOUND_RULES)
+
+# firm turnover comes from the openapi.ro balances, in RON; calls state their
+# limits in constraints.turnover_currency. EUR is converted at a fixed rate
+# (roughly the BNR rate of 2025-2026), a missing or other currency leaves the
+# limit unchecked.
+EUR_RON_RATE = 5.0
+TURNOVER_CURRENCY_RATES = {"RON": 1.0, "LEI": 1.0, "LEU": 1.0, "EUR": EUR_RON_RATE, "EURO": EUR_RON_RATE, "€": EUR_RON_RATE}
+
+# candidate keys in data/firms/<cui>.json (openapi.ro company + balances,
+# flattened by input/request.py, plus the account form fields)
+FIRM_CAEN_KEYS = ("caen_code", "cod_caen", "caen")
+FIRM_EMPLOYEE_KEYS = ("numar_angajati", "numar_mediu_de_salariati", "numar_salariati", "angajati")
+FIRM_TURNOVER_KEYS = ("cifra_de_afaceri_neta", "cifra_afaceri", "venituri_totale")
+FIRM_COUNTY_KEYS = ("judet", "adresa_judet", "county")
+FIRM_REGISTRATION_KEYS = ("data_inregistrare", "data_infiintare", "registration_date")
+
+# a Romanian firm is also inside these broader areas
+FIRM_WIDE_REGIONS = ("romania", "ro", "eu", "ue", "europe", "european union", "uniunea europeana", "national")
+
+# county (normalised) -> development region names as they appear in calls
+DEVELOPMENT_REGIONS = {
+    **dict.fromkeys(("bacau", "botosani", "iasi", "neamt", "suceava", "vaslui"), ("nord est",)),
+    **dict.fromkeys(("braila", "buzau", "constanta", "galati", "tulcea", "vrancea"), ("sud est",)),
+    **dict.fromkeys(
+        ("arges", "calarasi", "dambovita", "giurgiu", "ialomita", "prahova", "teleorman"),
+        ("sud muntenia", "sud"),
+    ),
+    **dict.fromkeys(("dolj", "gorj", "mehedinti", "olt", "valcea"), ("sud vest oltenia", "sud vest")),
+    **dict.fromkeys(("arad", "caras severin", "hunedoara", "timis"), ("vest",)),
+    **dict.fromkeys(
+        ("bihor", "bistrita nasaud", "cluj", "maramures", "satu mare", "salaj"), ("nord vest",)
+    ),
+    **dict.fromkeys(("alba", "brasov", "covasna", "harghita", "mures", "sibiu"), ("centru",)),
+    **dict.fromkeys(("bucuresti", "ilfov"), ("bucuresti ilfov",)),
+}
+
+
+def normalize_caen_code(code: Any) -> Optional[str]:
+    """
+    CAEN code as its digits: '62.01', 6201, ' 6201' -> '6201' (class);
+    divisions ('62') and groups ('62.0' -> '620') are kept as they are and
+    cover every class under them, see caen_prefixes().
+    Same rule as scraper/llm/caen_index.normalize_code.
+    """
+    digits = re.sub(r"\D", "", str(code or ""))
+    if not 2 <= len(digits) <= 4:
+        return None
+    return digits
+
+
+def caen_prefixes(code: Optional[str]) -> Set[str]:
+    """The listed codes that cover a class: '6201' -> {'62', '620', '6201'}."""
+    if not code:
+        return set()
+    return {code[:n] for n in range(2, len(code) + 1)}
+
+
+def normalize_region(value: Any) -> str:
+    if not isinstance(value, str):
+        return ""
+    value = unicodedata.normalize("NFD", value.lower())
+    value = "".join(c for c in value if unicodedata.category(c) != "Mn")
+    value = re.sub(r"^(judetul|jud\.?|municipiul|regiunea)\s+", "", value.strip())
+    return re.sub(r"\s+", " ", re.sub(r"[^a-z0-9 ]+", " ", value)).strip()
+
+
+def as_number(value: Any) -> Optional[float]:
+    """Numeric value of a record field ("1 200,5" -> 1200.5), None when empty or not a number."""
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        cleaned = value.strip().replace(" ", "").replace(",", ".")
+        try:
+            return float(cleaned)
+        except ValueError:
+            return None
+    return None
+
+
+def first_value(firm: Dict[str, Any], keys: Iterable[str]) -> Any:
+    """First non-empty value among `keys` of a firm record."""
+    for key in keys:
+        value = firm.get(key)
+        if value not in (None, ""):
+            return value
+    return None
+
+
+def firm_attributes(firm: Dict[str, Any], today: Optional[date] = None) -> Dict[str, Any]:
+    """Machine-checkable attributes of a firm record."""
+    today = today or date.today()
+
+    age_years = None
+    registered = first_value(firm, FIRM_REGISTRATION_KEYS)
+    if isinstance(registered, str):
+        match = re.match(r"(\d{4})-(\d{2})-(\d{2})", registered)
+        if match:
+            reg_date = date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+            age_years = (today - reg_date).days / 365.25
+    if age_years is None:
+        # J40/1234/2015 -> registered in 2015
+        match = re.search(r"/(\d{4})\s*$", str(firm.get("numar_reg_com") or ""))
+        if match:
+            age_years = float(today.year - int(match.group(1)))
+
+    regions = set()
+    county = normalize_region(first_value(firm, FIRM_COUNTY_KEYS))
+    if county:
+        regions.add(county)
+        regions.update(DEVELOPMENT_REGIONS.get(county, ()))
+        regions.update(FIRM_WIDE_REGIONS)
+
+    caen = normalize_caen_code(first_value(firm, FIRM_CAEN_KEYS))
+    if caen and len(caen) == 3:
+        # a firm is registered under a class, 111 is 0111 stored as a number
+        caen = caen.zfill(4)
+
+    return {
+        "caen": caen,
+        "employees": as_number(first_value(firm, FIRM_EMPLOYEE_KEYS)),
+        "turnover": as_number(first_value(firm, FIRM_TURNOVER_KEYS)),
+        "regions": regions,
+        "age_years": age_years,
+    }
+
+
+def turnover_rate(constraints: Dict[str, Any]) -> Optional[float]:
+    """RON per unit of the turnover limits of a call, None when their currency is missing or unknown."""
+    currency = str(constraints.get("turnover_currency") or "").strip().upper()
+    return TURNOVER_CURRENCY_RATES.get(currency)
+
+
+def opportunity_constraints(op: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    The hard constraints of an opportunity, normalised:
+
+        {"caen_codes": {...}, "regions": {...},
+         "bounds": {rule: bound in firm units or None},
+         "unchecked": {rules whose bound cannot be compared},
+         "turnover_currency": str}
+
+    Turnover limits are converted to RON; without a known currency they are
+    kept as stated and marked unchecked (UNKNOWN, never FAIL).
+    """
+    c = op.get("constraints") or {}
+    rate = turnover_rate(c)
+    bounds: Dict[str, Optional[float]] = {}
+    unchecked: Set[str] = set()
+    for rule, attr, key, _ in BOUND_RULES:
+        bound = as_number(c.get(key))
+        if bound is not None and attr == "turnover":
+            if rate is None:
+                unchecked.add(rule)
+            else:
+                bound *= rate
+        bounds[rule] = bound
+    return {
+        "caen_codes": {normalize_caen_code(x) for x in c.get("caen_codes") or []} - {None},
+        "regions": {normalize_region(x) for x in c.get("regions") or []} - {""},
+        "bounds": bounds,
+        "unchecked": unchecked,
+        "turnover_currency": str(c.get("turnover_currency") or "").strip(),
+    }
+
+
+def bound_verdicts(
+    values: Union[float, np.ndarray],
+    bounds: Union[float, np.ndarray],
+    is_min: bool,
+    checkable: Union[bool, np.ndarray] = True,
+) -> np.ndarray:
+    """
+    Column-wise verdicts of firm values against limits, one of them scalar
+    (NaN value -> UNKNOWN, NaN bound -> NA, bound not `checkable` -> UNKNOWN).
+    """
+    values, bounds, checkable = np.broadcast_arrays(
+        np.asarray(values, dtype="float64"), np.asarray(bounds, dtype="float64"), np.asarray(checkable, dtype=bool)
+    )
+    constrained = ~np.isnan(bounds)
+    known = constrained & ~np.isnan(values) & checkable
+    with np.errstate(invalid="ignore"):
+        ok = values >= bounds if is_min else values <= bounds
+    out = np.full(values.shape, NA, dtype="int8")
+    out[constrained] = UNKNOWN
+    out[known & ok] = PASS
+    out[known & ~ok] = FAIL
+    return out
+
+
+def _column(values: List[Optional[float]]) -> np.ndarray:
+    return np.array([np.nan if v is None else v for v in values], dtype="float64")
+
+
+class CompiledRules:
+    """Constraint columns for a list of opportunities."""
+
+    def __init__(self, opportunities: List[Dict[str, Any]]):
+        self.ids = [op.get("id") for op in opportunities]
+        n = len(opportunities)
+
+        parsed = [opportunity_constraints(op) for op in opportunities]
+
+        closes = [closes_on(op) for op in opportunities]
+        self.closes_on = np.array(
+            [d.toordinal() if d else -1 for d in closes], dtype="int64"
+        )
+
+        self.bounds = {rule: _column([p["bounds"][rule] for p in parsed]) for rule, _, _, _ in BOUND_RULES}
+        self.checkable = {
+            rule: np.array([rule not in p["unchecked"] for p in parsed], dtype=bool) for rule, _, _, _ in BOUND_RULES
+        }
+        self.turnover_currency = [p["turnover_currency"] for p in parsed]
+
+        # set-valued constraints: value -> indices of opportunities listing it
+        self.has_caen = np.zeros(n, dtype=bool)
+        self.caen_members: Dict[str, List[int]] = {}
+        self.has_region = np.zeros(n, dtype=bool)
+        self.region_members: Dict[str, List[int]] = {}
+        for i, p in enumerate(parsed):
+            for code in p["caen_codes"]:
+                self.has_caen[i] = True
+                self.caen_members.setdefault(code, []).append(i)
+            for region in p["regions"]:
+                self.has_region[i] = True
+                self.region_members.setdefault(region, []).append(i)
+
+        self.caen_lists = [sorted(p["caen_codes"]) for p in parsed]
+        self.region_lists = [list((op.get("constraints") or {}).get("regions") or []) for op in opportunities]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _membership(self, values: Iterable[str], has: np.ndarray, members: Dict[str, List[int]]) -> np.ndarray:
+        out = np.where(has, FAIL, NA).astype("int8")
+        values = [v for v in values if v]
+        if not values:
+            out[has] = UNKNOWN
+            return out
+        for v in values:
+            idx = members.get(v)
+            if idx:
+                out[idx] = PASS
+        return out
+
+    def evaluate(self, attrs: Dict[str, Any], today: Optional[date] = None) -> np.ndarray:
+        """Verdict matrix of shape (len(RULES), n_opportunities)."""
+        today = today or date.today()
+        n = len(self)
+        matrix = np.empty((len(RULES), n), dtype="int8")
+
+        deadline = np.full(n, NA, dtype="int8")
+        known = self.closes_on >= 0
+        deadline[known] = np.where(self.closes_on[known] >= today.toordinal(), PASS, FAIL)
+        matrix[0] = deadline
+
+        # a call listing a division or group admits every class under it
+        matrix[1] = self._membership(caen_prefixes(attrs.get("caen")), self.has_caen, self.caen_members)
+        matrix[2] = self._membership(attrs.get("regions") or (), self.has_region, self.region_members)
+        for r, (rule, attr, _, is_min) in enumerate(BOUND_RULES, start=3):
+            value = attrs.get(attr)
+            matrix[r] = bound_verdicts(
+                np.nan if value is None else value, self.bounds[rule], is_min, self.checkable[rule]
+            )
+        return matrix
+
+    def describe(self, rule: str, i: int, attrs: Dict[str, Any]) -> str:
+        """Human-readable requirement for rule `rule` of opportunity i."""
+        if rule == "deadline":
+            return f"Aplicare până la {date.fromordinal(int(self.closes_on[i])).strftime('%d.%m.%Y')}"
+        if rule == "caen":
+            return f"Cod CAEN eligibil: {', '.join(self.caen_lists[i])} (firma: {attrs.get('caen') or 'necunoscut'})"
+        if rule == "region":
+            return f"Regiune eligibilă: {', '.join(self.region_lists[i])}"
+        templates = {
+            "employees_min": "Minim {:g} angajați",
+            "employees_max": "Maxim {:g} angajați",
+            "turnover_min": "Cifră de afaceri minimă {:,.0f}",
+            "turnover_max": "Cifră de afaceri maximă {:,.0f}",
+            "company_age_min": "Vechime minimă {:g} ani",
+            "company_age_max": "Vechime maximă {:g} ani",
+        }
+        attr = next(a for r, a, _, _ in BOUND_RULES if r == rule)
+        requirement = templates[rule].format(float(self.bounds[rule][i]))
+        if attr == "turnover":
+            currency = "RON" if self.checkable[rule][i] else (self.turnover_currency[i] or "monedă nespecificată")
+            requirement = f"{requirement} {currency}"
+        value = attrs.get(attr)
+        firm_value = "necunoscut" if value is None else f"{value:,.0f}"
+        return f"{requirement} (firma: {firm_value})"
+
+    def verdicts(self, firm: Dict[str, Any], today: Optional[date] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Per-opportunity verdict for a firm record:
+
+            {opp_id: {"verdict": "pass" | "fail" | "unknown",
+                      "failed_rules": [...], "passed_rules": [...],
+                      "unknown_rules": [...]}}
+
+        "fail" as soon as one rule fails, "unknown" if some constraint could
+        not be checked for lack of firm data, "pass" otherwise.
+        """
+        attrs = firm_attributes(firm, today)
+        matrix = self.evaluate(attrs, today)
+
+        any_fail = (matrix == FAIL).any(axis=0)
+        any_unknown = (matrix == UNKNOWN).any(axis=0)
+
+        out: Dict[str, Dict[str, Any]] = {}
+        for i, op_id in enumerate(self.ids):
+            if op_id is None:
+                continue
+            column = matrix[:, i]
+            result = {
+                "verdict": "fail" if any_fail[i] else ("unknown" if any_unknown[i] else "pass"),
+                "failed_rules": [],
+                "passed_rules": [],
+                "unknown_rules": [],
+            }
+            for r, rule in enumerate(RULES):
+                if column[r] == NA:
+                    continue
+                key = {PASS: "passed_rules", FAIL: "failed_rules", UNKNOWN: "unknown_rules"}[int(column[r])]
+                result[key].append(self.describe(rule, i, attrs))
+            out[str(op_id)] = result
+        return out
+
+
+def compile_rules(opportunities: List[Dict[str, Any]]) -> CompiledRules:
+    """Compile the constraints of `opportunities` once for evaluation against many firms."""
+    return CompiledRules(opportunities)
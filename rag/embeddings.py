@@ -0,0 +1,177 @@
+# rag/embeddings.py
+"""
+Embedding backends for the opportunity index.
+
+    "openai" - OpenAI embeddings API (rag.openai_client), one request per call
+    "local"  - hashed word + character n-gram TF-IDF, reduced with a sparse
+               random projection in NumPy: no network, no key, ~1 ms a query
+
+A backend has embed_text(text) / embed_texts(texts) and info(); index_builder
+stores info() in indices/opportunities_index_info.json and every consumer of
+the index (vector_store, reverse_match, the vector screen) embeds its queries
+with load_index_embedder(), so queries and rows come from the same backend.
+"""
+from __future__ import annotations
+
+import json
+import zlib
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+from .lexical_index import normalize_text, tokenize
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+INDICES_DIR = BASE_DIR / "indices"
+INDEX_INFO_PATH = INDICES_DIR / "opportunities_index_info.json"
+# IDF weights of the local backend, fitted on the indexed catalogue
+LOCAL_EMBEDDER_PATH = INDICES_DIR / "opportunities_embedder.npz"
+
+EMBEDDING_BACKENDS = ("openai", "local")
+DEFAULT_EMBEDDING_BACKEND = "openai"
+
+LOCAL_DIM = 512
+# hashed feature space before the projection
+LOCAL_FEATURES = 1 << 18
+# non-zeros per feature column of the random projection
+LOCAL_PROJECTION_NNZ = 4
+LOCAL_SEED = 0
+CHAR_NGRAMS = (3, 4)
+
+
+class OpenAIEmbeddings:
+    name = "openai"
+
+    def __init__(self, model: Optional[str] = None):
+        self._model = model
+
+    @property
+    def model(self) -> str:
+        from .openai_client import EMBEDDING_MODEL
+
+        return self._model or EMBEDDING_MODEL
+
+    def embed_text(self, text: str) -> np.ndarray:
+        return self.embed_texts([text])[0]
+
+    def embed_texts(self, texts: Sequence[str]) -> np.ndarray:
+        from .openai_client import embed_texts
+
+        return np.asarray(embed_texts(list(texts), model=self.model), dtype="float32")
+
+    def info(self) -> Dict[str, Any]:
+        return {"embedding_backend": self.name, "embedding_model": self.model}
+
+
+class LocalEmbeddings:
+    """
+    Features are the stemmed words of lexical_index.tokenize plus character
+    n-grams of each word, hashed into LOCAL_FEATURES buckets and weighted
+    (1 + log tf) * idf. The projection to `dim` is a fixed sparse random
+    sign matrix (LOCAL_PROJECTION_NNZ entries per feature, seeded), which
+    keeps cosine similarities of the TF-IDF vectors approximately.
+    """
+
+    name = "local"
+
+    def __init__(
+        self,
+        dim: int = LOCAL_DIM,
+        n_features: int = LOCAL_FEATURES,
+        idf: Optional[np.ndarray] = None,
+        seed: int = LOCAL_SEED,
+    ):
+        self.dim = dim
+        self.n_features = n_features
+        self.seed = seed
+        self.idf = idf if idf is not None else np.ones(n_features, dtype="float32")
+        rng = np.random.default_rng(seed)
+        self._positions = rng.integers(0, dim, (n_features, LOCAL_PROJECTION_NNZ), dtype="int32")
+        self._signs = rng.choice(np.array([-1.0, 1.0], dtype="float32"), (n_features, LOCAL_PROJECTION_NNZ))
+
+    def _hash(self, feature: str) -> int:
+        return zlib.crc32(feature.encode("utf-8")) % self.n_features
+
+    def features(self, text: str) -> Counter:
+        """{hashed feature: count} of one text."""
+        counts: Counter = Counter()
+        for token, tf in Counter(tokenize(text)).items():
+            counts[self._hash("w:" + token)] += tf
+        # n-grams per distinct word, weighted by its frequency: long
+        # documents repeat the same words a lot
+        for word, tf in Counter(normalize_text(text).split()).items():
+            word = "".join(c for c in word if c.isalnum())
+            if len(word) < 3:
+                continue
+            padded = f"<{word}>"
+            for n in CHAR_NGRAMS:
+                for i in range(len(padded) - n + 1):
+                    counts[self._hash(padded[i:i + n])] += tf
+        return counts
+
+    def fit(self, texts: Sequence[str]) -> "LocalEmbeddings":
+        """IDF over `texts` (the indexed catalogue)."""
+        df = np.zeros(self.n_features, dtype="float32")
+        for text in texts:
+            df[list(self.features(text))] += 1
+        self.idf = (np.log((1 + len(texts)) / (1 + df)) + 1).astype("float32")
+        return self
+
+    def embed_text(self, text: str) -> np.ndarray:
+        counts = self.features(text)
+        vec = np.zeros(self.dim, dtype="float32")
+        if not counts:
+            return vec
+        ids = np.fromiter(counts.keys(), dtype="int64", count=len(counts))
+        tf = np.fromiter(counts.values(), dtype="float32", count=len(counts))
+        weights = (1 + np.log(tf)) * self.idf[ids]
+        np.add.at(vec, self._positions[ids].ravel(), (self._signs[ids] * weights[:, None]).ravel())
+        return vec / (np.linalg.norm(vec) + 1e-10)
+
+    def embed_texts(self, texts: Sequence[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dim), dtype="float32")
+        return np.vstack([self.embed_text(t) for t in texts])
+
+    def save(self, path: Path = LOCAL_EMBEDDER_PATH):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez(path, idf=self.idf, dim=self.dim, n_features=self.n_features, seed=self.seed)
+
+    @classmethod
+    def load(cls, path: Path = LOCAL_EMBEDDER_PATH) -> "LocalEmbeddings":
+        if not path.exists():
+            raise RuntimeError("Local embedder not found. Run `python -m rag.index_builder --embedding local`.")
+        data = np.load(path)
+        return cls(int(data["dim"]), int(data["n_features"]), data["idf"], int(data["seed"]))
+
+    def info(self) -> Dict[str, Any]:
+        return {"embedding_backend": self.name, "embedding_dim": self.dim, "embedding_features": self.n_features}
+
+
+def get_embedder(name: str = DEFAULT_EMBEDDING_BACKEND):
+    """A fresh backend; the local one is unfitted (idf = 1) until fit()."""
+    if name == "openai":
+        return OpenAIEmbeddings()
+    if name == "local":
+        return LocalEmbeddings()
+    raise ValueError(f"embedding backend must be one of {EMBEDDING_BACKENDS}, got {name!r}")
+
+
+def load_index_info(path: Path = INDEX_INFO_PATH) -> Dict[str, Any]:
+    if not path.exists():
+        return {}
+    with path.open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_index_embedder(info: Optional[Dict[str, Any]] = None):
+    """The backend the current opportunity index was built with (OpenAI for older indices)."""
+    info = load_index_info() if info is None else info
+    name = info.get("embedding_backend", "openai")
+    if name == "local":
+        return LocalEmbeddings.load()
+    if name == "openai":
+        return OpenAIEmbeddings(info.get("embedding_model"))
+    raise RuntimeError(f"Unknown embedding backend {name!r} in {INDEX_INFO_PATH.name}")
@@ -0,0 +1,150 @@
+# rag/firm_profile.py
+"""
+Compact, canonical firm profile for prompts.
+
+data/firms/<cui>.json is the flattened openapi.ro company + balances payload
+(hundreds of keys); prompts only need identity, CAEN, size, a few financial
+ratios and what the user told us. The profile is derived once per firm
+version (hash of the firm record) and cached in data/firms/profiles/.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from .eligibility_rules import FIRM_REGISTRATION_KEYS, as_number, firm_attributes, first_value
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+FIRMS_DIR = BASE_DIR / "data" / "firms"
+PROFILES_DIR = FIRMS_DIR / "profiles"
+
+# bump when the profile layout changes so cached profiles are rebuilt
+PROFILE_SCHEMA_VERSION = 1
+
+IDENTITY_KEYS = {
+    "cui": ("cui", "cif"),
+    "denumire": ("denumire", "name"),
+    "judet": ("judet", "adresa_judet"),
+    "localitate": ("localitate", "adresa_localitate"),
+    "numar_reg_com": ("numar_reg_com",),
+    "stare": ("stare", "stare_inregistrare"),
+    "platitor_tva": ("tva",),
+}
+EQUITY_KEYS = ("capitaluri_total", "capitaluri_proprii", "capital_total")
+DEBT_KEYS = ("datorii", "datorii_total")
+FIXED_ASSET_KEYS = ("active_imobilizate_total", "active_imobilizate")
+CURRENT_ASSET_KEYS = ("active_circulante_total", "active_circulante")
+USER_ANSWER_KEYS = (
+    "numar_angajati",
+    "varsta_dezvoltator",
+    "additional_info_1",
+    "additional_info_2",
+    "additional_info_3",
+    "additional_info_4",
+    "additional_info_5",
+    "additional_info_6",
+)
+
+
+def firm_version(firm: Dict[str, Any]) -> str:
+    raw = json.dumps(firm, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(f"{PROFILE_SCHEMA_VERSION}:{raw}".encode("utf-8")).hexdigest()[:16]
+
+
+def _ratio(numerator: Optional[float], denominator: Optional[float]) -> Optional[float]:
+    if numerator is None or not denominator:
+        return None
+    return round(numerator / denominator, 3)
+
+
+def build_firm_profile(firm: Dict[str, Any]) -> Dict[str, Any]:
+    """Derive the compact profile from a flattened firm record."""
+    attrs = firm_attributes(firm)
+
+    identity = {}
+    for field, keys in IDENTITY_KEYS.items():
+        value = first_value(firm, keys)
+        if value not in (None, ""):
+            identity[field] = value
+    # registration date rather than age: the cached profile must not go
+    # stale with the calendar
+    registered = first_value(firm, FIRM_REGISTRATION_KEYS)
+    if registered:
+        identity["data_inregistrare"] = registered
+
+    turnover = attrs["turnover"]
+    profit = as_number(firm.get("profit_net"))
+    equity = as_number(first_value(firm, EQUITY_KEYS))
+    debts = as_number(first_value(firm, DEBT_KEYS))
+    fixed_assets = as_number(first_value(firm, FIXED_ASSET_KEYS))
+    current_assets = as_number(first_value(firm, CURRENT_ASSET_KEYS))
+    total_assets = None
+    if fixed_assets is not None or current_assets is not None:
+        total_assets = (fixed_assets or 0.0) + (current_assets or 0.0)
+
+    financials = {
+        "an": firm.get("year"),
+        "cifra_de_afaceri_neta": turnover,
+        "profit_net": profit,
+        "numar_angajati": attrs["employees"],
+        "marja_profit_net": _ratio(profit, turnover),
+        "datorii_pe_capitaluri": _ratio(debts, equity),
+        "capitaluri_pe_active": _ratio(equity, total_assets),
+        "cifra_afaceri_pe_angajat": _ratio(turnover, attrs["employees"]),
+    }
+
+    answers = {}
+    for key in USER_ANSWER_KEYS:
+        value = firm.get(key)
+        if value not in (None, "", 0):
+            answers[key] = value
+
+    profile = {
+        "identitate": identity,
+        "caen": {"cod": attrs["caen"], "descriere": firm.get("caen_descriere")},
+        "financiar": financials,
+        "raspunsuri_utilizator": answers,
+    }
+    return _drop_empty(profile)
+
+
+def _drop_empty(value: Any) -> Any:
+    if isinstance(value, dict):
+        cleaned = {k: _drop_empty(v) for k, v in value.items()}
+        return {k: v for k, v in cleaned.items() if v not in (None, "", {}, [])}
+    return value
+
+
+def firm_profile_for(firm: Dict[str, Any]) -> Dict[str, Any]:
+    """Profile for an already loaded firm record, cached per firm version."""
+    version = firm_version(firm)
+    cui = str(firm.get("cui") or firm.get("cif") or "").strip()
+    path = PROFILES_DIR / f"{cui}.json" if cui else None
+
+    if path is not None and path.exists():
+        try:
+            with path.open("r", encoding="utf-8") as f:
+                cached = json.load(f)
+            if cached.get("firm_version") == version:
+                return cached["profile"]
+        except (OSError, json.JSONDecodeError, KeyError):
+            pass
+
+    profile = build_firm_profile(firm)
+    if path is not None:
+        PROFILES_DIR.mkdir(parents=True, exist_ok=True)
+        with path.open("w", encoding="utf-8") as f:
+            json.dump({"firm_version": version, "profile": profile}, f, ensure_ascii=False, indent=2)
+    return profile
+
+
+def load_firm_profile(cif: str) -> Dict[str, Any]:
+    path = FIRMS_DIR / f"{cif}.json"
+    if not path.exists():
+        raise FileNotFoundError(f"Firm file not found: {path}")
+    with path.open("r", encoding="utf-8") as f:
+        firm = json.load(f)
+    firm.setdefault("cui", cif)
+    return firm_profile_for(firm)
@@ -1,11 +1,17 @@
 # src/embeddings/index_builder.py
+import argparse
 import json
 import os
 from pathlib import Path
+from typing import Optional
 
 import numpy as np
 
-from .openai_client import embed_texts
+from .ann_index import COARSE_DIM, COARSE_MIN_ROWS, DEFAULT_N_PROBE, IVFIndex, coarse_rows
+from .catalogue import load_open_opportunities, with_raw_text
+from .embeddings import DEFAULT_EMBEDDING_BACKEND, EMBEDDING_BACKENDS, LOCAL_EMBEDDER_PATH, get_embedder
+from .eligibility_rules import normalize_caen_code
+from .lexical_index import LEXICAL_INDEX_PATH, build_lexical_index
 
 BASE_DIR = Path(__file__).resolve().parents[1]
 DATA_DIR = BASE_DIR / "data" / "opportunities"
@@ -14,6 +20,12 @@ INDICES_DIR.mkdir(parents=True, exist_ok=True)
 
 INDEX_EMBEDDINGS_PATH = INDICES_DIR / "opportunities_index.npy"
 INDEX_METADATA_PATH = INDICES_DIR / "opportunities_metadata.json"
+INDEX_INFO_PATH = INDICES_DIR / "opportunities_index_info.json"
+IVF_INDEX_PATH = INDICES_DIR / "opportunities_ivf.npz"
+COARSE_INDEX_PATH = INDICES_DIR / "opportunities_index_coarse.npy"
+
+# "exact" = brute-force cosine over every row, "ivf" = rag.ann_index.IVFIndex
+ANN_BACKENDS = ("exact", "ivf")
 
 
 def _load_json(path: Path):
@@ -23,71 +35,127 @@ def _load_json(path: Path):
 
 def load_all_opportunities() -> list[dict]:
     """
-    Load all grants, vcs and accelerators into a single list.
-    Each is expected to be a list of JSON objects.
+    Load all open grants, vcs and accelerators into a single list
+    (structured fields from the catalogue, without raw_text); calls past
+    their deadline are not indexed.
     """
-    all_ops: list[dict] = []
-
-    combined_path = DATA_DIR / "sources.json"
-    data = _load_json(combined_path)
-
-    # expected structure:
-    # {
-    #   "grants": [...],
-    #   "vcs": [...],
-    #   "accelerators": [...]
-    # }
-
-    for key in ["grants", "vcs", "accelerators"]:
-        items = data.get(key, [])
-        for item in items:
-            all_ops.append(item)
-
-    return all_ops
+    return load_open_opportunities()
 
 
 def build_canonical_text_for_embedding(op: dict) -> str:
-    return json.dumps(op, ensure_ascii=False)
-
-
-def build_index():
+    # the embedding still covers the full official text, fetched per record
+    return json.dumps(with_raw_text(op), ensure_ascii=False)
+
+
+def build_metadata(op: dict) -> dict:
+    return {
+        "id": op["id"],
+        "type": op.get("type", "unknown"),
+        "title": op.get("title") or op.get("name"),
+        "region": op.get("region", []),
+        "eligible_caen_codes": [
+            c for c in map(normalize_caen_code, op.get("eligible_caen_codes") or []) if c
+        ],
+        "deadlines": op.get("deadlines", []),
+        "eligibility_criteria": op.get("eligibility_criteria", []),
+        "number_of_docs": len(op.get("required_documents", [])),
+        "source_url": op.get("source_url"),
+        "funding": op.get("funding_max", "unspecified"),
+    }
+
+
+def build_lexical(opportunities: Optional[list] = None) -> dict:
+    """BM25 index over the same rows as the vector index; no network calls."""
+    opportunities = opportunities if opportunities is not None else load_all_opportunities()
+    stats = build_lexical_index(
+        [with_raw_text(op) for op in opportunities],
+        [build_metadata(op) for op in opportunities],
+    )
+    print(f"Saved BM25 index → {LEXICAL_INDEX_PATH} ({stats['documents']} docs, {stats['terms']} terms)")
+    return stats
+
+
+def build_index(
+    ann: str = "exact",
+    n_lists: Optional[int] = None,
+    n_probe: int = DEFAULT_N_PROBE,
+    embedding: str = DEFAULT_EMBEDDING_BACKEND,
+    coarse_dim: int = COARSE_DIM,
+):
+    if ann not in ANN_BACKENDS:
+        raise ValueError(f"ann must be one of {ANN_BACKENDS}, got {ann!r}")
+    embedder = get_embedder(embedding)
     opportunities = load_all_opportunities()
     if not opportunities:
         raise RuntimeError("No opportunities found in data/opportunities/")
 
     texts = [build_canonical_text_for_embedding(op) for op in opportunities]
 
-    print(f"Embedding {len(texts)} opportunities...")
-    vectors = embed_texts(texts)
-    embeddings = np.array(vectors, dtype="float32")
+    if embedding == "local":
+        # IDF over the catalogue being indexed, queries reuse it
+        embedder.fit(texts)
+        embedder.save()
+        print(f"Saved local embedder → {LOCAL_EMBEDDER_PATH}")
+
+    print(f"Embedding {len(texts)} opportunities ({embedding})...")
+    embeddings = np.asarray(embedder.embed_texts(texts), dtype="float32")
 
     # Save embeddings
     np.save(INDEX_EMBEDDINGS_PATH, embeddings)
 
     # Save metadata aligned with embeddings rows
-    metadata = []
-    for op in opportunities:
-        metadata.append(
-            {
-                "id": op["id"],
-                "type": op.get("type", "unknown"),
-                "title": op.get("title") or op.get("name"),
-                "region": op.get("region", []),
-                "eligible_caen_codes": op.get("eligible_caen_codes", []),
-                "deadlines": op.get("deadlines", []),
-                "eligibility_criteria": op.get("eligibility_criteria", []),
-                "number_of_docs": len(op.get("required_documents", [])),
-                "source_url": op.get("source_url"),
-                "funding": op.get("funding_max", "unspecified"),
-            }
-        )
+    metadata = [build_metadata(op) for op in opportunities]
 
     with INDEX_METADATA_PATH.open("w", encoding="utf-8") as f:
         json.dump(metadata, f, ensure_ascii=False, indent=2)
 
+    info = {"ann": ann, "rows": len(metadata), **embedder.info()}
+    if ann == "ivf":
+        unit = embeddings / (np.linalg.norm(embeddings, axis=1, keepdims=True) + 1e-10)
+        ivf = IVFIndex.build(unit, n_lists)
+        ivf.save(IVF_INDEX_PATH)
+        info.update({"n_lists": ivf.n_lists, "n_probe": n_probe})
+        print(f"Saved IVF index  → {IVF_INDEX_PATH} ({ivf.n_lists} lists)")
+    elif IVF_INDEX_PATH.exists():
+        os.remove(IVF_INDEX_PATH)
+
+    # two-stage search only pays off on large catalogues of rows wider than the first pass
+    if coarse_dim and coarse_dim < embeddings.shape[1] and len(embeddings) >= COARSE_MIN_ROWS:
+        np.save(COARSE_INDEX_PATH, coarse_rows(embeddings, coarse_dim))
+        info["coarse_dim"] = coarse_dim
+        print(f"Saved {coarse_dim}-d first-pass rows → {COARSE_INDEX_PATH}")
+    elif COARSE_INDEX_PATH.exists():
+        os.remove(COARSE_INDEX_PATH)
+
+    with INDEX_INFO_PATH.open("w", encoding="utf-8") as f:
+        json.dump(info, f, ensure_ascii=False, indent=2)
+
     print(f"Saved embeddings → {INDEX_EMBEDDINGS_PATH}")
     print(f"Saved metadata   → {INDEX_METADATA_PATH}")
 
+    build_lexical(opportunities)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the opportunity embedding index.")
+    parser.add_argument("--ann", choices=ANN_BACKENDS, default="exact",
+                        help="exact = căutare completă, ivf = index aproximativ (cataloage mari).")
+    parser.add_argument("--n-lists", type=int, default=None,
+                        help="Numărul de liste IVF (implicit sqrt(N)).")
+    parser.add_argument("--n-probe", type=int, default=DEFAULT_N_PROBE,
+                        help="Liste scanate implicit per interogare (recall vs. viteză).")
+    parser.add_argument("--coarse-dim", type=int, default=COARSE_DIM,
+                        help="Dimensiunea primei treceri (rescorare la dimensiunea completă); 0 = dezactivat.")
+    parser.add_argument("--embedding", choices=EMBEDDING_BACKENDS, default=DEFAULT_EMBEDDING_BACKEND,
+                        help="openai = API de embeddings, local = TF-IDF pe n-grame, fără rețea.")
+    parser.add_argument("--lexical-only", action="store_true",
+                        help="Doar indexul BM25 (fără apeluri de embeddings).")
+    args = parser.parse_args()
+    if args.lexical_only:
+        build_lexical()
+    else:
+        build_index(args.ann, args.n_lists, args.n_probe, args.embedding, args.coarse_dim)
+
 
 if __name__ == "__main__":
-    build_index()
+    main()
@@ -0,0 +1,209 @@
+# rag/lexical_index.py
+"""
+Local BM25 inverted index over opportunity fields.
+
+Built next to the vector index (index_builder) from the same rows, so it
+shares the metadata layout and the type / CAEN filters of
+OpportunityVectorStore, but answers queries with zero network calls.
+Matching is diacritic-insensitive; identifiers such as "PNRR/C9/I3",
+"62.01" or "POCIDIF-2024" are indexed whole as well as by their parts.
+"""
+from __future__ import annotations
+
+import json
+import math
+import re
+import unicodedata
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .eligibility_rules import caen_prefixes, normalize_caen_code
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+INDICES_DIR = BASE_DIR / "indices"
+LEXICAL_INDEX_PATH = INDICES_DIR / "opportunities_bm25.json"
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Romanian is heavily inflected, a prefix stem matches most word forms
+# (same trade-off as scraper/llm/caen_index.py)
+STEM_LENGTH = 6
+
+# field -> weight (the field's tokens are counted `weight` times)
+FIELD_WEIGHTS = {
+    "title": 3,
+    "name": 3,
+    "summary": 2,
+    "description": 2,
+    "eligibility_criteria": 1,
+    "required_documents": 1,
+    "region": 1,
+    "eligible_caen_codes": 2,
+    "raw_text": 1,
+}
+
+STOPWORDS = {
+    # ro
+    "si", "sau", "de", "din", "la", "cu", "in", "pe", "pentru", "al", "ale", "a",
+    "ai", "unor", "unei", "prin", "fara", "alte", "altor", "care", "ce", "este",
+    "sunt", "un", "o", "se", "nu", "mai", "sa", "fi", "pana", "catre", "lui",
+    # en
+    "the", "and", "of", "for", "to", "or", "with", "a", "an", "in", "on", "by",
+    "is", "are", "be", "at", "as", "from", "this", "that",
+}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[./_-][a-z0-9]+)*")
+
+
+def normalize_text(text: Any) -> str:
+    """Lowercase and strip diacritics (ș/ş, ț/ţ, ă, â, î)."""
+    if not isinstance(text, str):
+        text = "" if text is None else str(text)
+    text = unicodedata.normalize("NFD", text.lower())
+    return "".join(c for c in text if unicodedata.category(c) != "Mn")
+
+
+def tokenize(text: Any) -> List[str]:
+    """
+    Words are stemmed and stopwords dropped; compound identifiers are kept
+    whole, joined ("62.01" -> "6201") and split into their parts.
+    """
+    tokens: List[str] = []
+    for raw in _TOKEN_RE.findall(normalize_text(text)):
+        parts = re.split(r"[./_-]", raw)
+        if len(parts) > 1:
+            tokens.append(raw)
+            tokens.append("".join(parts))
+        for part in parts:
+            if part in STOPWORDS or (len(part) < 2 and not part.isdigit()):
+                continue
+            tokens.append(part if part.isdigit() or any(c.isdigit() for c in part) else part[:STEM_LENGTH])
+    return tokens
+
+
+def _field_text(value: Any) -> str:
+    if isinstance(value, list):
+        return " ".join(_field_text(v) for v in value)
+    if isinstance(value, dict):
+        return " ".join(_field_text(v) for v in value.values())
+    return "" if value is None else str(value)
+
+
+def document_tokens(op: Dict[str, Any]) -> List[str]:
+    tokens: List[str] = list(tokenize(op.get("id")))
+    for field, weight in FIELD_WEIGHTS.items():
+        field_tokens = tokenize(_field_text(op.get(field)))
+        tokens.extend(field_tokens * weight)
+    constraints = op.get("constraints") or {}
+    tokens.extend(tokenize(_field_text(constraints.get("caen_codes"))))
+    tokens.extend(tokenize(_field_text(constraints.get("regions"))))
+    return tokens
+
+
+def _postings(opportunities: List[Dict[str, Any]]):
+    """(doc lengths, {term: [[row, tf], ...]})."""
+    postings: Dict[str, List[List[int]]] = {}
+    doc_lengths: List[int] = []
+    for row, op in enumerate(opportunities):
+        counts = Counter(document_tokens(op))
+        doc_lengths.append(sum(counts.values()))
+        for term, tf in counts.items():
+            postings.setdefault(term, []).append([row, tf])
+    return doc_lengths, postings
+
+
+def build_lexical_index(
+    opportunities: List[Dict[str, Any]],
+    metadata: List[Dict[str, Any]],
+    path: Path = LEXICAL_INDEX_PATH,
+) -> Dict[str, Any]:
+    """
+    Index `opportunities` (with raw_text when available); `metadata` are the
+    vector-index rows for the same opportunities, in the same order.
+    """
+    doc_lengths, postings = _postings(opportunities)
+    data = {"doc_lengths": doc_lengths, "postings": postings, "metadata": metadata}
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+    return {"documents": len(doc_lengths), "terms": len(postings)}
+
+
+class LexicalIndex:
+    def __init__(self, path: Path = LEXICAL_INDEX_PATH):
+        if not path.exists():
+            raise RuntimeError("Lexical index not found. Run index_builder.build_index() first.")
+        with path.open("r", encoding="utf-8") as f:
+            data = json.load(f)
+        self._set(data["doc_lengths"], data["postings"], data["metadata"])
+
+    @classmethod
+    def from_opportunities(cls, opportunities: List[Dict[str, Any]], metadata: List[Dict[str, Any]]) -> "LexicalIndex":
+        """In-memory index (benchmarks, tests)."""
+        index = cls.__new__(cls)
+        index._set(*_postings(opportunities), metadata)
+        return index
+
+    def _set(self, doc_lengths: List[int], postings: Dict[str, List[List[int]]], metadata: List[Dict[str, Any]]):
+        self.metadata = metadata
+        self.doc_lengths = np.asarray(doc_lengths, dtype="float32")
+        n = len(doc_lengths)
+        avgdl = float(self.doc_lengths.mean()) if n else 0.0
+        # per-document BM25 length normalisation, computed once
+        self._norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths / (avgdl or 1.0))
+        self.postings: Dict[str, tuple] = {}
+        for term, entries in postings.items():
+            arr = np.asarray(entries, dtype="int64")
+            idf = math.log(1 + (n - len(arr) + 0.5) / (len(arr) + 0.5))
+            self.postings[term] = (arr[:, 0], arr[:, 1].astype("float32"), idf)
+
+        self.types = np.array([m.get("type") for m in metadata], dtype=object)
+        self.caen_sets = [
+            {c for c in map(normalize_caen_code, m.get("eligible_caen_codes") or []) if c}
+            for m in metadata
+        ]
+
+    def __len__(self) -> int:
+        return len(self.metadata)
+
+    def _mask(self, filter_type: Optional[str], filter_caen: Optional[str]) -> np.ndarray:
+        mask = np.ones(len(self), dtype=bool)
+        if filter_type:
+            mask &= self.types == filter_type
+        caen = normalize_caen_code(filter_caen) if filter_caen else None
+        if caen:
+            covering = caen_prefixes(caen)
+            mask &= np.array([not codes or bool(codes & covering) for codes in self.caen_sets], dtype=bool)
+        return mask
+
+    def scores(self, query: str) -> np.ndarray:
+        scores = np.zeros(len(self), dtype="float32")
+        for term in set(tokenize(query)):
+            entry = self.postings.get(term)
+            if entry is None:
+                continue
+            docs, tf, idf = entry
+            scores[docs] += idf * tf * (BM25_K1 + 1) / (tf + self._norm[docs])
+        return scores
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 5,
+        filter_type: Optional[str] = None,
+        filter_caen: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """Best BM25 matches (score > 0) with the same filters as OpportunityVectorStore.search."""
+        scores = self.scores(query)
+        scores[~self._mask(filter_type, filter_caen)] = 0.0
+        hits = np.flatnonzero(scores > 0)
+        if not len(hits):
+            return []
+        k = min(top_k, len(hits))
+        top = hits[np.argpartition(-scores[hits], k - 1)[:k]] if k < len(hits) else hits
+        top = top[np.argsort(-scores[top])]
+        return [{**self.metadata[i], "score": float(scores[i])} for i in top]
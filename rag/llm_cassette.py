@@ -0,0 +1,153 @@
+# rag/llm_cassette.py
+"""
+Record / replay of the LLM gateway's calls, for offline benchmarks and
+regression runs of the whole pipeline (recommendation, documentation,
+scraper extraction, embeddings).
+
+A cassette is a directory with one JSON line per distinct request:
+{"key", "endpoint", "model", "latency_ms", "response"}, keyed by the hash
+of the endpoint and the canonical JSON of the request body. Modes:
+
+    record  - every call goes to the API, responses are (re)written
+    replay  - only the cassette, a request not in it raises CassetteMiss
+    auto    - replay what is recorded, record the rest
+
+Replays sleep the recorded latency times `latency_scale`, or a fixed
+`latency_ms` when one is set (0 = as fast as possible).
+
+    LLM_CASSETTE=outputs/cassettes/pipeline LLM_CASSETTE_MODE=record python -m rag.run_match_opp --cif ...
+    LLM_CASSETTE=outputs/cassettes/pipeline python -m rag.run_match_opp --cif ...    # replay, offline
+    python -m rag.llm_cassette outputs/cassettes/pipeline                             # what is in it
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from openai.types import CreateEmbeddingResponse
+from openai.types.chat import ChatCompletion
+from openai.types.responses import Response
+
+CASSETTE_MODES = ("record", "replay", "auto")
+CASSETTE_FILE = "cassette.jsonl"
+
+# environment of get_gateway()
+CASSETTE_ENV = "LLM_CASSETTE"
+CASSETTE_MODE_ENV = "LLM_CASSETTE_MODE"
+# "recorded" (default), or a fixed number of milliseconds per replayed call
+CASSETTE_LATENCY_ENV = "LLM_CASSETTE_LATENCY"
+
+RESPONSE_TYPES = {
+    "responses": Response,
+    "chat.completions": ChatCompletion,
+    "embeddings": CreateEmbeddingResponse,
+}
+
+
+class CassetteMiss(RuntimeError):
+    """Replay mode and the request was never recorded."""
+
+
+def request_key(endpoint: str, kwargs: Dict[str, Any]) -> str:
+    canonical = json.dumps({"endpoint": endpoint, "request": kwargs}, sort_keys=True, ensure_ascii=False,
+                           separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    def __init__(
+        self,
+        path: Path,
+        mode: str = "replay",
+        latency_ms: Optional[float] = None,
+        latency_scale: float = 1.0,
+    ):
+        if mode not in CASSETTE_MODES:
+            raise ValueError(f"cassette mode must be one of {CASSETTE_MODES}, got {mode!r}")
+        self.path = Path(path)
+        self.mode = mode
+        self.latency_ms = latency_ms
+        self.latency_scale = latency_scale
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self.stats = Counter()
+        file = self.path / CASSETTE_FILE
+        if file.exists():
+            with file.open("r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.entries[entry["key"]] = entry  # later lines win
+
+    @classmethod
+    def from_env(cls) -> Optional["Cassette"]:
+        path = os.getenv(CASSETTE_ENV)
+        if not path:
+            return None
+        latency = os.getenv(CASSETTE_LATENCY_ENV, "recorded")
+        return cls(
+            Path(path),
+            os.getenv(CASSETTE_MODE_ENV, "replay"),
+            latency_ms=None if latency == "recorded" else float(latency),
+        )
+
+    def replay(self, endpoint: str, key: str) -> Optional[Any]:
+        """The recorded SDK response (after its synthetic latency), None if not recorded."""
+        if self.mode == "record":
+            return None
+        entry = self.entries.get(key)
+        if entry is None:
+            self.stats["misses"] += 1
+            if self.mode == "replay":
+                raise CassetteMiss(f"{endpoint} request {key[:12]} not in cassette {self.path}")
+            return None
+        self.stats["replayed"] += 1
+        delay_ms = self.latency_ms if self.latency_ms is not None else entry["latency_ms"] * self.latency_scale
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000)
+        # built the way the SDK builds API responses: no validation, nested models kept
+        return RESPONSE_TYPES[endpoint].construct(**entry["response"])
+
+    def record(self, endpoint: str, key: str, model: str, response: Any, latency_ms: float):
+        if self.mode == "replay":
+            return
+        entry = {
+            "key": key,
+            "endpoint": endpoint,
+            "model": model,
+            "latency_ms": round(latency_ms, 1),
+            "response": response.model_dump(mode="json", exclude_unset=True),
+        }
+        line = json.dumps(entry, ensure_ascii=False)
+        with self._lock:
+            self.entries[key] = entry
+            self.stats["recorded"] += 1
+            self.path.mkdir(parents=True, exist_ok=True)
+            with (self.path / CASSETTE_FILE).open("a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Conținutul unei casete LLM înregistrate.")
+    parser.add_argument("path", help="Directorul casetei.")
+    args = parser.parse_args()
+
+    cassette = Cassette(Path(args.path))
+    by_endpoint = Counter(f"{e['endpoint']} / {e['model']}" for e in cassette.entries.values())
+    latencies = [e["latency_ms"] for e in cassette.entries.values()]
+    print(json.dumps({
+        "entries": len(cassette.entries),
+        "by_endpoint": dict(by_endpoint),
+        "recorded_latency_ms_total": round(sum(latencies), 1),
+    }, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,533 @@
+# rag/llm_gateway.py
+"""
+One gateway for every OpenAI call of the project (recommendation,
+documentation_rag, openai_client embeddings, the scraper extractors).
+
+- one OpenAI client over a pooled httpx connection pool, retries with
+  backoff on 429 / 5xx / connection errors (Retry-After is honoured)
+- token buckets per model for requests-per-minute and tokens-per-minute,
+  shared by every process of the machine through a small SQLite file, so
+  the frontend's subprocesses, batch jobs and the scraper draw from the
+  same limits
+- priority classes: a class may only take from a bucket while more than
+  its reserve is left, so batch scraping never uses the headroom kept for
+  interactive page loads
+- per-job token budgets (also persisted, a resumed job keeps its spend)
+- one JSON line per call in outputs/llm/usage-<day>.jsonl
+
+The gateway exposes the SDK surface the project uses
+(responses / chat.completions / embeddings .create); anything else
+(files, batches) goes to the underlying client unthrottled.
+
+    with llm_job("batch-20250101", priority=BATCH, max_tokens=2_000_000):
+        get_gateway().responses.create(model=..., input=...)
+
+    python -m rag.llm_gateway --usage            # today's spend per job/model
+
+Setting OPENAI_BASE_URL (or LLMGateway(base_url=...)) points it at a local
+fake server, see benchmarks/fake_openai.py; LLM_CASSETTE records or replays
+the calls instead (rag.llm_cassette).
+"""
+from __future__ import annotations
+
+import argparse
+import contextvars
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+import httpx
+import openai
+from dotenv import load_dotenv
+
+from . import tracing
+from .llm_cassette import Cassette, CassetteMiss, request_key
+
+load_dotenv()
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+LLM_DIR = BASE_DIR / "outputs" / "llm"
+LIMITS_DB_PATH = LLM_DIR / "limits.sqlite"
+
+# priority class -> share of each bucket it must leave untouched
+INTERACTIVE = "interactive"
+DEFAULT = "default"
+BATCH = "batch"
+PRIORITY_RESERVE = {INTERACTIVE: 0.0, DEFAULT: 0.2, BATCH: 0.5}
+# process-wide default class when no llm_job() is active
+PRIORITY_ENV = "LLM_PRIORITY"
+
+# (requests per minute, tokens per minute) per model, OpenAI usage tier 1
+MODEL_LIMITS = {
+    "gpt-4.1": (500, 30_000),
+    "gpt-4.1-mini": (500, 200_000),
+    "gpt-4.1-nano": (500, 200_000),
+    "text-embedding-3-small": (3_000, 1_000_000),
+    "text-embedding-3-large": (3_000, 1_000_000),
+}
+DEFAULT_LIMITS = (500, 200_000)
+
+MAX_CONNECTIONS = 32
+MAX_KEEPALIVE_CONNECTIONS = 16
+REQUEST_TIMEOUT_S = 120.0
+CONNECT_TIMEOUT_S = 10.0
+
+MAX_RETRIES = 5
+BACKOFF_BASE_S = 1.0
+BACKOFF_MAX_S = 30.0
+# longest single sleep while waiting for a bucket, re-checked afterwards
+MAX_WAIT_STEP_S = 1.0
+
+# token estimate before the call (same ratio as scraper/llm/chunking.py)
+CHARS_PER_TOKEN = 4
+DEFAULT_OUTPUT_TOKENS = 512
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.InternalServerError,
+)
+
+# usage-record fields copied onto the call's tracing span
+TRACED_FIELDS = ("job", "priority", "status", "attempts", "queued_ms", "latency_ms", "input_tokens", "output_tokens")
+
+
+class BudgetExceeded(RuntimeError):
+    """The job's token budget does not cover the next call."""
+
+
+@dataclass(frozen=True)
+class LLMJob:
+    name: str
+    priority: str = DEFAULT
+    max_tokens: Optional[int] = None
+
+
+_current_job: contextvars.ContextVar[Optional[LLMJob]] = contextvars.ContextVar("llm_job", default=None)
+
+
+@contextmanager
+def llm_job(name: str, priority: Optional[str] = None, max_tokens: Optional[int] = None) -> Iterator[LLMJob]:
+    """
+    Attribute the calls made inside the block to job `name`, with its
+    priority class and optional token budget. Thread pools started inside
+    need in_current_context() to keep it.
+    """
+    priority = priority or current_priority()
+    if priority not in PRIORITY_RESERVE:
+        raise ValueError(f"priority must be one of {tuple(PRIORITY_RESERVE)}, got {priority!r}")
+    token = _current_job.set(LLMJob(name, priority, max_tokens))
+    try:
+        yield _current_job.get()
+    finally:
+        _current_job.reset(token)
+
+
+def current_priority() -> str:
+    job = _current_job.get()
+    if job is not None:
+        return job.priority
+    priority = os.getenv(PRIORITY_ENV, DEFAULT)
+    return priority if priority in PRIORITY_RESERVE else DEFAULT
+
+
+def in_current_context(fn: Callable) -> Callable:
+    """fn running in a copy of the caller's context (for pool.map / submit)."""
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return context.copy().run(fn, *args, **kwargs)
+
+    return run
+
+
+def _text_chars(value: Any) -> int:
+    if isinstance(value, str):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(_text_chars(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(_text_chars(v) for v in value)
+    return 0
+
+
+def estimate_tokens(endpoint: str, kwargs: Dict[str, Any]) -> int:
+    """Input + maximum output tokens of a request, before sending it."""
+    if endpoint == "embeddings":
+        return max(1, _text_chars(kwargs.get("input")) // CHARS_PER_TOKEN)
+    prompt = kwargs.get("input") if endpoint == "responses" else kwargs.get("messages")
+    output = (
+        kwargs.get("max_output_tokens")
+        or kwargs.get("max_completion_tokens")
+        or kwargs.get("max_tokens")
+        or DEFAULT_OUTPUT_TOKENS
+    )
+    return max(1, _text_chars(prompt) // CHARS_PER_TOKEN) + int(output)
+
+
+def response_usage(response: Any) -> Tuple[int, int]:
+    """(input, output) tokens reported by any of the three endpoints."""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return 0, 0
+    input_tokens = getattr(usage, "input_tokens", None)
+    if input_tokens is None:
+        input_tokens = getattr(usage, "prompt_tokens", 0)
+    output_tokens = getattr(usage, "output_tokens", None)
+    if output_tokens is None:
+        output_tokens = getattr(usage, "completion_tokens", 0)
+    return int(input_tokens or 0), int(output_tokens or 0)
+
+
+class SharedLimits:
+    """
+    Token buckets and job budgets in SQLite, so that every process using
+    the gateway on this machine shares them. Each check-and-take runs in
+    one IMMEDIATE transaction.
+    """
+
+    def __init__(self, path: Path = LIMITS_DB_PATH):
+        self.path = path
+        self._local = threading.local()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        # one connection per thread, opened on first use
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, level REAL, updated REAL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS budgets (job TEXT PRIMARY KEY, used INTEGER)")
+            self._local.conn = conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    @staticmethod
+    def _level(conn: sqlite3.Connection, key: str, capacity: float, now: float) -> float:
+        row = conn.execute("SELECT level, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return capacity
+        level, updated = row
+        return min(capacity, level + (now - updated) * capacity / 60.0)
+
+    def take(self, model: str, tokens: int, priority: str, limits: Tuple[int, int]) -> float:
+        """
+        Take 1 request and `tokens` tokens from the model's buckets, or
+        return how many seconds to wait before trying again.
+        """
+        reserve = PRIORITY_RESERVE[priority]
+        rpm, tpm = limits
+        # a request larger than the class may ever take still has to pass
+        wanted = [
+            (key, capacity, min(amount, capacity * (1 - reserve)))
+            for key, capacity, amount in ((f"{model}:rpm", rpm, 1), (f"{model}:tpm", tpm, tokens))
+        ]
+        now = time.time()
+        with self._transaction() as conn:
+            levels = [self._level(conn, key, capacity, now) for key, capacity, _ in wanted]
+            wait = max(
+                (amount + reserve * capacity - level) * 60.0 / capacity
+                for (_, capacity, amount), level in zip(wanted, levels)
+            )
+            if wait > 0:
+                return wait
+            for (key, _, amount), level in zip(wanted, levels):
+                conn.execute(
+                    "INSERT OR REPLACE INTO buckets (key, level, updated) VALUES (?, ?, ?)",
+                    (key, level - amount, now),
+                )
+        return 0.0
+
+    def settle(self, model: str, delta_tokens: int, limits: Tuple[int, int]):
+        """Correct the token bucket by actual - estimated tokens (may go negative)."""
+        if not delta_tokens:
+            return
+        key, capacity, now = f"{model}:tpm", limits[1], time.time()
+        with self._transaction() as conn:
+            level = self._level(conn, key, capacity, now) - delta_tokens
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (key, level, updated) VALUES (?, ?, ?)",
+                (key, min(capacity, level), now),
+            )
+
+    def reserve_budget(self, job: LLMJob, tokens: int):
+        with self._transaction() as conn:
+            row = conn.execute("SELECT used FROM budgets WHERE job = ?", (job.name,)).fetchone()
+            used = row[0] if row else 0
+            if job.max_tokens is not None and used + tokens > job.max_tokens:
+                raise BudgetExceeded(
+                    f"job {job.name!r}: {used} + ~{tokens} tokens would exceed the budget of {job.max_tokens}"
+                )
+            conn.execute("INSERT OR REPLACE INTO budgets (job, used) VALUES (?, ?)", (job.name, used + tokens))
+
+    def settle_budget(self, job: LLMJob, delta_tokens: int):
+        if delta_tokens:
+            with self._transaction() as conn:
+                conn.execute("UPDATE budgets SET used = MAX(0, used + ?) WHERE job = ?", (delta_tokens, job.name))
+
+    def budget_used(self, job_name: str) -> int:
+        with self._transaction() as conn:
+            row = conn.execute("SELECT used FROM budgets WHERE job = ?", (job_name,)).fetchone()
+        return row[0] if row else 0
+
+
+class _Endpoint:
+    def __init__(self, gateway: "LLMGateway", name: str, resolve: Callable[[Any], Any]):
+        self._gateway = gateway
+        self._name = name
+        self._resolve = resolve
+
+    def create(self, **kwargs):
+        return self._gateway.call(self._name, self._resolve, kwargs)
+
+
+class _Chat:
+    def __init__(self, gateway: "LLMGateway"):
+        self.completions = _Endpoint(gateway, "chat.completions", lambda c: c.chat.completions)
+
+
+class LLMGateway:
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        api_key: Optional[str] = None,
+        limits_path: Path = LIMITS_DB_PATH,
+        usage_dir: Path = LLM_DIR,
+        model_limits: Optional[Dict[str, Tuple[int, int]]] = None,
+        max_connections: int = MAX_CONNECTIONS,
+        max_retries: int = MAX_RETRIES,
+        cassette: Optional[Cassette] = None,
+    ):
+        self.cassette = cassette
+        self.base_url = base_url or os.getenv("OPENAI_BASE_URL")
+        self.api_key = api_key
+        self.limits = SharedLimits(limits_path)
+        self.usage_dir = usage_dir
+        self.model_limits = {**MODEL_LIMITS, **(model_limits or {})}
+        self.max_connections = max_connections
+        self.max_retries = max_retries
+        self._client: Optional[openai.OpenAI] = None
+        self._client_lock = threading.Lock()
+        self._log_lock = threading.Lock()
+
+        self.responses = _Endpoint(self, "responses", lambda c: c.responses)
+        self.chat = _Chat(self)
+        self.embeddings = _Endpoint(self, "embeddings", lambda c: c.embeddings)
+
+    @property
+    def client(self) -> openai.OpenAI:
+        """The SDK client, created on first use (importing needs no key)."""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    api_key = self.api_key or os.getenv("OPENAI_API_KEY")
+                    if not api_key and not self.base_url:
+                        raise RuntimeError("OPENAI_API_KEY not set in environment/.env")
+                    http_client = openai.DefaultHttpxClient(
+                        limits=httpx.Limits(
+                            max_connections=self.max_connections,
+                            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                        ),
+                        timeout=httpx.Timeout(REQUEST_TIMEOUT_S, connect=CONNECT_TIMEOUT_S),
+                    )
+                    self._client = openai.OpenAI(
+                        api_key=api_key or "local",
+                        base_url=self.base_url,
+                        http_client=http_client,
+                        # retries are done here, after the rate limiter
+                        max_retries=0,
+                    )
+        return self._client
+
+    def __getattr__(self, name: str):
+        # files, batches, ...: straight to the SDK client
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.client, name)
+
+    def limits_for(self, model: str) -> Tuple[int, int]:
+        return self.model_limits.get(model, DEFAULT_LIMITS)
+
+    def _wait_for_capacity(self, model: str, tokens: int, priority: str) -> float:
+        started = time.monotonic()
+        while True:
+            wait = self.limits.take(model, tokens, priority, self.limits_for(model))
+            if wait <= 0:
+                return time.monotonic() - started
+            time.sleep(min(wait, MAX_WAIT_STEP_S))
+
+    @staticmethod
+    def _retry_after(error: Exception, attempt: int) -> float:
+        response = getattr(error, "response", None)
+        header = response.headers.get("retry-after") if response is not None else None
+        try:
+            if header is not None:
+                return min(BACKOFF_MAX_S, float(header))
+        except ValueError:
+            pass
+        return min(BACKOFF_MAX_S, BACKOFF_BASE_S * 2 ** attempt) * (0.5 + random.random() / 2)
+
+    def call(self, endpoint: str, resolve: Callable[[Any], Any], kwargs: Dict[str, Any]):
+        with tracing.span("llm.call", endpoint=endpoint, model=kwargs.get("model", "")):
+            return self._call(endpoint, resolve, kwargs)
+
+    def _call(self, endpoint: str, resolve: Callable[[Any], Any], kwargs: Dict[str, Any]):
+        job = _current_job.get() or LLMJob("-", current_priority())
+        model = kwargs.get("model", "")
+        estimated = estimate_tokens(endpoint, kwargs)
+        record: Dict[str, Any] = {
+            "ts": datetime.now().isoformat(timespec="milliseconds"),
+            "endpoint": endpoint,
+            "model": model,
+            "job": job.name,
+            "priority": job.priority,
+            "estimated_tokens": estimated,
+            "attempts": 0,
+            "queued_ms": 0.0,
+        }
+
+        key = None
+        if self.cassette is not None:
+            # replays are offline: no limits, no budget, only the usage line
+            key = request_key(endpoint, kwargs)
+            started = time.monotonic()
+            try:
+                response = self.cassette.replay(endpoint, key)
+            except CassetteMiss as e:
+                self._log({**record, "status": "cassette_miss", "error": str(e)})
+                raise
+            if response is not None:
+                input_tokens, output_tokens = response_usage(response)
+                self._log({
+                    **record,
+                    "status": "replayed",
+                    "latency_ms": round(1000 * (time.monotonic() - started), 1),
+                    "input_tokens": input_tokens,
+                    "output_tokens": output_tokens,
+                })
+                return response
+
+        try:
+            self.limits.reserve_budget(job, estimated)
+        except BudgetExceeded as e:
+            self._log({**record, "status": "budget_exceeded", "error": str(e)})
+            raise
+
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            record["queued_ms"] += 1000 * self._wait_for_capacity(model, estimated, job.priority)
+            attempt += 1
+            try:
+                response = resolve(self.client).create(**kwargs)
+                break
+            except RETRYABLE_ERRORS as e:
+                # the failed attempt still counted against the limits
+                if attempt > self.max_retries:
+                    self.limits.settle_budget(job, -estimated)
+                    self._log({**record, "attempts": attempt, "status": "error", "error": repr(e),
+                               "latency_ms": round(1000 * (time.monotonic() - started), 1)})
+                    raise
+                time.sleep(self._retry_after(e, attempt))
+            except Exception as e:
+                self.limits.settle_budget(job, -estimated)
+                self._log({**record, "attempts": attempt, "status": "error", "error": repr(e),
+                           "latency_ms": round(1000 * (time.monotonic() - started), 1)})
+                raise
+
+        latency_ms = 1000 * (time.monotonic() - started) - record["queued_ms"]
+        if self.cassette is not None:
+            self.cassette.record(endpoint, key, model, response, latency_ms)
+        input_tokens, output_tokens = response_usage(response)
+        actual = input_tokens + output_tokens
+        if actual:
+            self.limits.settle(model, actual - estimated, self.limits_for(model))
+            self.limits.settle_budget(job, actual - estimated)
+        self._log({
+            **record,
+            "attempts": attempt,
+            "status": "ok",
+            "latency_ms": round(latency_ms, 1),
+            "queued_ms": round(record["queued_ms"], 1),
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+        })
+        return response
+
+    def usage_path(self, day: Optional[date] = None) -> Path:
+        return self.usage_dir / f"usage-{(day or date.today()).isoformat()}.jsonl"
+
+    def _log(self, record: Dict[str, Any]):
+        tracing.annotate(**{k: record[k] for k in TRACED_FIELDS if k in record})
+        line = json.dumps(record, ensure_ascii=False)
+        with self._log_lock:
+            self.usage_dir.mkdir(parents=True, exist_ok=True)
+            with self.usage_path().open("a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+_gateway: Optional[LLMGateway] = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway() -> LLMGateway:
+    """The process-wide gateway."""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = LLMGateway(cassette=Cassette.from_env())
+    return _gateway
+
+
+def summarize_usage(path: Path) -> Dict[str, Dict[str, Any]]:
+    """{"job / model": {calls, replayed, errors, input_tokens, output_tokens, queued_ms, latency_ms}}."""
+    summary: Dict[str, Dict[str, Any]] = {}
+    if not path.exists():
+        return summary
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            entry = summary.setdefault(f"{row['job']} / {row['model']}", {
+                "calls": 0, "replayed": 0, "errors": 0, "input_tokens": 0, "output_tokens": 0,
+                "queued_ms": 0.0, "latency_ms": 0.0,
+            })
+            entry["calls"] += 1
+            entry["replayed"] += row["status"] == "replayed"
+            entry["errors"] += row["status"] not in ("ok", "replayed")
+            for key in ("input_tokens", "output_tokens", "queued_ms", "latency_ms"):
+                entry[key] += row.get(key) or 0
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consumul de tokeni al apelurilor LLM.")
+    parser.add_argument("--usage", action="store_true", help="Rezumat per job/model din jurnalul zilei.")
+    parser.add_argument("--day", default=None, help="Ziua (YYYY-MM-DD), implicit azi.")
+    args = parser.parse_args()
+
+    if args.usage:
+        day = date.fromisoformat(args.day) if args.day else None
+        print(json.dumps(summarize_usage(get_gateway().usage_path(day)), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
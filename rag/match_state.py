@@ -0,0 +1,145 @@
+# rag/match_state.py
+"""
+Dependency tracking for stored match results.
+
+outputs/<cif>/match_state.json records what a firm's results were computed
+from: the firm version (hash of data/firms/<cif>.json), the catalogue
+version, the hash of every scored opportunity, the scoring settings and the
+day deadlines were last checked on; the scored pairs themselves live in
+outputs/matches.sqlite (rag.match_store). run_match_opp uses it to re-score
+only the pairs a change touches; the web app uses needs_rematch() to decide
+whether a run is needed at all.
+"""
+from __future__ import annotations
+
+import json
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+from . import match_store
+from .catalogue import catalogue_version
+from .deadlines import is_expired  # noqa: F401 (re-exported for the match runners)
+from .firm_profile import FIRMS_DIR, firm_version
+from .parse_input import load_manifest, record_hash, write_json_atomic
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+OUTPUT_DIR = BASE_DIR / "outputs"
+MATCH_STATE_FILE = "match_state.json"
+
+
+def state_path(cif: str):
+    return OUTPUT_DIR / str(cif) / MATCH_STATE_FILE
+
+
+def load_state(cif: str) -> Optional[Dict[str, Any]]:
+    path = state_path(cif)
+    if not path.exists():
+        return None
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"[match_state] ignoring unreadable {path}: {e}")
+        return None
+    if "scored" in state:
+        # saved before rag.match_store: move the pairs over once
+        scored = state.pop("scored")
+        state["pairs"] = len(scored)
+        if not match_store.has_scores(cif):
+            match_store.save_scores(cif, scored)
+    return state
+
+
+def _scores_missing(state: Dict[str, Any], cif: str) -> bool:
+    return bool(state.get("pairs")) and not match_store.has_scores(cif)
+
+
+def firm_file_version(cif: str) -> Optional[str]:
+    path = FIRMS_DIR / f"{cif}.json"
+    if not path.exists():
+        return None
+    with path.open("r", encoding="utf-8") as f:
+        return firm_version(json.load(f))
+
+
+def opportunity_hashes(opportunities: List[Dict[str, Any]]) -> Dict[str, str]:
+    """
+    Content hash per opportunity id: the compiler's hash of the full record
+    (raw_text included) when the manifest has it, else a hash of the
+    catalogue record.
+    """
+    known = load_manifest().get("hashes", {})
+    return {
+        str(op["id"]): known.get(str(op["id"])) or record_hash(op)
+        for op in opportunities
+        if op.get("id") is not None
+    }
+
+
+def needs_rematch(cif: str, settings: Optional[Dict[str, Any]] = None, today: Optional[date] = None) -> bool:
+    """
+    True when stored results may be out of date: none yet, the firm or the
+    catalogue changed, other settings, or deadlines not checked today.
+    """
+    state = load_state(cif)
+    if state is None or _scores_missing(state, cif):
+        return True
+    if state.get("firm_version") != firm_file_version(cif):
+        return True
+    if state.get("catalogue_version") != catalogue_version():
+        return True
+    if settings is not None and state.get("settings") != settings:
+        return True
+    return state.get("checked_on") != (today or date.today()).isoformat()
+
+
+def plan_rematch(
+    state: Optional[Dict[str, Any]],
+    cif: str,
+    settings: Dict[str, Any],
+    hashes: Dict[str, str],
+) -> Dict[str, Any]:
+    """
+    Which pairs must be re-scored:
+
+        {"mode": "full" | "incremental", "affected": {ids}, "removed": {ids},
+         "reason": str}
+
+    Firm edits and changed settings affect every pair; catalogue changes
+    only the new and updated opportunities.
+    """
+    if state is None or _scores_missing(state, cif):
+        return {"mode": "full", "affected": set(hashes), "removed": set(), "reason": "no stored results"}
+    if state.get("firm_version") != firm_file_version(cif):
+        return {"mode": "full", "affected": set(hashes), "removed": set(), "reason": "firm changed"}
+    if state.get("settings") != settings:
+        return {"mode": "full", "affected": set(hashes), "removed": set(), "reason": "settings changed"}
+
+    stored = state.get("opp_hashes", {})
+    affected: Set[str] = {op_id for op_id, h in hashes.items() if stored.get(op_id) != h}
+    removed = set(stored) - set(hashes)
+    reason = "catalogue change-set" if affected or removed else "up to date"
+    return {"mode": "incremental", "affected": affected, "removed": removed, "reason": reason}
+
+
+def save_state(
+    cif: str,
+    settings: Dict[str, Any],
+    hashes: Dict[str, str],
+    scored: List[Dict[str, Any]],
+    today: Optional[date] = None,
+) -> None:
+    """Store the scored pairs (rag.match_store), then the state they were computed from."""
+    pairs = match_store.save_scores(cif, scored)
+    write_json_atomic(
+        {
+            "firm_version": firm_file_version(cif),
+            "catalogue_version": catalogue_version(),
+            "settings": settings,
+            "checked_on": (today or date.today()).isoformat(),
+            "opp_hashes": hashes,
+            "pairs": pairs,
+        },
+        state_path(cif),
+    )
@@ -0,0 +1,150 @@
+# rag/match_store.py
+"""
+Per-firm match results: every scored (firm, opportunity) pair, not only the
+recommended top_k.
+
+outputs/matches.sqlite holds one row per pair with the full
+build_match_entry() record as JSON plus the columns results are filtered and
+ordered on (type, score, eligibility, funding, closing date), so top_k, type
+filters and sort orders are applied when reading instead of when scoring:
+changing any of them needs no LLM call.
+"""
+from __future__ import annotations
+
+import json
+import sqlite3
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from .deadlines import closes_on
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+MATCHES_DB = BASE_DIR / "outputs" / "matches.sqlite"
+
+# ORDER BY per read-time sort; ties always fall back to the score
+SORT_ORDERS = {
+    "score": "semantic_score DESC",
+    "eligible": "eligibility DESC, semantic_score DESC",
+    "funding": "funding IS NULL, funding DESC, semantic_score DESC",
+    "deadline": "closes IS NULL, closes ASC, semantic_score DESC",
+}
+DEFAULT_SORT = "score"
+
+
+def _connect() -> sqlite3.Connection:
+    MATCHES_DB.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(MATCHES_DB), timeout=30)
+    # the web app reads while rag.run_match_opp / run_batch_match write
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS matches (
+            cif TEXT NOT NULL,
+            opportunity_id TEXT NOT NULL,
+            type TEXT,
+            semantic_score REAL NOT NULL,
+            eligibility INTEGER NOT NULL,
+            funding REAL,
+            closes TEXT,
+            match_tier TEXT,
+            entry TEXT NOT NULL,
+            PRIMARY KEY (cif, opportunity_id)
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_matches_score ON matches(cif, semantic_score DESC)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_matches_type ON matches(cif, type, semantic_score DESC)")
+    return conn
+
+
+def _row(cif: str, entry: Dict[str, Any]) -> tuple:
+    funding = entry.get("funding")
+    closes = closes_on(entry)
+    return (
+        str(cif),
+        str(entry["id"]),
+        entry.get("type"),
+        float(entry.get("semantic_score") or 0.0),
+        int(bool(entry.get("eligibility"))),
+        float(funding) if isinstance(funding, (int, float)) and not isinstance(funding, bool) else None,
+        closes.isoformat() if closes else None,
+        entry.get("match_tier"),
+        json.dumps(entry, ensure_ascii=False, separators=(",", ":")),
+    )
+
+
+def save_scores(cif: str, scored: Iterable[Dict[str, Any]]) -> int:
+    """Replace all stored pairs of a firm with `scored`; returns the row count."""
+    rows = [_row(cif, entry) for entry in scored if entry.get("id") is not None]
+    conn = _connect()
+    try:
+        with conn:
+            conn.execute("DELETE FROM matches WHERE cif = ?", (str(cif),))
+            conn.executemany(
+                "INSERT OR REPLACE INTO matches "
+                "(cif, opportunity_id, type, semantic_score, eligibility, funding, closes, match_tier, entry) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+    finally:
+        conn.close()
+    return len(rows)
+
+
+def _select(sql: str, params: tuple) -> List[tuple]:
+    if not MATCHES_DB.exists():
+        return []
+    conn = _connect()
+    try:
+        return conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+
+def has_scores(cif: str) -> bool:
+    return bool(_select("SELECT 1 FROM matches WHERE cif = ? LIMIT 1", (str(cif),)))
+
+
+def load_scores(cif: str) -> List[Dict[str, Any]]:
+    """Every stored pair of a firm, unsorted."""
+    return [json.loads(entry) for (entry,) in _select("SELECT entry FROM matches WHERE cif = ?", (str(cif),))]
+
+
+def query_matches(
+    cif: str,
+    top_k: Optional[int] = None,
+    opp_type: Optional[str] = None,
+    sort: str = DEFAULT_SORT,
+    eligible_only: bool = False,
+    open_on: Optional[date] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Stored pairs of a firm, filtered and ordered at read time (all of them
+    when top_k is None). With open_on, calls closed before that day are left
+    out before the LIMIT, so top_k still returns up to top_k open calls.
+    """
+    if sort not in SORT_ORDERS:
+        raise ValueError(f"sort must be one of {sorted(SORT_ORDERS)}, got {sort!r}")
+    sql = "SELECT entry FROM matches WHERE cif = ?"
+    params: List[Any] = [str(cif)]
+    if opp_type:
+        sql += " AND type = ?"
+        params.append(opp_type)
+    if eligible_only:
+        sql += " AND eligibility = 1"
+    if open_on is not None:
+        sql += " AND (closes IS NULL OR closes >= ?)"
+        params.append(open_on.isoformat())
+    sql += f" ORDER BY {SORT_ORDERS[sort]}, opportunity_id"
+    if top_k is not None:
+        sql += " LIMIT ?"
+        params.append(int(top_k))
+    return [json.loads(entry) for (entry,) in _select(sql, tuple(params))]
+
+
+def get_match(cif: str, opportunity_id: str) -> Optional[Dict[str, Any]]:
+    rows = _select(
+        "SELECT entry FROM matches WHERE cif = ? AND opportunity_id = ?", (str(cif), str(opportunity_id))
+    )
+    return json.loads(rows[0][0]) if rows else None
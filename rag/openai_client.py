@@ -1,38 +1,28 @@
 # src/embeddings/openai_client.py
-import os
-from dotenv import load_dotenv
-from openai import OpenAI
-
-load_dotenv()  # loads .env
-
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    raise RuntimeError("OPENAI_API_KEY not set in environment/.env")
-
-client = OpenAI(api_key=OPENAI_API_KEY)
+from .llm_gateway import get_gateway
 
 EMBEDDING_MODEL = "text-embedding-3-small"  # or -3-large if you want
 
 
-def embed_text(text: str) -> list[float]:
+def embed_text(text: str, model: str = EMBEDDING_MODEL) -> list[float]:
     """
     Embed a single text string using OpenAI embeddings API.
     """
-    resp = client.embeddings.create(
-        model=EMBEDDING_MODEL,
+    resp = get_gateway().embeddings.create(
+        model=model,
         input=[text],
     )
     return resp.data[0].embedding
 
 
-def embed_texts(texts: list[str]) -> list[list[float]]:
+def embed_texts(texts: list[str], model: str = EMBEDDING_MODEL) -> list[list[float]]:
     """
     Embed multiple texts at once.
     """
     if not texts:
         return []
-    resp = client.embeddings.create(
-        model=EMBEDDING_MODEL,
+    resp = get_gateway().embeddings.create(
+        model=model,
         input=texts,
     )
     return [d.embedding for d in resp.data]
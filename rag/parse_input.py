@@ -1,8 +1,16 @@
 # rag/parse_input.py
 
 from pathlib import Path
+import argparse
+import hashlib
 import json
-from typing import List, Any
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple
+
+from .catalogue import CATALOGUE_DB, write_catalogue
+from .dedup import dedupe_combined
 
 
 # Base paths (aligned with your existing project structure)
@@ -13,6 +21,20 @@ DATA_DIR = BASE_DIR / "data" / "opportunities"
 # Combined output for RAG
 OUTPUT_FILE = DATA_DIR / "sources.json"
 
+# Incremental compilation state: per-file mtime/size/hash + ids it produced
+MANIFEST_FILE = DATA_DIR / "sources_manifest.json"
+# Latest change-set, plus an append-only log of all of them for consumers
+# that need to catch up over several versions
+CHANGESET_FILE = DATA_DIR / "sources_changes.json"
+CHANGESET_LOG = DATA_DIR / "sources_changes.jsonl"
+
+# scraper/output/<dir> -> key in sources.json
+KIND_DIRS = {
+    "grants": "grants",
+    "vcs": "vcs",
+    "accelerators": "accelerators",
+}
+
 
 def load_json_file(path: Path) -> Any:
     """Load a JSON file and return its parsed content."""
@@ -51,6 +73,26 @@ def collect_objects_from_dir(dir_path: Path) -> List[dict]:
     return objects
 
 
+def dedupe_by_id(objects: List[dict]) -> List[dict]:
+    """
+    Keep one record per opportunity id (the most recently seen one).
+
+    The scraper store is keyed by a stable id, but older runs left one file
+    per run; this keeps the catalogue proportional to real opportunities.
+    """
+    by_id: dict = {}
+    without_id: List[dict] = []
+    for obj in objects:
+        op_id = obj.get("id")
+        if not op_id:
+            without_id.append(obj)
+            continue
+        current = by_id.get(op_id)
+        if current is None or (obj.get("last_seen") or "") >= (current.get("last_seen") or ""):
+            by_id[op_id] = obj
+    return list(by_id.values()) + without_id
+
+
 def build_combined_sources() -> dict:
     """
     Read all scraper outputs and build a combined structure:
@@ -60,19 +102,21 @@ def build_combined_sources() -> dict:
         "vcs": [...],
         "accelerators": [...]
     }
+
+    with near-duplicates across portals merged (rag.dedup).
     """
     grants_dir = SCRAPER_OUTPUT_DIR / "grants"
     vcs_dir = SCRAPER_OUTPUT_DIR / "vcs"
     acc_dir = SCRAPER_OUTPUT_DIR / "accelerators"
 
     print(f"[INFO] Reading grants from: {grants_dir}")
-    grants = collect_objects_from_dir(grants_dir)
+    grants = dedupe_by_id(collect_objects_from_dir(grants_dir))
 
     print(f"[INFO] Reading VCs from: {vcs_dir}")
-    vcs = collect_objects_from_dir(vcs_dir)
+    vcs = dedupe_by_id(collect_objects_from_dir(vcs_dir))
 
     print(f"[INFO] Reading accelerators from: {acc_dir}")
-    accelerators = collect_objects_from_dir(acc_dir)
+    accelerators = dedupe_by_id(collect_objects_from_dir(acc_dir))
 
     combined = {
         "grants": grants,
@@ -85,20 +129,284 @@ def build_combined_sources() -> dict:
         f"{len(vcs)} VCs, {len(accelerators)} accelerators."
     )
 
+    combined, report = dedupe_combined(combined)
+    print(
+        f"[INFO] Dedup: {report['records']} -> {report['unique']} records "
+        f"({report['clusters']} clusters, reduction {report['reduction_ratio']:.1%})"
+    )
+
     return combined
 
 
+def write_json_atomic(data: Any, output_path: Path) -> None:
+    """Write compact JSON to a temp file and rename it over the target."""
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = output_path.with_name(output_path.name + ".tmp")
+    with tmp_path.open("w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, output_path)
+
+
 def save_combined_sources(data: dict, output_path: Path) -> None:
     """Save the combined data to a single JSON file."""
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    with output_path.open("w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    write_json_atomic(data, output_path)
     print(f"[INFO] Combined sources written to: {output_path}")
 
 
+def record_hash(obj: dict) -> str:
+    raw = json.dumps(obj, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _objects_from_file(path: Path) -> List[dict]:
+    """Parse one scraper output file into opportunity dicts with ids."""
+    try:
+        data = load_json_file(path)
+    except Exception as e:
+        print(f"[ERROR] Failed to load {path}: {e}")
+        return []
+
+    if isinstance(data, dict):
+        data = [data]
+    if not isinstance(data, list):
+        print(f"[WARN] Unexpected JSON structure in {path}: {type(data)}")
+        return []
+
+    objects = []
+    for i, obj in enumerate(data):
+        if not isinstance(obj, dict):
+            continue
+        if not obj.get("id"):
+            # ids are what the manifest and change-sets track
+            obj["id"] = f"{path.stem}-{i}"
+        objects.append(obj)
+    return objects
+
+
+def _scan_output_files() -> Dict[str, Tuple[str, int, int]]:
+    """relpath -> (kind, mtime_ns, size) for every scraper output file."""
+    files: Dict[str, Tuple[str, int, int]] = {}
+    for dir_name, kind in KIND_DIRS.items():
+        dir_path = SCRAPER_OUTPUT_DIR / dir_name
+        if not dir_path.is_dir():
+            continue
+        with os.scandir(dir_path) as entries:
+            for entry in entries:
+                if not entry.name.endswith(".json") or not entry.is_file():
+                    continue
+                st = entry.stat()
+                files[f"{dir_name}/{entry.name}"] = (kind, st.st_mtime_ns, st.st_size)
+    return files
+
+
+def load_manifest() -> dict:
+    if MANIFEST_FILE.exists() and OUTPUT_FILE.exists():
+        try:
+            return load_json_file(MANIFEST_FILE)
+        except Exception as e:
+            print(f"[WARN] Ignoring unreadable manifest {MANIFEST_FILE}: {e}")
+    return {"version": 0, "files": {}, "hashes": {}}
+
+
+def compile_sources(full: bool = False) -> dict:
+    """
+    Incrementally rebuild sources.json from scraper/output.
+
+    Only files whose mtime/size changed are read, and only those whose
+    content hash changed are parsed. When nothing changed no file is
+    written. Returns the change-set:
+
+        {"version": int, "previous_version": int,
+         "added": [ids], "updated": [ids], "removed": [ids]}
+    """
+    started = time.perf_counter()
+    manifest = load_manifest()
+    old_files: Dict[str, dict] = manifest["files"]
+    old_hashes: Dict[str, str] = manifest["hashes"]
+
+    current = _scan_output_files()
+
+    new_files: Dict[str, dict] = {}
+    parsed: Dict[str, List[dict]] = {}
+    touched = False
+    for rel, (kind, mtime_ns, size) in current.items():
+        entry = old_files.get(rel)
+        if not full and entry and entry["mtime_ns"] == mtime_ns and entry["size"] == size:
+            new_files[rel] = entry
+            continue
+
+        path = SCRAPER_OUTPUT_DIR / rel
+        try:
+            raw = path.read_bytes()
+        except OSError as e:
+            print(f"[ERROR] Failed to read {path}: {e}")
+            continue
+        digest = hashlib.sha1(raw).hexdigest()
+        touched = True
+        if not full and entry and entry["sha1"] == digest:
+            new_files[rel] = {**entry, "mtime_ns": mtime_ns, "size": size}
+            continue
+
+        objects = _objects_from_file(path)
+        parsed[rel] = objects
+        new_files[rel] = {
+            "kind": kind,
+            "mtime_ns": mtime_ns,
+            "size": size,
+            "sha1": digest,
+            "ids": [o["id"] for o in objects],
+        }
+
+    removed_files = [rel for rel in old_files if rel not in current]
+    version = manifest["version"]
+    changes = {"version": version, "previous_version": version,
+               "added": [], "updated": [], "removed": []}
+
+    if not parsed and not removed_files:
+        if touched:
+            write_json_atomic({**manifest, "files": new_files}, MANIFEST_FILE)
+        if not CATALOGUE_DB.exists() and OUTPUT_FILE.exists():
+            write_catalogue(load_json_file(OUTPUT_FILE), version)
+        print(f"[INFO] Catalogue up to date (v{version}), "
+              f"{len(current)} files checked in {time.perf_counter() - started:.3f}s")
+        return changes
+
+    # ids whose record may have changed: everything the changed/removed
+    # files produced before and produce now
+    affected = set(old_hashes) if full else set()
+    for rel in list(parsed) + removed_files:
+        affected.update(old_files.get(rel, {}).get("ids", []))
+    for objects in parsed.values():
+        affected.update(o["id"] for o in objects)
+
+    previous = {} if full or not OUTPUT_FILE.exists() else load_json_file(OUTPUT_FILE)
+    # merged records (rag.dedup) are rebuilt as a whole: a change to any
+    # member re-reads every member
+    for kind_items in previous.values():
+        for o in kind_items:
+            members = {o.get("id"), *(o.get("duplicate_ids") or [])}
+            if affected.intersection(members):
+                affected.update(members)
+    catalogue: Dict[str, Dict[str, dict]] = {}
+    for kind in KIND_DIRS.values():
+        catalogue[kind] = {
+            o["id"]: o for o in previous.get(kind, []) if o.get("id") not in affected
+        }
+
+    # candidates for affected ids: freshly parsed files, plus unchanged
+    # files that also list one of those ids (legacy per-run duplicates)
+    candidates: Dict[str, List[Tuple[str, dict]]] = {}
+    for rel, objects in parsed.items():
+        for o in objects:
+            candidates.setdefault(o["id"], []).append((new_files[rel]["kind"], o))
+    for rel, entry in new_files.items():
+        if rel in parsed or not affected.intersection(entry["ids"]):
+            continue
+        for o in _objects_from_file(SCRAPER_OUTPUT_DIR / rel):
+            if o["id"] in affected:
+                candidates.setdefault(o["id"], []).append((entry["kind"], o))
+
+    for op_id, options in candidates.items():
+        kind, obj = options[0]
+        for option in options[1:]:
+            if (option[1].get("last_seen") or "") >= (obj.get("last_seen") or ""):
+                kind, obj = option
+        for other in catalogue.values():
+            other.pop(op_id, None)
+        catalogue[kind][op_id] = obj
+
+    # the same call from several portals: one canonical record, only pairs
+    # with a changed record are compared
+    deduped, dedup_report = dedupe_combined(
+        {kind: list(items.values()) for kind, items in catalogue.items()},
+        focus_ids=None if full else affected,
+    )
+    for canonical, absorbed in dedup_report["merged"].items():
+        affected.update([canonical, *absorbed])
+    catalogue = {kind: {o["id"]: o for o in items} for kind, items in deduped.items()}
+    changes["dedup"] = {k: v for k, v in dedup_report.items() if k != "merged"}
+
+    new_hashes: Dict[str, str] = dict(old_hashes)
+    present = set()
+    for kind_items in catalogue.values():
+        present.update(kind_items)
+    for op_id in affected:
+        if op_id not in present:
+            new_hashes.pop(op_id, None)
+            if op_id in old_hashes:
+                changes["removed"].append(op_id)
+            continue
+        obj = next(items[op_id] for items in catalogue.values() if op_id in items)
+        h = record_hash(obj)
+        new_hashes[op_id] = h
+        if op_id not in old_hashes:
+            changes["added"].append(op_id)
+        elif old_hashes[op_id] != h:
+            changes["updated"].append(op_id)
+
+    combined = {kind: list(items.values()) for kind, items in catalogue.items()}
+    has_changes = changes["added"] or changes["updated"] or changes["removed"]
+    if has_changes or full:
+        version += 1
+        changes["version"] = version
+        changes["compiled_at"] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        save_combined_sources(combined, OUTPUT_FILE)
+        if full or not CATALOGUE_DB.exists():
+            write_catalogue(combined, version)
+        else:
+            write_catalogue(
+                combined,
+                version,
+                only_ids=changes["added"] + changes["updated"],
+                removed_ids=changes["removed"],
+            )
+
+    write_json_atomic(
+        {"version": version, "files": new_files, "hashes": new_hashes}, MANIFEST_FILE
+    )
+    if has_changes:
+        write_json_atomic(changes, CHANGESET_FILE)
+        with CHANGESET_LOG.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(changes, ensure_ascii=False) + "\n")
+
+    print(
+        f"[INFO] Catalogue v{version}: {len(changes['added'])} added, "
+        f"{len(changes['updated'])} updated, {len(changes['removed'])} removed "
+        f"({len(parsed)} files parsed in {time.perf_counter() - started:.3f}s)"
+    )
+    print(
+        f"[INFO] Dedup: {dedup_report['clusters']} clusters merged, "
+        f"reduction {dedup_report['reduction_ratio']:.1%} of {dedup_report['records']} records"
+    )
+    return changes
+
+
+def load_changes_since(version: int) -> List[dict]:
+    """Change-sets newer than `version`, oldest first."""
+    if not CHANGESET_LOG.exists():
+        return []
+    changes = []
+    with CHANGESET_LOG.open("r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                entry = json.loads(line)
+                if entry.get("version", 0) > version:
+                    changes.append(entry)
+    return changes
+
+
 def main():
-    combined = build_combined_sources()
-    save_combined_sources(combined, OUTPUT_FILE)
+    parser = argparse.ArgumentParser(
+        description="Compile scraper/output/* into data/opportunities/sources.json."
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Ignoră manifestul și reconstruiește tot catalogul.",
+    )
+    args = parser.parse_args()
+    compile_sources(full=args.full)
 
 
 if __name__ == "__main__":
@@ -23,6 +23,10 @@ from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.pdfbase import pdfmetrics
 from pathlib import Path
 
+# run as a script by rag.documentation_rag: make the `rag` package importable
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from rag import tracing  # noqa: E402
+
 # ----------------------------
 # Register UTF-8 fonts
 # ----------------------------
@@ -91,6 +95,13 @@ def generate_presentation(
     json_file: str, pdf_file: str, logo_path: str = None, registry_json_path: str = None
 ):
     """Generates a company presentation PDF from JSON input."""
+    with tracing.span("pdf.generate", pdf=os.path.basename(str(pdf_file))) as span:
+        result = _build_presentation(json_file, pdf_file, logo_path, registry_json_path)
+        span.set(ok=bool(result))
+        return result
+
+
+def _build_presentation(json_file, pdf_file, logo_path, registry_json_path):
     try:
         # Load main JSON
         with open(json_file, "r", encoding="utf-8") as f:
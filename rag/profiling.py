@@ -0,0 +1,203 @@
+# rag/profiling.py
+"""
+--profile mode of rag.run_match_opp and scraper/run.py.
+
+One run under Profiler(name) writes outputs/profiles/<name>-<timestamp>/:
+
+  summary.json   wall / CPU time and tracemalloc peak per stage (the
+                 rag.tracing spans of the run), time waiting on the network
+                 (LLM calls, page and PDF fetches) vs. local compute, and the
+                 functions with the most cumulative time
+  profile.prof   cProfile of the main thread (pstats, snakeviz)
+  stacks.folded  collapsed stacks of every thread, sampled every few ms
+                 (flamegraph.pl, speedscope, inferno), waiting included
+  spans.jsonl    the spans themselves
+
+so two runs, before and after the catalogue grew, compare stage by stage.
+
+    python -m rag.run_match_opp --cif 33945221 --profile
+    python scraper/run.py --profile
+"""
+from __future__ import annotations
+
+import cProfile
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import tracing
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+PROFILES_DIR = BASE_DIR / "outputs" / "profiles"
+
+# stages whose time is spent waiting on a remote service
+NETWORK_SPANS = ("llm.call", "scrape.fetch")
+SAMPLE_INTERVAL_S = 0.005
+TOP_FUNCTIONS = 30
+
+
+class StackSampler(threading.Thread):
+    """Collapsed stacks of all threads, one sample every `interval` seconds."""
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL_S):
+        super().__init__(name="stack-sampler", daemon=True)
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._done = threading.Event()
+
+    def run(self):
+        own = threading.get_ident()
+        names = {}
+        while not self._done.wait(self.interval):
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+    def write(self, path: Path):
+        with path.open("w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _union_s(intervals: List[Tuple[float, float]]) -> float:
+    """Wall time covered by at least one of the (start, end) intervals."""
+    total, end = 0.0, float("-inf")
+    for start, stop in sorted(intervals):
+        if stop <= end:
+            continue
+        total += stop - max(start, end)
+        end = stop
+    return total
+
+
+def stage_report(spans: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    stages: Dict[str, Dict[str, Any]] = defaultdict(lambda: {
+        "count": 0, "wall_s": 0.0, "cpu_s": 0.0, "wait_s": 0.0, "mem_peak_kb": 0.0,
+    })
+    for s in spans:
+        stage = stages[s["name"]]
+        wall, cpu = s["duration_ms"] / 1000, s.get("cpu_ms", 0.0) / 1000
+        stage["count"] += 1
+        stage["wall_s"] += wall
+        stage["cpu_s"] += cpu
+        stage["wait_s"] += max(0.0, wall - cpu)
+        stage["mem_peak_kb"] = max(stage["mem_peak_kb"], s.get("mem_peak_kb") or 0.0)
+    rows = [
+        {"stage": name, **{k: round(v, 4) if isinstance(v, float) else v for k, v in stage.items()}}
+        for name, stage in stages.items()
+    ]
+    return sorted(rows, key=lambda r: r["wall_s"], reverse=True)
+
+
+def network_split(spans: List[Dict[str, Any]], wall_s: float, cpu_s: float) -> Dict[str, Any]:
+    network = [s for s in spans if s["name"] in NETWORK_SPANS]
+    in_flight_s = _union_s([(s["start"], s["start"] + s["duration_ms"] / 1000) for s in network])
+    return {
+        "network_calls": len(network),
+        # summed over calls, concurrent calls count separately
+        "network_wait_s": round(sum(max(0.0, s["duration_ms"] - s.get("cpu_ms", 0.0)) for s in network) / 1000, 3),
+        # wall time with at least one call in flight
+        "network_wall_s": round(in_flight_s, 3),
+        "compute_wall_s": round(max(0.0, wall_s - in_flight_s), 3),
+        "process_cpu_s": round(cpu_s, 3),
+    }
+
+
+def top_functions(profile: cProfile.Profile, limit: int = TOP_FUNCTIONS) -> List[Dict[str, Any]]:
+    stats = pstats.Stats(profile).stats
+    rows = []
+    for (filename, line, name), (_, ncalls, tottime, cumtime, _) in stats.items():
+        rows.append({
+            "function": f"{name} ({os.path.basename(filename)}:{line})" if line else name,
+            "calls": ncalls,
+            "self_s": round(tottime, 4),
+            "cumulative_s": round(cumtime, 4),
+        })
+    rows.sort(key=lambda r: r["cumulative_s"], reverse=True)
+    return rows[:limit]
+
+
+class Profiler:
+    """Context manager profiling the block; see the module docstring for the outputs."""
+
+    def __init__(self, name: str, output_dir: Optional[Path] = None, interval: float = SAMPLE_INTERVAL_S):
+        self.name = name
+        self.output_dir = Path(output_dir) if output_dir else PROFILES_DIR / f"{name}-{datetime.now():%Y%m%d-%H%M%S}"
+        self.interval = interval
+        self.summary: Dict[str, Any] = {}
+
+    def __enter__(self) -> "Profiler":
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self._exporting = tracing.exporting_to(self.output_dir / "spans.jsonl")
+        self._exporting.__enter__()
+        self._stop_tracemalloc = not tracemalloc.is_tracing()
+        tracemalloc.start()
+        # root span: its memory peak covers the whole run, nested spans included
+        self._root = tracing.span("profile", run=self.name)
+        self._root.__enter__()
+        self.sampler = StackSampler(self.interval)
+        self.sampler.start()
+        self.profile = cProfile.Profile()
+        self._wall0, self._cpu0 = time.perf_counter(), time.process_time()
+        self.profile.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.profile.disable()
+        wall_s, cpu_s = time.perf_counter() - self._wall0, time.process_time() - self._cpu0
+        self.sampler.stop()
+        self._root.__exit__(exc_type, exc, tb)
+        if self._stop_tracemalloc:
+            tracemalloc.stop()
+        self._exporting.__exit__(None, None, None)
+
+        spans = tracing.load_spans(self.output_dir / "spans.jsonl")
+        root = next(s for s in spans if s["span_id"] == self._root.span_id)
+        spans = [s for s in spans if s is not root]
+        self.profile.dump_stats(str(self.output_dir / "profile.prof"))
+        self.sampler.write(self.output_dir / "stacks.folded")
+        self.summary = {
+            "name": self.name,
+            "started_at": datetime.fromtimestamp(time.time() - wall_s).isoformat(timespec="seconds"),
+            "status": "error" if exc_type else "ok",
+            "wall_s": round(wall_s, 3),
+            "cpu_s": round(cpu_s, 3),
+            "mem_peak_mb": round(root.get("mem_peak_kb", 0.0) / 1024, 1),
+            **network_split(spans, wall_s, cpu_s),
+            "stages": stage_report(spans),
+            "top_functions": top_functions(self.profile),
+            "samples": self.sampler.samples,
+            "files": {
+                "cprofile": "profile.prof",
+                "flamegraph": "stacks.folded",
+                "spans": "spans.jsonl",
+            },
+        }
+        with (self.output_dir / "summary.json").open("w", encoding="utf-8") as f:
+            json.dump(self.summary, f, ensure_ascii=False, indent=2)
+        print(f"[profile] {self.name}: {self.summary['wall_s']} s wall, {self.summary['cpu_s']} s CPU, "
+              f"{self.summary['network_wall_s']} s waiting on the network → {self.output_dir}", file=sys.stderr)
+        return False
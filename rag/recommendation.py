@@ -2,11 +2,17 @@
 from __future__ import annotations
 
 import json
+import re
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Set
 from dotenv import load_dotenv
 
-from openai import OpenAI
+from . import tracing
+from .catalogue import load_open_opportunities, with_raw_text
+from .deadlines import DATE_FIELDS
+from .eligibility_rules import compile_rules
+from .firm_profile import firm_profile_for
+from .llm_gateway import get_gateway
 
 BASE_DIR = Path(__file__).resolve().parents[1]
 FIRMS_DIR = BASE_DIR / "data" / "firms"
@@ -14,7 +20,46 @@ OPP_DIR = BASE_DIR / "data" / "opportunities"
 
 load_dotenv()
 
-client = OpenAI()
+# all calls go through the shared gateway (rate limits, budgets, usage log)
+client = get_gateway()
+
+ELIGIBILITY_THRESHOLD = 0.5
+
+# "combined": one structured call returning score + eligibility + reasons
+# "two_call": llm_match_score (gpt-4.1-mini) then explain_match_llm (gpt-4.1-nano)
+MATCH_MODES = ("combined", "two_call")
+DEFAULT_MATCH_MODE = "combined"
+
+MATCH_MODEL = "gpt-4.1-mini"
+
+# Cascade: every candidate is screened cheaply ("llm" = SCREEN_MODEL,
+# "vector" = cosine similarity in the opportunity index); only pairs whose
+# screen score lies within CASCADE_BAND of the threshold are re-scored by
+# CONFIRM_MODEL. "off" scores everything with MATCH_MODEL.
+CASCADE_MODES = ("off", "llm", "vector")
+DEFAULT_CASCADE = "off"
+SCREEN_MODEL = "gpt-4.1-nano"
+CONFIRM_MODEL = MATCH_MODEL
+CASCADE_BAND = 0.15
+# cosine similarity treated as "borderline" by the vector screen, same cut-off
+# as OpportunityVectorStore.search
+VECTOR_ELIGIBLE_SIMILARITY = 0.40
+
+MATCH_RESULT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "score": {"type": "number"},
+        "eligible": {"type": "boolean"},
+        "reasons": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["score", "eligible", "reasons"],
+    "additionalProperties": False,
+}
+
+
+def prompt_json(data: Dict[str, Any]) -> str:
+    """Compact JSON for prompts: indentation costs tokens and adds nothing."""
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
 
 
 def load_firm_by_cif(cif: str) -> Dict[str, Any]:
@@ -26,26 +71,16 @@ def load_firm_by_cif(cif: str) -> Dict[str, Any]:
 
 
 def load_all_opportunities() -> Dict[str, Dict[str, Any]]:
-    by_id: Dict[str, Dict[str, Any]] = {}
-    for fname in ["sources.json"]:
-        path = OPP_DIR / fname
-        if not path.exists():
-            continue
-        with path.open("r", encoding="utf-8") as f:
-            items = json.load(f)
-        all_opps = []
-        for opp_type in ["grants", "accelerators", "vcs"]:
-            all_opps = all_opps + items.get(opp_type, [])
-        for op in all_opps:
-            op_id = op.get("id")
-            if op_id:
-                by_id[op_id] = op
-    return by_id
-
-
-def llm_match_score(firm: Dict[str, Any], opp: Dict[str, Any]) -> float:
+    """Open opportunity records by id (expired calls are never scored); raw_text is loaded per prompt."""
+    return {str(op["id"]): op for op in load_open_opportunities() if op.get("id") is not None}
+
+
+def llm_match_score(
+    firm: Dict[str, Any], opp: Dict[str, Any], model: str = MATCH_MODEL
+) -> float:
     """
     Returns an LLM-evaluated compatibility score (0-1).
+    `firm` is the compact profile from rag.firm_profile.
     """
     prompt = f"""
 You are an expert evaluator.
@@ -56,13 +91,13 @@ DO NOT give high scores for ineligible firms. If a firm is ineligible it should
 Respond ONLY with a JSON object: {{"score": float}}
 
 Startup:
-{json.dumps(firm, ensure_ascii=False, indent=2)}
+{prompt_json(firm)}
 
 Opportunity:
-{json.dumps(opp, ensure_ascii=False, indent=2)}
+{prompt_json(opp)}
 """
     resp = client.responses.create(
-        model="gpt-4.1-mini",
+        model=model,
         input=prompt,
         max_output_tokens=100,
     )
@@ -82,10 +117,10 @@ Explain why the following startup might match the funding opportunity.
 Respond with a bullet point list.
 
 Startup:
-{json.dumps(firm, indent=2, ensure_ascii=False)}
+{prompt_json(firm)}
 
 Opportunity:
-{json.dumps(opp, indent=2, ensure_ascii=False)}
+{prompt_json(opp)}
 
 Match score: {score}
 """
@@ -98,43 +133,278 @@ Match score: {score}
     return [line.strip("- ") for line in text.split("\n") if line.strip()]
 
 
-def recommend_opportunities_for_firm(
+def validate_match_result(data: Any) -> Dict[str, Any]:
+    """
+    Check a combined-mode payload against MATCH_RESULT_SCHEMA locally.
+
+    Raises ValueError when the score is missing or not a number; other
+    fields are repaired (reasons coerced to a list of strings, eligibility
+    derived from the score when absent). The score is clamped to [0, 1] and
+    is authoritative for eligibility, like in the two-call path.
+    """
+    if not isinstance(data, dict):
+        raise ValueError(f"expected a JSON object, got {type(data).__name__}")
+
+    score = data.get("score")
+    if isinstance(score, bool) or not isinstance(score, (int, float, str)):
+        raise ValueError("missing numeric 'score'")
+    try:
+        score = min(1.0, max(0.0, float(score)))
+    except ValueError:
+        raise ValueError(f"invalid score {score!r}")
+
+    reasons = data.get("reasons") or []
+    if isinstance(reasons, str):
+        reasons = [line.strip("- ").strip() for line in reasons.split("\n")]
+    reasons = [str(r).strip() for r in reasons if str(r).strip()]
+
+    return {
+        "score": score,
+        "eligible": score >= ELIGIBILITY_THRESHOLD,
+        "reasons": reasons,
+    }
+
+
+def parse_match_output(text: str) -> Dict[str, Any]:
+    """Parse + validate model output, repairing text around the JSON object."""
+    try:
+        return validate_match_result(json.loads(text))
+    except (TypeError, json.JSONDecodeError):
+        pass
+    # repair: code fences / prose around the object
+    match = re.search(r"\{.*\}", text or "", flags=re.DOTALL)
+    if not match:
+        raise ValueError("no JSON object in model output")
+    return validate_match_result(json.loads(match.group(0), strict=False))
+
+
+def combined_match_request(
+    firm: Dict[str, Any], opp: Dict[str, Any], model: str = MATCH_MODEL
+) -> Dict[str, Any]:
+    """
+    Body of the combined score + reasons request for client.responses.create;
+    also used as the "body" of a Batch API line (rag.run_batch_match).
+    """
+    prompt = f"""
+You are an expert evaluator.
+Assign a semantic match score between a startup and a funding opportunity and explain it.
+Score range: 0.0 = unrelated, 1.0 = perfect match.
+Keep in mind that this score is used for deciding if the firm is eligible.
+DO NOT give high scores for ineligible firms. If a firm is ineligible it should have a score lower than 0.5, and higher otherwise.
+"eligible" must be true exactly when score >= 0.5.
+"reasons" is a short list (3-6 items) of concrete reasons why the startup matches or does not match the opportunity.
+
+Startup:
+{prompt_json(firm)}
+
+Opportunity:
+{prompt_json(opp)}
+"""
+    return {
+        "model": model,
+        "input": prompt,
+        "max_output_tokens": 400,
+        "text": {
+            "format": {
+                "type": "json_schema",
+                "name": "match_result",
+                "schema": MATCH_RESULT_SCHEMA,
+                "strict": True,
+            }
+        },
+    }
+
+
+def llm_match_score_and_reasons(
+    firm: Dict[str, Any], opp: Dict[str, Any], model: str = MATCH_MODEL
+) -> Dict[str, Any]:
+    """
+    Score and explain a (firm, opportunity) pair in one structured call.
+
+    `firm` is the compact profile from rag.firm_profile. Returns
+    {"score": float, "eligible": bool, "reasons": [str]}. If the
+    output cannot be validated even after repair, falls back to the
+    two-call path.
+    """
+    resp = client.responses.create(**combined_match_request(firm, opp, model))
+    try:
+        return parse_match_output(resp.output_text)
+    except ValueError as e:
+        print(f"[match] invalid combined output for {opp.get('id')} ({e}), falling back to two calls")
+        return llm_match_two_calls(firm, opp, model)
+
+
+def llm_match_two_calls(
+    firm: Dict[str, Any], opp: Dict[str, Any], model: str = MATCH_MODEL
+) -> Dict[str, Any]:
+    score = llm_match_score(firm, opp, model)
+    reasons = explain_match_llm(firm, opp, score)
+    return {"score": score, "eligible": score >= ELIGIBILITY_THRESHOLD, "reasons": reasons}
+
+
+class VectorScreen:
+    """Cheap screen from the embedding index: one embedding call per firm."""
+
+    def __init__(self, firm: Dict[str, Any]):
+        import numpy as np
+
+        from .vector_store import OpportunityVectorStore
+
+        store = OpportunityVectorStore()
+        query = np.asarray(store.embedder.embed_text(prompt_json(firm)[:8000]), dtype="float32")
+        sims = store.unit_embeddings @ (query / (np.linalg.norm(query) + 1e-10))
+        self.similarity = {str(m["id"]): float(sims[i]) for i, m in enumerate(store.metadata)}
+
+    def __call__(self, firm: Dict[str, Any], opp: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        sim = self.similarity.get(str(opp.get("id")))
+        if sim is None:
+            return None  # not indexed yet -> always escalate
+        # shift so the store's eligibility cut-off maps onto the LLM threshold
+        score = min(1.0, max(0.0, sim - VECTOR_ELIGIBLE_SIMILARITY + ELIGIBILITY_THRESHOLD))
+        return {
+            "score": score,
+            "eligible": score >= ELIGIBILITY_THRESHOLD,
+            "reasons": [f"Similaritate semantică firmă-oportunitate: {sim:.2f}"],
+        }
+
+
+def build_match_entry(
+    opp: Dict[str, Any],
+    score: float,
+    reasons: List[str],
+    rule_result: Dict[str, Any],
+    tier: str = "llm",
+    screen_score: Optional[float] = None,
+) -> Dict[str, Any]:
+    return {
+        "id": opp.get("id"),
+        "type": opp.get("type"),
+        "title": opp.get("title") or opp.get("name"),
+        "semantic_score": score,
+        "eligibility": score >= ELIGIBILITY_THRESHOLD and rule_result["verdict"] != "fail",
+        "region": opp.get("region", []),
+        "eligible_caen_codes": opp.get("eligible_caen_codes", []),
+        "deadlines": opp.get("deadlines", []),
+        # normalised at catalogue build (rag.deadlines), no parsing when listed
+        **{field: opp[field] for field in DATE_FIELDS if field in opp},
+        "eligibility_criteria": opp.get("eligibility_criteria", []),
+        "number_of_docs": len(opp.get("required_documents", [])),
+        "source_url": opp.get("source_url"),
+        "funding": opp.get("funding_max", "unspecified"),
+        "match_reasons": reasons,
+        "rule_verdict": rule_result["verdict"],
+        "failed_rules": rule_result["failed_rules"],
+        "passed_rules": rule_result["passed_rules"],
+        "unknown_rules": rule_result["unknown_rules"],
+        # which stage decided: "rules", "llm" (no cascade), "screen", "confirm"
+        "match_tier": tier,
+        "screen_score": screen_score,
+    }
+
+
+def match_metrics(entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Counts per deciding tier and the cascade escalation rate."""
+    tiers: Dict[str, int] = {}
+    for e in entries:
+        tier = e.get("match_tier", "llm")
+        tiers[tier] = tiers.get(tier, 0) + 1
+    screened = tiers.get("screen", 0) + tiers.get("confirm", 0)
+    return {
+        "pairs": len(entries),
+        "tiers": tiers,
+        "llm_pairs": len(entries) - tiers.get("rules", 0),
+        "escalation_rate": tiers.get("confirm", 0) / screened if screened else None,
+    }
+
+
+def score_opportunities_for_firm(
     cif: str,
-    top_k: int = 5,
     opp_type: Optional[str] = None,
+    match_mode: str = DEFAULT_MATCH_MODE,
+    cascade: str = DEFAULT_CASCADE,
+    screen_model: str = SCREEN_MODEL,
+    confirm_model: str = CONFIRM_MODEL,
+    band: float = CASCADE_BAND,
+    only_ids: Optional[Set[str]] = None,
 ) -> List[Dict[str, Any]]:
-    firm = load_firm_by_cif(cif)
-    all_opps = load_all_opportunities()
+    """
+    Score every opportunity for a firm (or only `only_ids`), unsorted and
+    untruncated.
+    """
+    if match_mode not in MATCH_MODES:
+        raise ValueError(f"match_mode must be one of {MATCH_MODES}, got {match_mode!r}")
+    if cascade not in CASCADE_MODES:
+        raise ValueError(f"cascade must be one of {CASCADE_MODES}, got {cascade!r}")
+    score_pair = llm_match_score_and_reasons if match_mode == "combined" else llm_match_two_calls
 
-    # Optionally filter by type
-    if opp_type:
-        opportunities = [op for op in all_opps.values() if op.get("type") == opp_type]
-    else:
-        opportunities = list(all_opps.values())
+    with tracing.span("recommend.load", cif=cif) as span:
+        firm = load_firm_by_cif(cif)
+        all_opps = load_all_opportunities()
+
+        # Optionally filter by type
+        if opp_type:
+            opportunities = [op for op in all_opps.values() if op.get("type") == opp_type]
+        else:
+            opportunities = list(all_opps.values())
+        if only_ids is not None:
+            opportunities = [op for op in opportunities if str(op.get("id")) in only_ids]
+        span.set(opportunities=len(opportunities))
+
+    with tracing.span("recommend.rules", cif=cif, opportunities=len(opportunities)):
+        # hard constraints (deadline, CAEN, region, size...) checked locally for
+        # all opportunities at once; failing pairs never reach the LLM
+        verdicts = compile_rules(opportunities).verdicts(firm)
+        # prompts only see the distilled profile, not the raw openapi.ro payload
+        profile = firm_profile_for(firm)
+    no_rules = {"verdict": "unknown", "failed_rules": [], "passed_rules": [], "unknown_rules": []}
+
+    screen = None
+    if cascade == "llm":
+        screen = lambda f, o: llm_match_score_and_reasons(f, o, screen_model)  # noqa: E731
+    elif cascade == "vector":
+        screen = VectorScreen(profile)
 
     scored: List[Dict[str, Any]] = []
 
     for opp in opportunities:
-        score = llm_match_score(firm, opp)
-        reasons = explain_match_llm(firm, opp, score)
-        scored.append(
-            {
-                "id": opp.get("id"),
-                "type": opp.get("type"),
-                "title": opp.get("title") or opp.get("name"),
-                "semantic_score": score,
-                "eligibility": score >= 0.5,
-                "region": opp.get("region", []),
-                "eligible_caen_codes": opp.get("eligible_caen_codes", []),
-                "deadlines": opp.get("deadlines", []),
-                "eligibility_criteria": opp.get("eligibility_criteria", []),
-                "number_of_docs": len(opp.get("required_documents", [])),
-                "source_url": opp.get("source_url"),
-                "funding": opp.get("funding_max", "unspecified"),
-                "match_reasons": reasons,
-            }
-        )
+        rule_result = verdicts.get(str(opp.get("id")), no_rules)
+        if rule_result["verdict"] == "fail":
+            scored.append(build_match_entry(opp, 0.0, rule_result["failed_rules"], rule_result, "rules"))
+            continue
+
+        with tracing.span("recommend.pair", cif=cif, opportunity_id=str(opp.get("id"))) as span:
+            opp_full = with_raw_text(opp)
+            if screen is None:
+                result = score_pair(profile, opp_full, MATCH_MODEL)
+                entry = build_match_entry(opp, result["score"], result["reasons"], rule_result, "llm")
+            else:
+                screened = screen(profile, opp_full)
+                if screened is not None and abs(screened["score"] - ELIGIBILITY_THRESHOLD) > band:
+                    entry = build_match_entry(
+                        opp, screened["score"], screened["reasons"], rule_result, "screen", screened["score"]
+                    )
+                else:
+                    result = score_pair(profile, opp_full, confirm_model)
+                    entry = build_match_entry(
+                        opp, result["score"], result["reasons"], rule_result, "confirm",
+                        screened["score"] if screened else None,
+                    )
+            span.set(tier=entry["match_tier"], score=entry["semantic_score"])
+        scored.append(entry)
+
+    metrics = match_metrics(scored)
+    print(f"[match] tiers {metrics['tiers']}, escalation rate {metrics['escalation_rate']}")
+    return scored
 
+
+def recommend_opportunities_for_firm(
+    cif: str,
+    top_k: int = 5,
+    opp_type: Optional[str] = None,
+    match_mode: str = DEFAULT_MATCH_MODE,
+    cascade: str = DEFAULT_CASCADE,
+) -> List[Dict[str, Any]]:
+    scored = score_opportunities_for_firm(cif, opp_type, match_mode, cascade)
     scored.sort(key=lambda x: x["semantic_score"], reverse=True)
     return scored[:top_k]
 
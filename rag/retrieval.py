@@ -1,9 +1,68 @@
-from typing import List, Dict, Any, Optional
-from .vector_store import OpportunityVectorStore
+from typing import List, Dict, Any, Optional, Tuple
+
+from .lexical_index import LEXICAL_INDEX_PATH, LexicalIndex
+
+# "hybrid" = reciprocal-rank fusion of vector and BM25 results,
+# "vector" = embeddings only, "lexical" = BM25 only (no network calls);
+# hybrid falls back to vector while indices/ has no BM25 index yet
+RETRIEVAL_MODES = ("hybrid", "vector", "lexical")
+DEFAULT_RETRIEVAL_MODE = "hybrid"
+
+# k in 1 / (k + rank), the usual RRF constant
+RRF_K = 60
+# each ranker contributes this many candidates per requested result
+RRF_CANDIDATES_PER_RESULT = 4
+RRF_MIN_CANDIDATES = 20
+
+
+def reciprocal_rank_fusion(rankings: List[Tuple[str, List[Dict[str, Any]]]], k: int = RRF_K) -> List[Dict[str, Any]]:
+    """
+    Fuse named ranked lists [(name, results), ...] by id: "score" becomes
+    the fused score, each ranker's score and rank are kept as
+    "<name>_score" / "<name>_rank".
+    """
+    fused: Dict[Any, Dict[str, Any]] = {}
+    for name, ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            entry = fused.setdefault(item["id"], {**item, "score": 0.0})
+            entry["score"] += 1.0 / (k + rank)
+            entry[f"{name}_score"] = item["score"]
+            entry[f"{name}_rank"] = rank
+            if "eligible" in item:
+                entry["eligible"] = item["eligible"]
+    return sorted(fused.values(), key=lambda x: x["score"], reverse=True)
+
 
 class RAGRetriever:
-    def __init__(self):
-        self.store = OpportunityVectorStore()
+    def __init__(self, mode: str = DEFAULT_RETRIEVAL_MODE):
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"mode must be one of {RETRIEVAL_MODES}, got {mode!r}")
+        self.mode = mode
+        self._store = None
+        self._lexical = None
+        if mode == "hybrid" and not self._has_lexical():
+            print(
+                f"[WARN] Lexical index not found at {LEXICAL_INDEX_PATH}, using vector retrieval. "
+                "Rebuild the index (python -m rag.index_builder) for hybrid retrieval."
+            )
+
+    def _has_lexical(self) -> bool:
+        return self._lexical is not None or LEXICAL_INDEX_PATH.exists()
+
+    @property
+    def store(self):
+        # imported lazily: lexical mode must work without an embeddings client
+        if self._store is None:
+            from .vector_store import OpportunityVectorStore
+
+            self._store = OpportunityVectorStore()
+        return self._store
+
+    @property
+    def lexical(self) -> LexicalIndex:
+        if self._lexical is None:
+            self._lexical = LexicalIndex()
+        return self._lexical
 
     def retrieve_opportunities_for_query(
         self,
@@ -12,13 +71,28 @@ class RAGRetriever:
         caen_code: Optional[str] = None,
         opp_type: Optional[str] = None,
         top_k: int = 5,
+        mode: Optional[str] = None,
     ) -> List[Dict[str, Any]]:
-        return self.store.search(
-            query=query,
-            top_k=top_k,
-            filter_type=opp_type,
-            filter_caen=caen_code,
-        )
+        mode = mode or self.mode
+        if mode == "hybrid" and not self._has_lexical():
+            mode = "vector"
+        if mode == "vector":
+            return self.store.search(
+                query=query,
+                top_k=top_k,
+                filter_type=opp_type,
+                filter_caen=caen_code,
+            )
+        if mode == "lexical":
+            return self.lexical.search(query, top_k, filter_type=opp_type, filter_caen=caen_code)
+
+        candidates = max(top_k * RRF_CANDIDATES_PER_RESULT, RRF_MIN_CANDIDATES)
+        fused = reciprocal_rank_fusion([
+            ("vector", self.store.search(query, candidates, filter_type=opp_type, filter_caen=caen_code)),
+            ("lexical", self.lexical.search(query, candidates, filter_type=opp_type, filter_caen=caen_code)),
+        ])
+        return fused[:top_k]
+
 
 if __name__ == "__main__":
     r = RAGRetriever()
@@ -0,0 +1,382 @@
+# rag/reverse_match.py
+"""
+Reverse matching: which client firms does a (new) opportunity fit?
+
+    python -m rag.reverse_match --build-index     # (re)embed new/changed firms
+    python -m rag.reverse_match --id <opp_id>     # one opportunity
+    python -m rag.reverse_match --new             # "added" of the last change-set
+
+Firms are kept as an embedding matrix (indices/firms_index.npy, one row per
+compact firm profile) plus attribute columns (CAEN, employees, turnover,
+age, regions). For a set of opportunities the eligibility rules are
+evaluated over all firms at once and the rule-passing firms are ranked by
+one matrix product against the opportunity embeddings; only the top of
+that shortlist is confirmed with the LLM.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .catalogue import get_opportunity, with_raw_text
+from .deadlines import closes_on
+from .eligibility_rules import (
+    BOUND_RULES,
+    FAIL,
+    PASS,
+    UNKNOWN,
+    bound_verdicts,
+    firm_attributes,
+    opportunity_constraints,
+)
+from .embeddings import load_index_embedder
+from .firm_profile import FIRMS_DIR, firm_profile_for, firm_version
+from .index_builder import INDEX_EMBEDDINGS_PATH, INDEX_METADATA_PATH, build_canonical_text_for_embedding
+from .llm_gateway import BATCH, in_current_context, llm_job
+from .parse_input import CHANGESET_FILE, write_json_atomic
+from .recommendation import ELIGIBILITY_THRESHOLD, llm_match_score_and_reasons, prompt_json
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+INDICES_DIR = BASE_DIR / "indices"
+FIRMS_INDEX_PATH = INDICES_DIR / "firms_index.npy"
+FIRMS_METADATA_PATH = INDICES_DIR / "firms_metadata.json"
+REVERSE_OUTPUT_DIR = BASE_DIR / "outputs" / "reverse"
+
+SHORTLIST_SIZE = 50
+# below this cosine similarity a firm is not worth an LLM call
+MIN_SIMILARITY = 0.25
+CONFIRM_WORKERS = 8
+EMBED_BATCH = 256
+
+
+def _load_firm(path: Path) -> Dict[str, Any]:
+    with path.open("r", encoding="utf-8") as f:
+        firm = json.load(f)
+    firm.setdefault("cui", path.stem)
+    return firm
+
+
+def firm_metadata(cui: str, firm: Dict[str, Any], today: date) -> Dict[str, Any]:
+    """Attribute columns of one firm, as stored in firms_metadata.json."""
+    attrs = firm_attributes(firm, today)
+    return {
+        "cui": cui,
+        "denumire": firm.get("denumire"),
+        "firm_version": firm_version(firm),
+        "caen": attrs["caen"],
+        "employees": attrs["employees"],
+        "turnover": attrs["turnover"],
+        "age_years": attrs["age_years"],
+        "regions": sorted(attrs["regions"]),
+    }
+
+
+def build_firm_index() -> Dict[str, int]:
+    """
+    Embed the profile of every firm in data/firms/ with the backend of the
+    opportunity index, re-using rows of firms whose version did not change
+    (all rows are redone when the backend changed). Stores the attribute
+    columns next to the embeddings.
+    """
+    embedder = load_index_embedder()
+    old_rows: Dict[str, int] = {}
+    old_meta: List[Dict[str, Any]] = []
+    old_embeddings = None
+    if FIRMS_INDEX_PATH.exists() and FIRMS_METADATA_PATH.exists():
+        with FIRMS_METADATA_PATH.open("r", encoding="utf-8") as f:
+            old = json.load(f)
+        if old.get("embedding", {"embedding_backend": "openai"}) == embedder.info():
+            old_embeddings = np.load(FIRMS_INDEX_PATH)
+            old_meta = old["firms"]
+            old_rows = {m["cui"]: i for i, m in enumerate(old_meta)}
+
+    today = date.today()
+    metadata: List[Dict[str, Any]] = []
+    rows: List[Optional[np.ndarray]] = []
+    to_embed: List[int] = []
+    texts: List[str] = []
+    for path in sorted(FIRMS_DIR.glob("*.json")):
+        firm = _load_firm(path)
+        metadata.append(firm_metadata(path.stem, firm, today))
+        i = old_rows.get(path.stem)
+        if i is not None and old_meta[i]["firm_version"] == metadata[-1]["firm_version"]:
+            rows.append(old_embeddings[i])
+        else:
+            rows.append(None)
+            to_embed.append(len(rows) - 1)
+            texts.append(prompt_json(firm_profile_for(firm)))
+
+    for start in range(0, len(texts), EMBED_BATCH):
+        vectors = embedder.embed_texts(texts[start:start + EMBED_BATCH])
+        for j, vec in enumerate(vectors):
+            rows[to_embed[start + j]] = np.asarray(vec, dtype="float32")
+
+    INDICES_DIR.mkdir(parents=True, exist_ok=True)
+    embeddings = np.vstack(rows).astype("float32") if rows else np.zeros((0, 0), dtype="float32")
+    np.save(FIRMS_INDEX_PATH, embeddings)
+    write_json_atomic(
+        {"built_on": today.isoformat(), "embedding": embedder.info(), "firms": metadata}, FIRMS_METADATA_PATH
+    )
+
+    stats = {"firms": len(metadata), "embedded": len(to_embed), "reused": len(metadata) - len(to_embed)}
+    print(f"[reverse] firm index: {stats}")
+    return stats
+
+
+class FirmMatrix:
+    """Normalised firm embeddings plus attribute columns, one row per firm."""
+
+    def __init__(self):
+        if not FIRMS_INDEX_PATH.exists() or not FIRMS_METADATA_PATH.exists():
+            raise RuntimeError("Firm index not found. Run `python -m rag.reverse_match --build-index` first.")
+        embeddings = np.load(FIRMS_INDEX_PATH).astype("float32")
+        with FIRMS_METADATA_PATH.open("r", encoding="utf-8") as f:
+            data = json.load(f)
+        # firm rows are only comparable with opportunity rows of the same backend
+        stored = data.get("embedding", {"embedding_backend": "openai"})
+        current = load_index_embedder().info()
+        if stored != current:
+            raise RuntimeError(
+                f"Firm index was embedded with {stored}, the opportunity index with {current}. "
+                "Run `python -m rag.reverse_match --build-index` first."
+            )
+        self._set(embeddings, data["firms"], date.fromisoformat(data["built_on"]))
+
+    @classmethod
+    def from_arrays(
+        cls, embeddings: np.ndarray, metadata: List[Dict[str, Any]], built_on: Optional[date] = None
+    ) -> "FirmMatrix":
+        """Matrix over in-memory rows (benchmarks, tests) instead of indices/."""
+        matrix = cls.__new__(cls)
+        matrix._set(np.asarray(embeddings, dtype="float32"), metadata, built_on or date.today())
+        return matrix
+
+    def _set(self, embeddings: np.ndarray, metadata: List[Dict[str, Any]], built_on: date):
+        self.metadata = metadata
+        if embeddings.shape[0] != len(self.metadata):
+            raise RuntimeError("Firm embeddings and metadata size mismatch")
+        self.embeddings = embeddings / (np.linalg.norm(embeddings, axis=1, keepdims=True) + 1e-10)
+
+        # ages were computed on built_on, shift them to today
+        drift = (date.today() - built_on).days / 365.25
+        self.cui = [m["cui"] for m in self.metadata]
+        self.caen = np.array([m["caen"] or "" for m in self.metadata], dtype=object)
+        # class prefixes, matched against the division / group / class codes a call lists
+        self.caen_prefix = {n: np.array([c[:n] for c in self.caen], dtype=object) for n in (2, 3, 4)}
+        self.attributes = {
+            "employees": np.array([np.nan if m["employees"] is None else m["employees"] for m in self.metadata]),
+            "turnover": np.array([np.nan if m["turnover"] is None else m["turnover"] for m in self.metadata]),
+            "age_years": np.array(
+                [np.nan if m["age_years"] is None else m["age_years"] + drift for m in self.metadata]
+            ),
+        }
+        self.has_region = np.array([bool(m["regions"]) for m in self.metadata], dtype=bool)
+        self.region_members: Dict[str, List[int]] = {}
+        for i, m in enumerate(self.metadata):
+            for region in m["regions"]:
+                self.region_members.setdefault(region, []).append(i)
+
+    def __len__(self) -> int:
+        return len(self.metadata)
+
+    def rule_filter(self, opp: Dict[str, Any], today: Optional[date] = None) -> np.ndarray:
+        """
+        Boolean mask of firms not failing any hard constraint of `opp`: the
+        constraints parsed by eligibility_rules.opportunity_constraints and
+        judged by its bound_verdicts, column-wise over firms.
+        """
+        today = today or date.today()
+        n = len(self)
+        closes = closes_on(opp)
+        if closes is not None and closes < today:
+            return np.zeros(n, dtype=bool)
+
+        constraints = opportunity_constraints(opp)
+        verdicts = []
+
+        codes = constraints["caen_codes"]
+        if codes:
+            caen = np.where(self.caen == "", UNKNOWN, FAIL).astype("int8")
+            for length in {len(code) for code in codes}:
+                caen[np.isin(self.caen_prefix[length], [c for c in codes if len(c) == length])] = PASS
+            verdicts.append(caen)
+
+        if constraints["regions"]:
+            region = np.where(self.has_region, FAIL, UNKNOWN).astype("int8")
+            for r in constraints["regions"]:
+                idx = self.region_members.get(r)
+                if idx:
+                    region[idx] = PASS
+            verdicts.append(region)
+
+        for rule, attr, _, is_min in BOUND_RULES:
+            verdicts.append(bound_verdicts(
+                self.attributes[attr], np.nan if constraints["bounds"][rule] is None else constraints["bounds"][rule],
+                is_min, rule not in constraints["unchecked"],
+            ))
+
+        return ~(np.vstack(verdicts) == FAIL).any(axis=0)
+
+
+def opportunity_vectors(opportunities: List[Dict[str, Any]]) -> np.ndarray:
+    """Rows from the opportunity index when present, embedded otherwise."""
+    known: Dict[str, np.ndarray] = {}
+    if INDEX_EMBEDDINGS_PATH.exists() and INDEX_METADATA_PATH.exists():
+        embeddings = np.load(INDEX_EMBEDDINGS_PATH, mmap_mode="r")
+        with INDEX_METADATA_PATH.open("r", encoding="utf-8") as f:
+            for i, m in enumerate(json.load(f)):
+                known[str(m["id"])] = i
+    missing = [op for op in opportunities if str(op["id"]) not in known]
+    embedded = (
+        load_index_embedder().embed_texts([build_canonical_text_for_embedding(op) for op in missing])
+        if missing else []
+    )
+    fresh = {str(op["id"]): np.asarray(v, dtype="float32") for op, v in zip(missing, embedded)}
+
+    rows = [
+        np.asarray(embeddings[known[str(op["id"])]], dtype="float32") if str(op["id"]) in known
+        else fresh[str(op["id"])]
+        for op in opportunities
+    ]
+    matrix = np.vstack(rows)
+    return matrix / (np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-10)
+
+
+def shortlist_firms(
+    opportunities: List[Dict[str, Any]],
+    firms: Optional[FirmMatrix] = None,
+    shortlist_size: int = SHORTLIST_SIZE,
+    min_similarity: float = MIN_SIMILARITY,
+    vectors: Optional[np.ndarray] = None,
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    {opp_id: [{"cui", "denumire", "similarity"}, ...]} best first, without
+    any LLM call: rule mask per opportunity, one (firms x opportunities)
+    similarity product, top `shortlist_size` by argpartition. `vectors` are
+    unit rows of `opportunities`, opportunity_vectors() by default.
+    """
+    firms = firms or FirmMatrix()
+    if not opportunities or not len(firms):
+        return {str(op["id"]): [] for op in opportunities}
+
+    vectors = opportunity_vectors(opportunities) if vectors is None else vectors
+    if vectors.shape[1] != firms.embeddings.shape[1]:
+        raise RuntimeError(
+            f"Opportunity vectors have {vectors.shape[1]} dimensions, the firm index {firms.embeddings.shape[1]}. "
+            "Run `python -m rag.reverse_match --build-index` first."
+        )
+    sims = firms.embeddings @ vectors.T  # (n_firms, n_opps)
+    out: Dict[str, List[Dict[str, Any]]] = {}
+    for j, opp in enumerate(opportunities):
+        column = np.where(firms.rule_filter(opp), sims[:, j], -np.inf)
+        candidates = np.flatnonzero(column >= min_similarity)
+        if len(candidates) > shortlist_size:
+            part = np.argpartition(-column[candidates], shortlist_size - 1)[:shortlist_size]
+            candidates = candidates[part]
+        candidates = candidates[np.argsort(-column[candidates])]
+        out[str(opp["id"])] = [
+            {
+                "cui": firms.cui[i],
+                "denumire": firms.metadata[i].get("denumire"),
+                "similarity": float(column[i]),
+            }
+            for i in candidates
+        ]
+    return out
+
+
+def confirm_shortlist(opp: Dict[str, Any], shortlist: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """LLM confirmation of the shortlisted firms for one opportunity."""
+    opp_full = with_raw_text(opp)
+
+    def confirm(candidate: Dict[str, Any]) -> Dict[str, Any]:
+        firm = _load_firm(FIRMS_DIR / f"{candidate['cui']}.json")
+        result = llm_match_score_and_reasons(firm_profile_for(firm), opp_full)
+        return {
+            **candidate,
+            "semantic_score": result["score"],
+            "eligibility": result["score"] >= ELIGIBILITY_THRESHOLD,
+            "match_reasons": result["reasons"],
+        }
+
+    with ThreadPoolExecutor(max_workers=CONFIRM_WORKERS) as pool:
+        confirmed = list(pool.map(in_current_context(confirm), shortlist))
+    confirmed.sort(key=lambda x: x["semantic_score"], reverse=True)
+    return confirmed
+
+
+def match_opportunities_to_firms(
+    opportunity_ids: List[str],
+    shortlist_size: int = SHORTLIST_SIZE,
+    min_similarity: float = MIN_SIMILARITY,
+    confirm: bool = True,
+) -> Dict[str, Dict[str, Any]]:
+    opportunities = []
+    for op_id in opportunity_ids:
+        op = get_opportunity(op_id)
+        if op is None:
+            print(f"[reverse] opportunity {op_id} not in the catalogue, skipping")
+            continue
+        opportunities.append(op)
+
+    started = time.perf_counter()
+    firms = FirmMatrix()
+    shortlists = shortlist_firms(opportunities, firms, shortlist_size, min_similarity)
+    shortlist_s = time.perf_counter() - started
+    print(f"[reverse] shortlisted {len(firms)} firms x {len(opportunities)} opportunities in {shortlist_s:.3f}s")
+
+    results = {}
+    for opp in opportunities:
+        op_id = str(opp["id"])
+        firms_out = confirm_shortlist(opp, shortlists[op_id]) if confirm else shortlists[op_id]
+        result = {
+            "id": op_id,
+            "title": opp.get("title") or opp.get("name"),
+            "firms_total": len(firms),
+            "shortlisted": len(shortlists[op_id]),
+            "shortlist_s": round(shortlist_s, 4),
+            "firms": firms_out,
+        }
+        write_json_atomic(result, REVERSE_OUTPUT_DIR / f"{op_id}.json")
+        results[op_id] = result
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Firmele potrivite pentru oportunități noi.")
+    parser.add_argument("--build-index", action="store_true", help="Actualizează indexul de firme.")
+    parser.add_argument("--id", action="append", default=[], help="Id-ul oportunității (se poate repeta).")
+    parser.add_argument("--new", action="store_true", help="Oportunitățile adăugate în ultimul change-set.")
+    parser.add_argument("--shortlist", type=int, default=SHORTLIST_SIZE, help="Firme confirmate cu LLM per oportunitate.")
+    parser.add_argument("--min-similarity", type=float, default=MIN_SIMILARITY)
+    parser.add_argument("--no-llm", action="store_true", help="Doar shortlist-ul, fără confirmare LLM.")
+    args = parser.parse_args()
+
+    if args.build_index:
+        build_firm_index()
+
+    ids = list(args.id)
+    if args.new and CHANGESET_FILE.exists():
+        with CHANGESET_FILE.open("r", encoding="utf-8") as f:
+            ids.extend(json.load(f).get("added", []))
+    if not ids:
+        return
+
+    with llm_job(f"reverse-{date.today().isoformat()}", priority=BATCH):
+        results = match_opportunities_to_firms(ids, args.shortlist, args.min_similarity, confirm=not args.no_llm)
+    for op_id, result in results.items():
+        print(f"{op_id}: {result['shortlisted']}/{result['firms_total']} firms shortlisted")
+        for firm in result["firms"][:10]:
+            score = firm.get("semantic_score", firm["similarity"])
+            print(f"  {score:.3f} | {firm['cui']} | {firm.get('denumire')}")
+
+
+if __name__ == "__main__":
+    main()
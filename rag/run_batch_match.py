@@ -0,0 +1,502 @@
+# rag/run_batch_match.py
+"""
+Offline batch matching: score every firm in data/firms/ against the current
+catalogue through a batch-submission backend and write
+outputs/<cif>/match_opportunities.json for each of them, so /grants only
+reads precomputed results.
+
+    python -m rag.run_batch_match                     # local stand-in backend
+    python -m rag.run_batch_match --backend openai    # OpenAI Batch API
+    python -m rag.run_batch_match --resume            # continue the last unfinished job
+
+Each job lives in outputs/batch/<job_id>/: one Batch API input file per firm
+(<cif>.input.jsonl, lines {"custom_id", "method", "url", "body"}), the
+results and state.json, which is checkpointed after every submission and
+every finished firm. Only pairs affected since the firm's stored results
+(rag.match_state) are submitted, pairs failing the local eligibility rules
+never are; invalid or missing results are re-scored online.
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from . import match_store, recommendation
+from .catalogue import catalogue_version, load_open_opportunities, with_raw_text
+from .eligibility_rules import compile_rules
+from .firm_profile import FIRMS_DIR, firm_profile_for
+from .llm_gateway import BATCH, BudgetExceeded, in_current_context, llm_job
+from .match_state import is_expired, load_state, opportunity_hashes, plan_rematch, save_state
+from .parse_input import write_json_atomic
+from .run_match_opp import OUTPUT_DIR, save_match_outputs
+
+BATCH_DIR = OUTPUT_DIR / "batch"
+BATCH_ENDPOINT = "/v1/responses"
+COMPLETION_WINDOW = "24h"
+POLL_INTERVAL_S = 60
+LOCAL_MAX_WORKERS = 8
+
+# USD per 1M (input, output) tokens, synchronous API; the Batch API bills half
+MODEL_PRICES = {
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1-nano": (0.10, 0.40),
+}
+BATCH_PRICE_FACTOR = 0.5
+
+TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+def response_text(body: Dict[str, Any]) -> str:
+    """output_text of a Responses API body (SDK objects expose it, raw JSON does not)."""
+    if body.get("output_text"):
+        return body["output_text"]
+    parts = []
+    for item in body.get("output") or []:
+        for content in item.get("content") or []:
+            if content.get("type") == "output_text":
+                parts.append(content.get("text") or "")
+    return "".join(parts)
+
+
+def _read_results(path: Path) -> Dict[str, Optional[Dict[str, Any]]]:
+    """custom_id -> response body (None for failed requests) from a Batch output file."""
+    results: Dict[str, Optional[Dict[str, Any]]] = {}
+    if not path.exists():
+        return results
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            response = row.get("response") or {}
+            ok = response.get("status_code") == 200 and not row.get("error")
+            results[row["custom_id"]] = response.get("body") if ok else None
+    return results
+
+
+class LocalBatchBackend:
+    """
+    Stand-in for the OpenAI Batch API: same JSONL input/output format, but
+    the requests are executed right away with the synchronous client.
+    Output lines are appended as they complete, so resubmitting an
+    interrupted batch only runs the missing requests.
+    """
+
+    name = "local"
+    price_factor = 1.0
+
+    def __init__(self, job_dir: Path, client=None, max_workers: int = LOCAL_MAX_WORKERS):
+        self.job_dir = job_dir
+        self.client = client
+        self.max_workers = max_workers
+
+    def _output_path(self, batch_id: str) -> Path:
+        return self.job_dir / f"{batch_id}.output.jsonl"
+
+    def _run(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        client = self.client or recommendation.client
+        try:
+            resp = client.responses.create(**request["body"])
+        except BudgetExceeded:
+            raise  # not a failed request: left for the resumed job
+        except Exception as e:  # noqa: BLE001 - recorded like a Batch API error line
+            return {"custom_id": request["custom_id"], "response": None, "error": {"message": str(e)}}
+        usage = getattr(resp, "usage", None)
+        body = {
+            "output_text": resp.output_text,
+            "usage": {
+                "input_tokens": getattr(usage, "input_tokens", 0) or 0,
+                "output_tokens": getattr(usage, "output_tokens", 0) or 0,
+            },
+        }
+        return {"custom_id": request["custom_id"], "response": {"status_code": 200, "body": body}, "error": None}
+
+    def submit(self, input_path: Path) -> str:
+        batch_id = "local_" + hashlib.sha1(input_path.read_bytes()).hexdigest()[:16]
+        output_path = self._output_path(batch_id)
+        done = set(_read_results(output_path))
+
+        with input_path.open("r", encoding="utf-8") as f:
+            requests = [json.loads(line) for line in f if line.strip()]
+        todo = [r for r in requests if r["custom_id"] not in done]
+
+        lock = threading.Lock()
+        over_budget = None
+        run = in_current_context(self._run)
+        with output_path.open("a", encoding="utf-8") as out, ThreadPoolExecutor(self.max_workers) as pool:
+            for future in as_completed([pool.submit(run, r) for r in todo]):
+                try:
+                    line = json.dumps(future.result(), ensure_ascii=False)
+                except BudgetExceeded as e:
+                    over_budget = e
+                    continue
+                with lock:
+                    out.write(line + "\n")
+                    out.flush()
+        if over_budget is not None:
+            raise over_budget
+        return batch_id
+
+    def status(self, batch_id: str) -> str:
+        return "completed"
+
+    def results(self, batch_id: str) -> Dict[str, Optional[Dict[str, Any]]]:
+        return _read_results(self._output_path(batch_id))
+
+
+class OpenAIBatchBackend:
+    """OpenAI Batch API: upload the input file, poll, download the output file."""
+
+    name = "openai"
+    price_factor = BATCH_PRICE_FACTOR
+
+    def __init__(self, job_dir: Path, client=None):
+        self.job_dir = job_dir
+        self.client = client or recommendation.client
+
+    def submit(self, input_path: Path) -> str:
+        with input_path.open("rb") as f:
+            uploaded = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window=COMPLETION_WINDOW,
+        )
+        return batch.id
+
+    def status(self, batch_id: str) -> str:
+        return self.client.batches.retrieve(batch_id).status
+
+    def results(self, batch_id: str) -> Dict[str, Optional[Dict[str, Any]]]:
+        batch = self.client.batches.retrieve(batch_id)
+        results: Dict[str, Optional[Dict[str, Any]]] = {}
+        # expired batches still return what was completed; failed lines go
+        # to the error file and are re-scored online
+        for file_id in (batch.error_file_id, batch.output_file_id):
+            if not file_id:
+                continue
+            path = self.job_dir / f"{batch_id}.{file_id}.jsonl"
+            if not path.exists():
+                path.write_text(self.client.files.content(file_id).text, encoding="utf-8")
+            results.update(_read_results(path))
+        return results
+
+
+BACKENDS = {"local": LocalBatchBackend, "openai": OpenAIBatchBackend}
+
+
+def list_firms() -> List[str]:
+    return sorted(p.stem for p in FIRMS_DIR.glob("*.json"))
+
+
+def load_firm(cif: str) -> Dict[str, Any]:
+    firm = recommendation.load_firm_by_cif(cif)
+    firm.setdefault("cui", cif)
+    return firm
+
+
+def request_cost(usage: Dict[str, int], model: str, price_factor: float) -> float:
+    price_in, price_out = MODEL_PRICES.get(model, MODEL_PRICES[recommendation.MATCH_MODEL])
+    cost = usage.get("input_tokens", 0) * price_in + usage.get("output_tokens", 0) * price_out
+    return cost / 1_000_000 * price_factor
+
+
+class BatchJob:
+    def __init__(self, job_dir: Path, state: Dict[str, Any], backend):
+        self.job_dir = job_dir
+        self.state = state
+        self.backend = backend
+        self._started = time.monotonic()
+        self._elapsed_before = state.get("elapsed_s", 0.0)
+
+    @classmethod
+    def create(cls, backend_name: str, model: str, top_k: int, opp_type: Optional[str], firms: List[str]):
+        job_id = datetime.now().strftime("%Y%m%d-%H%M%S")
+        job_dir = BATCH_DIR / job_id
+        job_dir.mkdir(parents=True, exist_ok=True)
+        state = {
+            "job_id": job_id,
+            "backend": backend_name,
+            "model": model,
+            "top_k": top_k,
+            "type": opp_type,
+            "catalogue_version": catalogue_version(),
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "elapsed_s": 0.0,
+            "finished": False,
+            "firms": {cif: {"status": "pending"} for cif in firms},
+        }
+        job = cls(job_dir, state, BACKENDS[backend_name](job_dir))
+        job.save()
+        return job
+
+    @classmethod
+    def load(cls, job_id: Optional[str] = None):
+        """A job by id, or the most recent unfinished one."""
+        if job_id:
+            candidates = [BATCH_DIR / job_id]
+        else:
+            candidates = sorted(BATCH_DIR.glob("*/"), reverse=True) if BATCH_DIR.exists() else []
+        for job_dir in candidates:
+            path = job_dir / "state.json"
+            if not path.exists():
+                continue
+            with path.open("r", encoding="utf-8") as f:
+                state = json.load(f)
+            if job_id or not state.get("finished"):
+                return cls(job_dir, state, BACKENDS[state["backend"]](job_dir))
+        return None
+
+    def save(self):
+        self.state["elapsed_s"] = round(self._elapsed_before + time.monotonic() - self._started, 3)
+        write_json_atomic(self.state, self.job_dir / "state.json")
+
+    def _opportunities(self) -> List[Dict[str, Any]]:
+        # every open call of every type is scored, state["type"] only filters the saved top_k
+        return load_open_opportunities()
+
+    def _settings(self) -> Dict[str, Any]:
+        """Same shape as rag.run_match_opp.rematch_firm settings, combined mode without cascade."""
+        return {
+            "match_mode": "combined",
+            "cascade": "off",
+            "screen_model": None,
+            "confirm_model": None,
+            "band": None,
+        }
+
+    def _plan(self, cif: str, opportunities: List[Dict[str, Any]]):
+        """Only pairs affected since the stored results need a request (see rag.match_state)."""
+        hashes = opportunity_hashes(opportunities)
+        state = load_state(cif)
+        return state, hashes, plan_rematch(state, cif, self._settings(), hashes)
+
+    def build_input(self, cif: str) -> Path:
+        """Batch input file with one combined-match request per affected, rule-passing pair."""
+        firm = load_firm(cif)
+        opportunities = self._opportunities()
+        _, _, plan = self._plan(cif, opportunities)
+        opportunities = [op for op in opportunities if str(op.get("id")) in plan["affected"]]
+        verdicts = compile_rules(opportunities).verdicts(firm)
+        profile = firm_profile_for(firm)
+
+        path = self.job_dir / f"{cif}.input.jsonl"
+        requests = 0
+        with path.open("w", encoding="utf-8") as f:
+            for opp in opportunities:
+                verdict = verdicts.get(str(opp.get("id")), {}).get("verdict")
+                if verdict == "fail":
+                    continue
+                line = {
+                    "custom_id": f"{cif}:{opp['id']}",
+                    "method": "POST",
+                    "url": BATCH_ENDPOINT,
+                    "body": recommendation.combined_match_request(
+                        profile, with_raw_text(opp), self.state["model"]
+                    ),
+                }
+                f.write(json.dumps(line, ensure_ascii=False) + "\n")
+                requests += 1
+        self.state["firms"][cif]["requests"] = requests
+        return path
+
+    def submit(self, cif: str):
+        entry = self.state["firms"][cif]
+        path = self.build_input(cif)
+        entry["batch_id"] = self.backend.submit(path)
+        entry["status"] = "submitted"
+        self.save()
+
+    def collect(self, cif: str):
+        """Turn a finished batch into outputs/<cif>/match_opportunities.json."""
+        entry = self.state["firms"][cif]
+        results = self.backend.results(entry["batch_id"])
+
+        firm = load_firm(cif)
+        opportunities = self._opportunities()
+        stored, hashes, plan = self._plan(cif, opportunities)
+        kept = []
+        if plan["mode"] == "incremental":
+            kept = [
+                e for e in match_store.load_scores(cif)
+                if str(e["id"]) not in plan["affected"] and str(e["id"]) not in plan["removed"]
+            ]
+        opportunities = [op for op in opportunities if str(op.get("id")) in plan["affected"]]
+        verdicts = compile_rules(opportunities).verdicts(firm)
+        no_rules = {"verdict": "unknown", "failed_rules": [], "passed_rules": [], "unknown_rules": []}
+        profile = None
+
+        usage = {"input_tokens": 0, "output_tokens": 0}
+        fallbacks = 0
+        scored = []
+        for opp in opportunities:
+            rule_result = verdicts.get(str(opp.get("id")), no_rules)
+            if rule_result["verdict"] == "fail":
+                scored.append(recommendation.build_match_entry(
+                    opp, 0.0, rule_result["failed_rules"], rule_result, "rules"
+                ))
+                continue
+
+            body = results.get(f"{cif}:{opp['id']}")
+            result = None
+            if body is not None:
+                for key in usage:
+                    usage[key] += (body.get("usage") or {}).get(key, 0) or 0
+                try:
+                    result = recommendation.parse_match_output(response_text(body))
+                except ValueError:
+                    result = None
+            if result is None:
+                # missing, failed or unparsable line: score it online
+                fallbacks += 1
+                profile = profile or firm_profile_for(firm)
+                result = recommendation.llm_match_score_and_reasons(
+                    profile, with_raw_text(opp), self.state["model"]
+                )
+            scored.append(recommendation.build_match_entry(
+                opp, result["score"], result["reasons"], rule_result, "llm"
+            ))
+
+        scored = [e for e in kept + scored if not is_expired(e)]
+        save_state(cif, self._settings(), hashes, scored)
+        save_match_outputs(cif, scored, self.state["top_k"], {
+            **self._settings(),
+            "type": self.state["type"],
+            "batch_job": self.state["job_id"],
+            "batch_backend": self.state["backend"],
+            "rematch": {"mode": plan["mode"], "reason": plan["reason"], "kept": len(kept)},
+        }, self.state["type"])
+        entry.update({
+            "status": "done",
+            "usage": usage,
+            "online_fallbacks": fallbacks,
+            "cost_usd": round(request_cost(usage, self.state["model"], self.backend.price_factor), 6),
+        })
+        self.save()
+
+    def _with_status(self, status: str) -> List[str]:
+        return [cif for cif, e in self.state["firms"].items() if e["status"] == status]
+
+    def run(self, poll_interval: float = POLL_INTERVAL_S):
+        """
+        Submit and collect every firm under the job's LLM budget
+        (state["token_budget"], None = unlimited); when the budget runs
+        out the job stops unfinished and can be resumed.
+        """
+        with llm_job(self.state["job_id"], priority=BATCH, max_tokens=self.state.get("token_budget")):
+            try:
+                self._submit_and_collect(poll_interval)
+            except BudgetExceeded as e:
+                print(f"[batch] stopped: {e}")
+                self.state["finished"] = False
+                self.save()
+                return self.report()
+
+        self.state["finished"] = not self._with_status("pending")
+        self.save()
+        return self.report()
+
+    def _submit_and_collect(self, poll_interval: float):
+        if self.state["catalogue_version"] != catalogue_version():
+            print(f"[batch] catalogue changed since job {self.state['job_id']} started, "
+                  f"results reflect version {self.state['catalogue_version']}")
+
+        for cif in self._with_status("pending"):
+            try:
+                self.submit(cif)
+            except BudgetExceeded:
+                raise
+            except Exception as e:  # noqa: BLE001 - keep going, the firm stays pending
+                print(f"[batch] submit failed for {cif}: {e}")
+                continue
+            print(f"[batch] submitted {cif} ({self.state['firms'][cif]['requests']} requests)")
+            if self.backend.status(self.state["firms"][cif]["batch_id"]) == "completed":
+                self.collect(cif)
+
+        while True:
+            waiting = []
+            for cif in self._with_status("submitted"):
+                status = self.backend.status(self.state["firms"][cif]["batch_id"])
+                if status in TERMINAL_STATUSES:
+                    if status != "completed":
+                        print(f"[batch] batch for {cif} ended as {status}, collecting partial results")
+                    self.collect(cif)
+                else:
+                    waiting.append(cif)
+            if not waiting:
+                break
+            print(f"[batch] waiting for {len(waiting)} batch(es)...")
+            self.save()
+            time.sleep(poll_interval)
+
+    def report(self) -> Dict[str, Any]:
+        done = [e for e in self.state["firms"].values() if e["status"] == "done"]
+        hours = self.state["elapsed_s"] / 3600
+        cost = sum(e.get("cost_usd", 0.0) for e in done)
+        report = {
+            "job_id": self.state["job_id"],
+            "backend": self.state["backend"],
+            "model": self.state["model"],
+            "catalogue_version": self.state["catalogue_version"],
+            "firms": len(self.state["firms"]),
+            "firms_done": len(done),
+            "requests": sum(e.get("requests", 0) for e in done),
+            "online_fallbacks": sum(e.get("online_fallbacks", 0) for e in done),
+            "input_tokens": sum(e.get("usage", {}).get("input_tokens", 0) for e in done),
+            "output_tokens": sum(e.get("usage", {}).get("output_tokens", 0) for e in done),
+            "elapsed_s": self.state["elapsed_s"],
+            "firms_per_hour": round(len(done) / hours, 2) if hours else None,
+            "cost_usd": round(cost, 4),
+            "cost_per_firm_usd": round(cost / len(done), 6) if done else None,
+        }
+        write_json_atomic(report, self.job_dir / "report.json")
+        return report
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Batch matching pentru toate firmele din data/firms/."
+    )
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="local",
+                        help="local = execuție imediată, openai = Batch API (preț redus, până la 24h).")
+    parser.add_argument("--cif", action="append", help="Doar aceste firme (se poate repeta).")
+    parser.add_argument("--top-k", type=int, default=5, help="Numărul de oportunități salvate per firmă.")
+    parser.add_argument("--type", choices=["grant", "vc", "accelerator", "all"], default="all",
+                        help="Filtru pe tipul oportunităților.")
+    parser.add_argument("--model", default=recommendation.MATCH_MODEL, help="Modelul de scoring.")
+    parser.add_argument("--resume", nargs="?", const="", metavar="JOB_ID",
+                        help="Continuă un job (implicit ultimul neterminat).")
+    parser.add_argument("--poll-interval", type=float, default=POLL_INTERVAL_S,
+                        help="Secunde între verificările statusului batch-urilor.")
+    parser.add_argument("--token-budget", type=int, default=None,
+                        help="Numărul maxim de tokeni LLM ai job-ului (se păstrează la --resume).")
+    args = parser.parse_args()
+
+    if args.resume is not None:
+        job = BatchJob.load(args.resume or None)
+        if job is None:
+            raise SystemExit("[batch] no job to resume")
+        print(f"[batch] resuming job {job.state['job_id']}")
+    else:
+        firms = args.cif or list_firms()
+        opp_type = None if args.type == "all" else args.type
+        job = BatchJob.create(args.backend, args.model, args.top_k, opp_type, firms)
+        print(f"[batch] job {job.state['job_id']}: {len(firms)} firm(s), backend {args.backend}")
+
+    if args.token_budget is not None:
+        job.state["token_budget"] = args.token_budget
+        job.save()
+    report = job.run(args.poll_interval)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,15 +3,165 @@ from __future__ import annotations
 
 import argparse
 import json
+from contextlib import nullcontext
+from datetime import date
 from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
 
-from .recommendation import recommend_opportunities_for_firm
+from . import match_store, tracing
+from .catalogue import load_open_opportunities
+from .llm_gateway import INTERACTIVE, PRIORITY_RESERVE, llm_job
+from .match_state import is_expired, load_state, needs_rematch, opportunity_hashes, plan_rematch, save_state
+from .profiling import Profiler
+from .recommendation import (
+    CASCADE_BAND,
+    CASCADE_MODES,
+    CONFIRM_MODEL,
+    DEFAULT_CASCADE,
+    DEFAULT_MATCH_MODE,
+    MATCH_MODES,
+    SCREEN_MODEL,
+    match_metrics,
+    score_opportunities_for_firm,
+)
 
 BASE_DIR = Path(__file__).resolve().parents[1]
 OUTPUT_DIR = BASE_DIR / "outputs"
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
 
+def write_recommendations(
+    cif: str,
+    top_k: int,
+    opp_type: Optional[str] = None,
+    sort: str = match_store.DEFAULT_SORT,
+) -> List[Dict[str, Any]]:
+    """
+    Write outputs/<cif>/match_opportunities.json from the stored pairs
+    (rag.match_store), filtered and ordered at read time.
+    """
+    recs = match_store.query_matches(cif, top_k=top_k, opp_type=opp_type, sort=sort)
+
+    # Also save to file for debugging / frontend
+    firm_dir = OUTPUT_DIR / cif
+    firm_dir.mkdir(parents=True, exist_ok=True)
+    out_path = firm_dir / "match_opportunities.json"
+    with out_path.open("w", encoding="utf-8") as f:
+        json.dump(recs, f, ensure_ascii=False, indent=2)
+
+    print(f"\n[info] Saved matches to {out_path}")
+    return recs
+
+
+def save_match_outputs(
+    cif: str,
+    scored,
+    top_k: int,
+    metrics_extra=None,
+    opp_type: Optional[str] = None,
+    sort: str = match_store.DEFAULT_SORT,
+):
+    """
+    Write outputs/<cif>/match_opportunities.json (see write_recommendations)
+    and match_metrics.json for `scored`, already in the match store; returns
+    the saved recommendations.
+    """
+    recs = write_recommendations(cif, top_k, opp_type, sort)
+
+    # which tier decided each pair, escalation rate of the cascade
+    firm_dir = OUTPUT_DIR / cif
+    metrics = {**match_metrics(scored), **(metrics_extra or {})}
+    metrics_path = firm_dir / "match_metrics.json"
+    with metrics_path.open("w", encoding="utf-8") as f:
+        json.dump(metrics, f, ensure_ascii=False, indent=2)
+    print(f"[info] Saved match metrics to {metrics_path}")
+    return recs
+
+
+def rematch_firm(
+    cif: str,
+    top_k: int = 5,
+    opp_type: Optional[str] = None,
+    match_mode: str = DEFAULT_MATCH_MODE,
+    cascade: str = DEFAULT_CASCADE,
+    screen_model: str = SCREEN_MODEL,
+    confirm_model: str = CONFIRM_MODEL,
+    band: float = CASCADE_BAND,
+    full: bool = False,
+    today: Optional[date] = None,
+    sort: str = match_store.DEFAULT_SORT,
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Bring outputs/<cif>/ up to date with the least LLM work.
+
+    Every opportunity is scored, whatever `opp_type`: the type filter, top_k
+    and sort only apply when the stored pairs are read, so changing them
+    costs nothing once the results are up to date. Only pairs whose
+    opportunity is new or changed since the stored run are re-scored (all
+    pairs after a firm edit, a settings change or with full=True); removed
+    opportunities and those whose deadline has passed are dropped from the
+    stored results without any LLM call. Returns the saved top_k
+    recommendations and a summary of what was re-scored.
+    """
+    settings = {
+        "match_mode": match_mode,
+        "cascade": cascade,
+        "screen_model": screen_model if cascade == "llm" else None,
+        "confirm_model": confirm_model if cascade != "off" else None,
+        "band": band if cascade != "off" else None,
+    }
+    if not full and not needs_rematch(cif, settings, today):
+        # stored pairs are current: only the read-time view changes
+        summary = {"mode": "stored", "reason": "up to date", "rescored": 0}
+        print(f"[rematch] {cif}: {summary}")
+        return write_recommendations(cif, top_k, opp_type, sort), summary
+
+    with tracing.span("match.plan", cif=cif) as span:
+        state = None if full else load_state(cif)
+        # closed calls count as removed: dropped without being scored
+        hashes = opportunity_hashes(load_open_opportunities(today=today))
+        plan = plan_rematch(state, cif, settings, hashes)
+        span.set(mode=plan["mode"], affected=len(plan["affected"]))
+
+    kept = []
+    if plan["mode"] == "incremental":
+        kept = [
+            entry for entry in match_store.load_scores(cif)
+            if str(entry["id"]) not in plan["affected"] and str(entry["id"]) not in plan["removed"]
+        ]
+
+    rescored = []
+    if plan["affected"]:
+        rescored = score_opportunities_for_firm(
+            cif,
+            match_mode=match_mode,
+            cascade=cascade,
+            screen_model=screen_model,
+            confirm_model=confirm_model,
+            band=band,
+            only_ids=plan["affected"],
+        )
+
+    merged = kept + rescored
+    scored = [entry for entry in merged if not is_expired(entry, today)]
+    summary = {
+        "mode": plan["mode"],
+        "reason": plan["reason"],
+        "rescored": len(rescored),
+        "kept": len(kept),
+        "removed": len(plan["removed"]),
+        "expired": len(merged) - len(scored),
+    }
+    print(f"[rematch] {cif}: {summary}")
+
+    with tracing.span("match.save", cif=cif, scored=len(scored)):
+        save_state(cif, settings, hashes, scored, today)
+        recs = save_match_outputs(
+            cif, scored, top_k, {**settings, "type": opp_type, "sort": sort, "rematch": summary}, opp_type, sort
+        )
+    return recs, summary
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Match opportunities for a given firm CIF."
@@ -27,7 +177,49 @@ def main():
         "--type",
         choices=["grant", "vc", "accelerator", "all"],
         default="all",
-        help="Filtru pe tipul oportunităților.",
+        help="Filtru pe tipul oportunităților (aplicat la citire, nu re-evaluează nimic).",
+    )
+    parser.add_argument(
+        "--sort",
+        choices=sorted(match_store.SORT_ORDERS),
+        default=match_store.DEFAULT_SORT,
+        help="Ordinea recomandărilor: score, eligible, funding sau deadline (aplicată la citire).",
+    )
+    parser.add_argument(
+        "--match-mode",
+        choices=MATCH_MODES,
+        default=DEFAULT_MATCH_MODE,
+        help="combined = un singur apel (scor + motive), two_call = scor și explicație separate.",
+    )
+    parser.add_argument(
+        "--cascade",
+        choices=CASCADE_MODES,
+        default=DEFAULT_CASCADE,
+        help="Screening ieftin (llm/vector) și confirmare doar pe cazurile la limită.",
+    )
+    parser.add_argument("--screen-model", default=SCREEN_MODEL, help="Modelul de screening.")
+    parser.add_argument("--confirm-model", default=CONFIRM_MODEL, help="Modelul de confirmare.")
+    parser.add_argument(
+        "--band",
+        type=float,
+        default=CASCADE_BAND,
+        help="Lățimea benzii de incertitudine în jurul pragului 0.5 (default 0.15).",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Ignoră rezultatele salvate și re-evaluează toate perechile.",
+    )
+    parser.add_argument(
+        "--priority",
+        choices=sorted(PRIORITY_RESERVE),
+        default=INTERACTIVE,
+        help="Clasa de prioritate a apelurilor LLM (implicit interactive: rulat la cererea paginii).",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Profil CPU, timp/memorie pe etape și rețea vs. calcul în outputs/profiles/ (rag.profiling).",
     )
 
     args = parser.parse_args()
@@ -35,20 +227,23 @@ def main():
     top_k = args.top_k
     opp_type = None if args.type == "all" else args.type
 
-    recs = recommend_opportunities_for_firm(cif, top_k=top_k, opp_type=opp_type)
-
+    profiler = Profiler(f"match-{cif}") if args.profile else nullcontext()
+    with profiler, tracing.span("run_match_opp", cif=cif, top_k=top_k), llm_job(f"match-{cif}", priority=args.priority):
+        recs, _ = rematch_firm(
+            cif,
+            top_k=top_k,
+            opp_type=opp_type,
+            match_mode=args.match_mode,
+            cascade=args.cascade,
+            screen_model=args.screen_model,
+            confirm_model=args.confirm_model,
+            band=args.band,
+            full=args.full,
+            sort=args.sort,
+        )
     # Print to stdout
     print(json.dumps(recs, ensure_ascii=False, indent=2))
 
-    # Also save to file for debugging / frontend
-    firm_dir = OUTPUT_DIR / cif
-    firm_dir.mkdir(parents=True, exist_ok=True)
-    out_path = firm_dir / f"match_opportunities.json"
-    with out_path.open("w", encoding="utf-8") as f:
-        json.dump(recs, f, ensure_ascii=False, indent=2)
-
-    print(f"\n[info] Saved matches to {out_path}")
-
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,382 @@
+# rag/tracing.py
+"""
+Span tracing for the matching and generation pipelines.
+
+A span is a named, timed stage (start, duration, status) with attributes
+(CUI, opportunity id, model, tokens...); spans nest through a context
+variable and subprocesses started with child_env() continue the trace of
+the span that started them, so one /grants page load shows the request,
+the rag.run_match_opp subprocess, its LLM calls and the JSON writes.
+
+Finished spans are appended as JSON lines to one file, shared by every
+process, and aggregated into Prometheus-style metrics (duration
+histograms per span name, errors, LLM tokens per model) served by the
+Flask app on /metrics.
+
+Tracing is off unless RAG_TRACE is set ("1" = outputs/traces/spans.jsonl,
+anything else is the file path); off, span() returns a shared no-op object
+and costs one global lookup.
+
+    RAG_TRACE=1 python frontend/app.py
+    python -m rag.tracing                        # slowest stages
+    python -m rag.tracing --trace <trace_id>     # one trace as a tree
+"""
+from __future__ import annotations
+
+import argparse
+import contextvars
+import json
+import math
+import os
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+TRACES_DIR = BASE_DIR / "outputs" / "traces"
+DEFAULT_TRACE_PATH = TRACES_DIR / "spans.jsonl"
+
+TRACE_ENV = "RAG_TRACE"
+# "<trace_id>:<span_id>" of the span that started this process
+TRACE_PARENT_ENV = "RAG_TRACE_PARENT"
+
+# histogram bucket upper bounds, seconds
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, math.inf)
+# span attributes summed into rag_llm_tokens_total{model, kind}
+TOKEN_ATTRS = ("input_tokens", "output_tokens")
+
+
+class _NoopSpan:
+    """What span() returns while tracing is off."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "attrs", "start", "_t0", "_cpu0", "_mem0",
+                 "_mem_peak", "_parent", "_token")
+
+    def __init__(self, name: str, attrs: Dict[str, Any]):
+        self.name = name
+        self.attrs = attrs
+        parent = self._parent = _current.get()
+        if parent is not None:
+            self.trace_id, self.parent_id = parent.trace_id, parent.span_id
+        else:
+            self.trace_id, self.parent_id = _remote_parent or (uuid.uuid4().hex, None)
+        self.span_id = uuid.uuid4().hex[:16]
+        self.start = 0.0
+        self._t0 = self._cpu0 = 0.0
+        self._mem0 = self._mem_peak = None
+        self._token = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self) -> "Span":
+        if tracemalloc.is_tracing():
+            # the peak counter is process-wide: fold it into the enclosing
+            # span before restarting it for this one
+            current, peak = tracemalloc.get_traced_memory()
+            _fold_peak(self._parent, peak)
+            tracemalloc.reset_peak()
+            self._mem0 = self._mem_peak = current
+        self.start = time.time()
+        self._t0 = time.perf_counter()
+        self._cpu0 = time.thread_time()
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        duration = time.perf_counter() - self._t0
+        cpu = time.thread_time() - self._cpu0
+        _current.reset(self._token)
+        record = {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": round(self.start, 6),
+            "duration_ms": round(1000 * duration, 3),
+            # CPU of this thread; duration - cpu_ms is time spent waiting
+            "cpu_ms": round(1000 * cpu, 3),
+            "status": "error" if exc_type else "ok",
+            "pid": os.getpid(),
+            "attrs": self.attrs,
+        }
+        if self._mem0 is not None and tracemalloc.is_tracing():
+            peak = max(self._mem_peak, tracemalloc.get_traced_memory()[1])
+            _fold_peak(self._parent, peak)
+            record["mem_peak_kb"] = round((peak - self._mem0) / 1024, 1)
+        if exc_type:
+            record["error"] = repr(exc)
+        exporter = _exporter
+        if exporter is not None:
+            exporter.export(record)
+        return False
+
+
+def _fold_peak(span: Optional[Span], peak: int):
+    if span is not None and span._mem_peak is not None:
+        span._mem_peak = max(span._mem_peak, peak)
+
+
+class Metrics:
+    """Prometheus-style aggregation of finished spans."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.buckets: Dict[str, List[int]] = defaultdict(lambda: [0] * len(DURATION_BUCKETS))
+        self.sums: Dict[str, float] = defaultdict(float)
+        self.counts: Dict[str, int] = defaultdict(int)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.tokens: Dict[Tuple[str, str], int] = defaultdict(int)
+        self._offset = 0
+
+    def observe(self, record: Dict[str, Any]):
+        name = record["name"]
+        seconds = record["duration_ms"] / 1000
+        attrs = record.get("attrs") or {}
+        with self._lock:
+            buckets = self.buckets[name]
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if seconds <= bound:
+                    buckets[i] += 1
+            self.sums[name] += seconds
+            self.counts[name] += 1
+            if record.get("status") == "error":
+                self.errors[name] += 1
+            for attr in TOKEN_ATTRS:
+                value = attrs.get(attr)
+                if isinstance(value, (int, float)) and value:
+                    self.tokens[(str(attrs.get("model") or ""), attr[: -len("_tokens")])] += int(value)
+
+    def ingest(self, path: Path):
+        """Spans other processes appended to `path` since the last call."""
+        if not path.exists():
+            return
+        pid = os.getpid()
+        if os.path.getsize(path) < self._offset:  # truncated / replaced
+            self._offset = 0
+        with path.open("rb") as f:
+            f.seek(self._offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # half-written, read it next time
+                self._offset += len(line)
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if record.get("pid") != pid:  # our own spans were observed directly
+                    self.observe(record)
+
+    def render(self) -> str:
+        lines = [
+            "# HELP rag_span_duration_seconds Duration of traced pipeline stages.",
+            "# TYPE rag_span_duration_seconds histogram",
+        ]
+        with self._lock:
+            for name in sorted(self.counts):
+                label = _label(name)
+                for bound, count in zip(DURATION_BUCKETS, self.buckets[name]):
+                    le = "+Inf" if bound == math.inf else repr(bound)
+                    lines.append(f'rag_span_duration_seconds_bucket{{span="{label}",le="{le}"}} {count}')
+                lines.append(f'rag_span_duration_seconds_sum{{span="{label}"}} {self.sums[name]:.6f}')
+                lines.append(f'rag_span_duration_seconds_count{{span="{label}"}} {self.counts[name]}')
+            lines += [
+                "# HELP rag_span_errors_total Traced stages that raised.",
+                "# TYPE rag_span_errors_total counter",
+            ]
+            for name in sorted(self.counts):
+                lines.append(f'rag_span_errors_total{{span="{_label(name)}"}} {self.errors[name]}')
+            lines += [
+                "# HELP rag_llm_tokens_total LLM tokens of traced calls.",
+                "# TYPE rag_llm_tokens_total counter",
+            ]
+            for (model, kind), value in sorted(self.tokens.items()):
+                lines.append(f'rag_llm_tokens_total{{model="{_label(model)}",kind="{kind}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class SpanExporter:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.metrics = Metrics()
+        self._lock = threading.Lock()
+        self._file = None
+
+    def export(self, record: Dict[str, Any]):
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._lock:
+            if self._file is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._file = self.path.open("a", encoding="utf-8", buffering=1)
+            self._file.write(line + "\n")
+        self.metrics.observe(record)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+_current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("rag_span", default=None)
+_exporter: Optional[SpanExporter] = None
+_remote_parent: Optional[Tuple[str, str]] = None
+
+
+def configure(path: Optional[Path] = None, enabled: bool = True):
+    """Turn tracing on (to `path`, default outputs/traces/spans.jsonl) or off."""
+    global _exporter
+    _exporter = SpanExporter(Path(path) if path else DEFAULT_TRACE_PATH) if enabled else None
+
+
+@contextmanager
+def exporting_to(path: Path):
+    """Spans finished inside the block go to `path` (tracing on even if RAG_TRACE is not set)."""
+    global _exporter
+    previous, _exporter = _exporter, SpanExporter(Path(path))
+    try:
+        yield _exporter
+    finally:
+        _exporter.close()
+        _exporter = previous
+
+
+def _configure_from_env():
+    global _remote_parent
+    value = os.getenv(TRACE_ENV, "").strip()
+    if value and value.lower() not in ("0", "false", "off"):
+        configure(None if value.lower() in ("1", "true", "on") else Path(value))
+    parent = os.getenv(TRACE_PARENT_ENV, "")
+    if ":" in parent:
+        trace_id, span_id = parent.split(":", 1)
+        _remote_parent = (trace_id, span_id)
+
+
+def enabled() -> bool:
+    return _exporter is not None
+
+
+def span(name: str, **attrs):
+    """
+    Context manager timing one stage; `.set(key=value)` adds attributes
+    known only at the end (tokens, counts, status code).
+    """
+    if _exporter is None:
+        return _NOOP
+    return Span(name, attrs)
+
+
+def annotate(**attrs):
+    """Add attributes to the innermost open span, if any."""
+    current = _current.get()
+    if current is not None:
+        current.attrs.update(attrs)
+
+
+def child_env(env: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """Environment for a subprocess that continues the current trace."""
+    env = dict(os.environ if env is None else env)
+    current = _current.get()
+    if _exporter is not None:
+        env[TRACE_ENV] = str(_exporter.path)
+        if current is not None:
+            env[TRACE_PARENT_ENV] = f"{current.trace_id}:{current.span_id}"
+    return env
+
+
+def metrics_text() -> str:
+    """Prometheus exposition of this process' spans and those other processes wrote to the trace file."""
+    if _exporter is None:
+        return "# tracing disabled (set RAG_TRACE)\n"
+    _exporter.metrics.ingest(_exporter.path)
+    return _exporter.metrics.render()
+
+
+def load_spans(path: Path) -> List[Dict[str, Any]]:
+    spans = []
+    with Path(path).open("r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                spans.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return spans
+
+
+def summarize(spans: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    by_name: Dict[str, List[float]] = defaultdict(list)
+    for s in spans:
+        by_name[s["name"]].append(s["duration_ms"])
+    rows = []
+    for name, durations in by_name.items():
+        durations.sort()
+        rows.append({
+            "span": name,
+            "count": len(durations),
+            "total_ms": round(sum(durations), 1),
+            "p50_ms": round(durations[len(durations) // 2], 1),
+            "p95_ms": round(durations[min(len(durations) - 1, int(0.95 * len(durations)))], 1),
+        })
+    return sorted(rows, key=lambda r: r["total_ms"], reverse=True)
+
+
+def print_trace(spans: List[Dict[str, Any]], trace_id: str):
+    spans = [s for s in spans if s["trace_id"].startswith(trace_id)]
+    children: Dict[Optional[str], List[Dict[str, Any]]] = defaultdict(list)
+    ids = {s["span_id"] for s in spans}
+    for s in sorted(spans, key=lambda s: s["start"]):
+        children[s["parent_id"] if s["parent_id"] in ids else None].append(s)
+    t0 = min((s["start"] for s in spans), default=0.0)
+
+    def walk(parent: Optional[str], depth: int):
+        for s in children.get(parent, []):
+            attrs = " ".join(f"{k}={v}" for k, v in s.get("attrs", {}).items())
+            print(f"{1000 * (s['start'] - t0):9.1f} ms {s['duration_ms']:9.1f} ms  "
+                  f"{'  ' * depth}{s['name']} [{s['status']}] {attrs}")
+            walk(s["span_id"], depth + 1)
+
+    walk(None, 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rezumatul span-urilor înregistrate (RAG_TRACE).")
+    parser.add_argument("path", nargs="?", default=str(DEFAULT_TRACE_PATH), help="Fișierul JSONL cu span-uri.")
+    parser.add_argument("--trace", help="Afișează un singur trace (id sau prefix) ca arbore.")
+    args = parser.parse_args()
+
+    spans = load_spans(Path(args.path))
+    if args.trace:
+        print_trace(spans, args.trace)
+    else:
+        print(json.dumps(summarize(spans), indent=2, ensure_ascii=False))
+
+
+_configure_from_env()
+
+if __name__ == "__main__":
+    main()
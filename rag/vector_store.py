@@ -2,88 +2,284 @@
 # Codul CAEN real Veridion 7022
 import json
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
 
 import numpy as np
 
-from .openai_client import embed_text
+from .ann_index import DEFAULT_N_PROBE, IVFIndex, coarse_rows, rerank_shortlist
+from .eligibility_rules import caen_prefixes, normalize_caen_code
+from .embeddings import OpenAIEmbeddings, load_index_embedder, load_index_info
 
 BASE_DIR = Path(__file__).resolve().parents[1]
 INDICES_DIR = BASE_DIR / "indices"
 
 INDEX_EMBEDDINGS_PATH = INDICES_DIR / "opportunities_index.npy"
 INDEX_METADATA_PATH = INDICES_DIR / "opportunities_metadata.json"
+INDEX_INFO_PATH = INDICES_DIR / "opportunities_index_info.json"
+IVF_INDEX_PATH = INDICES_DIR / "opportunities_ivf.npz"
+COARSE_INDEX_PATH = INDICES_DIR / "opportunities_index_coarse.npy"
+
+ELIGIBLE_SIMILARITY = 0.40
+# search_many: bound on the (queries x rows) float32 score block, in bytes
+SEARCH_BLOCK_BYTES = 64 * 1024 * 1024
+# inputs per embeddings request
+EMBED_BATCH = 256
+
+# one filter dict for all queries, or one per query:
+# {"type": "grant", "caen": "7022"} (both optional)
+Filters = Union[None, Dict[str, Optional[str]], Sequence[Optional[Dict[str, Optional[str]]]]]
 
 
 class OpportunityVectorStore:
     def __init__(self):
         self.embeddings = None  # np.ndarray shape (N, D)
         self.metadata: List[Dict[str, Any]] = []
+        # optional approximate index, see rag.ann_index / index_builder --ann
+        self.ann: Optional[IVFIndex] = None
+        self.n_probe = DEFAULT_N_PROBE
+        # optional reduced-dimension unit rows for two-stage search
+        self.coarse: Optional[np.ndarray] = None
+        # embeds queries with the backend that built the index (rag.embeddings)
+        self.embedder = None
         self._load()
 
+    @classmethod
+    def from_arrays(
+        cls,
+        embeddings: np.ndarray,
+        metadata: List[Dict[str, Any]],
+        ann: Optional[IVFIndex] = None,
+        n_probe: int = DEFAULT_N_PROBE,
+        embedder=None,
+        coarse_dim: Optional[int] = None,
+    ) -> "OpportunityVectorStore":
+        """
+        Store over in-memory rows (benchmarks, tests) instead of indices/;
+        `embedder` is any object with embed_text / embed_texts (OpenAI by
+        default), `coarse_dim` enables two-stage search.
+        """
+        store = cls.__new__(cls)
+        store._set(np.asarray(embeddings, dtype="float32"), metadata)
+        store.ann = ann
+        store.n_probe = n_probe
+        store.coarse = coarse_rows(store.unit_embeddings, coarse_dim) if coarse_dim else None
+        store.embedder = embedder or OpenAIEmbeddings()
+        return store
+
     def _load(self):
         if not INDEX_EMBEDDINGS_PATH.exists() or not INDEX_METADATA_PATH.exists():
             raise RuntimeError("Index files not found. Run index_builder.build_index() first.")
 
-        self.embeddings = np.load(INDEX_EMBEDDINGS_PATH)
+        embeddings = np.load(INDEX_EMBEDDINGS_PATH)
         with INDEX_METADATA_PATH.open("r", encoding="utf-8") as f:
-            self.metadata = json.load(f)
+            metadata = json.load(f)
+        self._set(embeddings, metadata)
+
+        info = load_index_info(INDEX_INFO_PATH)
+        self.embedder = load_index_embedder(info)
+        if info.get("ann") == "ivf" and IVF_INDEX_PATH.exists():
+            self.ann = IVFIndex.load(IVF_INDEX_PATH)
+            self.n_probe = info.get("n_probe", DEFAULT_N_PROBE)
+        if info.get("coarse_dim") and COARSE_INDEX_PATH.exists():
+            self.coarse = np.load(COARSE_INDEX_PATH)
+            if self.coarse.shape[0] != len(self.metadata):
+                raise RuntimeError("Coarse index and metadata size mismatch")
+
+    def _set(self, embeddings: np.ndarray, metadata: List[Dict[str, Any]]):
+        self.embeddings = embeddings
+        self.metadata = metadata
 
         if self.embeddings.shape[0] != len(self.metadata):
             raise RuntimeError("Embeddings and metadata size mismatch")
 
+        # unit rows: cosine similarity is a plain dot product
+        self.unit_embeddings = (
+            self.embeddings / (np.linalg.norm(self.embeddings, axis=1, keepdims=True) + 1e-10)
+        ).astype("float32")
+
+        # CAEN codes as sets of canonical strings, so filters do not depend
+        # on how the extractor/LLM formatted them (int, '62.01', ...)
+        self.caen_sets = [
+            {c for c in map(normalize_caen_code, m.get("eligible_caen_codes") or []) if c}
+            for m in self.metadata
+        ]
+        self.types = np.array([m.get("type") for m in self.metadata], dtype=object)
+        self._filter_cache: Dict[Tuple[Optional[str], Optional[str]], Tuple[np.ndarray, np.ndarray]] = {}
+
+    def _filter(self, filter_type: Optional[str], filter_caen: Optional[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (bool mask, row indices) passing the type / CAEN filters (rows
+        without CAEN codes always pass).
+        """
+        caen = normalize_caen_code(filter_caen) if filter_caen else None
+        key = (filter_type or None, caen)
+        if key not in self._filter_cache:
+            mask = np.ones(len(self.metadata), dtype=bool)
+            if filter_type:
+                mask &= self.types == filter_type
+            if caen:
+                covering = caen_prefixes(caen)
+                mask &= np.array([not codes or bool(codes & covering) for codes in self.caen_sets], dtype=bool)
+            self._filter_cache[key] = (mask, np.flatnonzero(mask))
+        return self._filter_cache[key]
+
+    def _ann_search(
+        self, query: np.ndarray, top_k: int, mask: np.ndarray, n_probe: Optional[int]
+    ) -> List[Dict[str, Any]]:
+        rows, sims = self.ann.search(
+            self.unit_embeddings, query, top_k, n_probe or self.n_probe,
+            None if mask.all() else mask,
+        )
+        return [self._result(int(i), float(s)) for i, s in zip(rows, sims)]
+
+    def _rows(self, indices: np.ndarray) -> np.ndarray:
+        # unfiltered searches use the matrix as is instead of a copy
+        return self.unit_embeddings if len(indices) == len(self.metadata) else self.unit_embeddings[indices]
+
+    def _rerank(self, queries: np.ndarray, indices: np.ndarray, top_k: int) -> List[List[Dict[str, Any]]]:
+        """
+        Two-stage top_k for a block of unit queries over rows `indices`:
+        shortlist on the coarse rows, exact scores at full width for the
+        shortlist only.
+        """
+        dim = self.coarse.shape[1]
+        coarse_queries = queries[:, :dim] / (np.linalg.norm(queries[:, :dim], axis=1, keepdims=True) + 1e-10)
+        coarse = self.coarse if len(indices) == len(self.metadata) else self.coarse[indices]
+        sims = coarse_queries @ coarse.T  # (queries, candidates)
+        size = min(rerank_shortlist(top_k), len(indices))
+        if size < len(indices):
+            shortlists = np.argpartition(-sims, size - 1, axis=1)[:, :size]
+        else:
+            shortlists = np.broadcast_to(np.arange(len(indices)), (len(queries), len(indices)))
+
+        results = []
+        for query, shortlist in zip(queries, shortlists):
+            rows = indices[shortlist]
+            full = self.unit_embeddings[rows] @ query
+            k = min(top_k, len(rows))
+            top = np.argpartition(-full, k - 1)[:k] if k < len(rows) else np.arange(len(rows))
+            top = top[np.argsort(-full[top])]
+            results.append([self._result(int(rows[t]), float(full[t])) for t in top])
+        return results
+
+    def _result(self, i: int, score: float) -> Dict[str, Any]:
+        return {
+            **self.metadata[i],
+            "score": score,
+            "eligible": score >= ELIGIBLE_SIMILARITY,
+        }
+
     def search(
         self,
         query: str,
         top_k: int = 5,
         filter_type: Optional[str] = None,
         filter_caen: Optional[str] = None,
+        exact: bool = False,
+        n_probe: Optional[int] = None,
     ) -> List[Dict[str, Any]]:
         """
         Search for opportunities similar to the query.
         Optionally filter by type ('grant', 'vc', 'accelerator') and/or CAEN code.
+        Uses the IVF index when one was built, otherwise the two-stage
+        coarse/full search when a coarse index was built, unless exact=True;
+        n_probe overrides the number of lists scanned.
         """
-        query_vec = np.array(embed_text(query), dtype="float32")
-
-        # apply filters by masking metadata
-        indices = list(range(len(self.metadata)))
-        if filter_type:
-            indices = [
-                i for i in indices
-                if self.metadata[i].get("type") == filter_type
-            ]
-        if filter_caen:
-            indices = [
-                i for i in indices
-                if filter_caen in self.metadata[i].get("eligible_caen_codes", []) or len(self.metadata[i].get("eligible_caen_codes", [])) == 0
-            ]
-
-        if not indices:
-            return []
+        query_vec = np.asarray(self.embedder.embed_text(query), dtype="float32")
 
-        # slice embeddings
-        sub_embeddings = self.embeddings[indices]
+        mask, indices = self._filter(filter_type, filter_caen)
+        if not len(indices):
+            return []
+        query_vec /= np.linalg.norm(query_vec) + 1e-10
+        if self.ann is not None and not exact:
+            return self._ann_search(query_vec, top_k, mask, n_probe)
+        if self.coarse is not None and not exact:
+            return self._rerank(query_vec[None, :], indices, top_k)[0]
 
-        # cosine similarity
-        dots = sub_embeddings @ query_vec
-        norms = np.linalg.norm(sub_embeddings, axis=1) * np.linalg.norm(query_vec)
-        sims = dots / (norms + 1e-10)
+        # cosine similarity on the filtered rows
+        sims = self._rows(indices) @ query_vec
 
         # top_k on the filtered indices
         top_k = min(top_k, len(indices))
-        top_idx = np.argsort(-sims)[:top_k]
+        top_idx = np.argpartition(-sims, top_k - 1)[:top_k] if top_k < len(sims) else np.arange(len(sims))
+        top_idx = top_idx[np.argsort(-sims[top_idx])]
 
-        results = []
-        for rank_pos in top_idx:
-            original_idx = indices[rank_pos]
-            results.append({
-                **self.metadata[original_idx],
-                "score": float(sims[rank_pos]),
-                "eligible": float(sims[rank_pos]) >= 0.40
-            })
+        return [self._result(int(indices[pos]), float(sims[pos])) for pos in top_idx]
 
+    def search_many(
+        self,
+        queries: Sequence[str],
+        top_k: int = 5,
+        filters: Filters = None,
+        block_bytes: int = SEARCH_BLOCK_BYTES,
+        exact: bool = False,
+        n_probe: Optional[int] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        search() for many queries at once: embeddings in bulk, one
+        matrix-matrix product per group of queries sharing the same filters,
+        computed in blocks of at most `block_bytes` of scores, top_k per
+        query by argpartition. With an IVF index (and not exact) each query
+        probes its lists instead; with a coarse index the blocks are scored
+        on the coarse rows and each query's shortlist is rescored at full
+        width. Results are in the order of `queries`.
+        """
+        if not queries:
+            return []
+        if filters is None or isinstance(filters, dict):
+            filters = [filters] * len(queries)
+        if len(filters) != len(queries):
+            raise ValueError("filters must be one dict or one entry per query")
+
+        vectors = []
+        for start in range(0, len(queries), EMBED_BATCH):
+            vectors.extend(self.embedder.embed_texts(list(queries[start:start + EMBED_BATCH])))
+        query_matrix = np.asarray(vectors, dtype="float32")
+        query_matrix /= np.linalg.norm(query_matrix, axis=1, keepdims=True) + 1e-10
+
+        groups: Dict[Tuple[Optional[str], Optional[str]], List[int]] = {}
+        for q, f in enumerate(filters):
+            f = f or {}
+            groups.setdefault((f.get("type"), f.get("caen")), []).append(q)
+
+        results: List[List[Dict[str, Any]]] = [[] for _ in queries]
+        for (filter_type, filter_caen), query_ids in groups.items():
+            mask, indices = self._filter(filter_type, filter_caen)
+            if not len(indices):
+                continue
+            if self.ann is not None and not exact:
+                for q in query_ids:
+                    results[q] = self._ann_search(query_matrix[q], top_k, mask, n_probe)
+                continue
+            block = max(1, block_bytes // (4 * len(indices)))
+            if self.coarse is not None and not exact:
+                for start in range(0, len(query_ids), block):
+                    ids = query_ids[start:start + block]
+                    for q, hits in zip(ids, self._rerank(query_matrix[ids], indices, top_k)):
+                        results[q] = hits
+                continue
+            rows = self._rows(indices)
+            k = min(top_k, len(indices))
+
+            for start in range(0, len(query_ids), block):
+                ids = query_ids[start:start + block]
+                sims = query_matrix[ids] @ rows.T  # (block, candidates)
+                if k < sims.shape[1]:
+                    top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+                else:
+                    top = np.broadcast_to(np.arange(sims.shape[1]), (len(ids), sims.shape[1]))
+                top_sims = np.take_along_axis(sims, top, axis=1)
+                order = np.argsort(-top_sims, axis=1)
+                top = np.take_along_axis(top, order, axis=1)
+                top_sims = np.take_along_axis(top_sims, order, axis=1)
+                for row, q in enumerate(ids):
+                    results[q] = [
+                        self._result(int(indices[pos]), float(score))
+                        for pos, score in zip(top[row], top_sims[row])
+                    ]
         return results
 
+
 if __name__ == "__main__":
     store = OpportunityVectorStore()
     results = store.search(
@@ -1,39 +1,150 @@
-import openai
 import json
-import os
+from concurrent.futures import ThreadPoolExecutor
+
+from llm.caen_index import CaenIndex, normalize_code
+from llm.chunking import chunk_text, dedupe_items, estimate_tokens, items_from_response
+from rag import tracing
+from rag.llm_gateway import get_gateway, in_current_context
+
+MODEL = "gpt-4.1-mini"
+
+# Budget for the crawled text of a single request (the prompt preamble with
+# schema and CAEN reference comes on top of it).
+CHUNK_TOKENS = 12000
+CHUNK_OVERLAP_TOKENS = 400
+MAX_WORKERS = 4
+
+# How many CAEN candidates from the local index go into each prompt
+CAEN_CANDIDATES = 15
+
 
 class BaseExtractor:
-    def __init__(self, prompt_path, schema_json):
+    def __init__(self, prompt_path, schema_json, chunk_tokens=CHUNK_TOKENS,
+                 overlap_tokens=CHUNK_OVERLAP_TOKENS, max_workers=MAX_WORKERS):
         self.prompt_path = prompt_path
         self.schema_json = schema_json
-        
-        # Initialize OpenAI client
-        api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            raise RuntimeError("OPENAI_API_KEY not set (check .env)")
-        self.client = openai.OpenAI(api_key=api_key)
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.max_workers = max_workers
+
+        # Token accounting per crawled site, see extract()
+        self.usage_by_site = {}
+
+        # Shared LLM gateway (connection pool, rate limits, job budgets)
+        self.client = get_gateway()
 
         with open(prompt_path, "r") as f:
             self.prompt_template = f.read()
-        
-        project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
-        caen_file = os.path.join(project_root, "config", "caen.txt")
-        self.caen_reference = ""
-        if os.path.exists(caen_file):
-            with open(caen_file, "r", encoding="utf-8") as f:
-                self.caen_reference = f.read()
-
-    def extract(self, text):
+
+        # Local CAEN index: prompts only carry candidates for the chunk
+        # instead of the whole reference
+        self.caen_index = CaenIndex()
+
+    def build_prompt(self, text):
         prompt = self.prompt_template
         prompt = prompt.replace("{{schema}}", self.schema_json)
-        prompt = prompt.replace("{{caen_reference}}", self.caen_reference)
-        prompt = prompt + "\n\n" + text
+        prompt = prompt.replace(
+            "{{caen_reference}}", self.caen_index.candidates_block(text, CAEN_CANDIDATES)
+        )
+        return prompt + "\n\n" + text
 
+    def extract_chunk(self, text):
+        """Run one extraction request, returns (items, usage)."""
         response = self.client.chat.completions.create(
-            model="gpt-4.1-mini",
-            messages=[{"role": "user", "content": prompt}],
+            model=MODEL,
+            messages=[{"role": "user", "content": self.build_prompt(text)}],
             response_format={"type": "json_object"}
         )
 
+        usage = {"prompt_tokens": 0, "completion_tokens": 0}
+        if response.usage is not None:
+            usage["prompt_tokens"] = response.usage.prompt_tokens
+            usage["completion_tokens"] = response.usage.completion_tokens
+
         content = response.choices[0].message.content
-        return json.loads(content)  # Parse JSON before returning
+        try:
+            data = json.loads(content)
+        except (TypeError, json.JSONDecodeError) as e:
+            print(f"[EXTRACT ERROR] invalid JSON from model -> {e}")
+            data = {}
+
+        items = items_from_response(data)
+        for item in items:
+            self.validate_caen_codes(item)
+        return items, usage
+
+    def validate_caen_codes(self, item):
+        """
+        Keep the well-formed codes. Those missing from the CAEN reference
+        (config/caen.txt is not the full list) are kept too and listed in
+        unverified_caen_codes.
+        """
+        returned = item.get("eligible_caen_codes") or []
+        if not isinstance(returned, list):
+            returned = [returned]
+        valid = self.caen_index.validate(returned)
+        dropped = [c for c in returned if normalize_code(c) is None]
+        if dropped:
+            print(f"[CAEN] dropped malformed codes {dropped} for {item.get('title') or item.get('name')}")
+        item["eligible_caen_codes"] = valid
+
+        unverified = self.caen_index.unverified(valid)
+        if unverified:
+            item["unverified_caen_codes"] = unverified
+            print(f"[CAEN] codes not in the reference {unverified} for {item.get('title') or item.get('name')}")
+        else:
+            item.pop("unverified_caen_codes", None)
+
+        constraints = item.get("constraints")
+        if isinstance(constraints, dict) and isinstance(constraints.get("caen_codes"), list):
+            # hard limits quoted from the call text: keep every well-formed
+            # code, the local reference is not exhaustive
+            codes = [normalize_code(c) for c in constraints["caen_codes"]]
+            constraints["caen_codes"] = sorted({c for c in codes if c})
+        return item
+
+    def extract(self, text, site=None):
+        """
+        Extract opportunities from crawled text.
+
+        The text is split into token-budgeted, overlapping chunks which are
+        extracted concurrently; results are merged and deduplicated by
+        id/title/url. Token usage is accumulated in self.usage_by_site[site].
+        """
+        chunks = chunk_text(text, self.chunk_tokens, self.overlap_tokens)
+        if not chunks:
+            return []
+
+        with tracing.span("scrape.extract", site=site or "unknown", chunks=len(chunks)), \
+                ThreadPoolExecutor(max_workers=min(self.max_workers, len(chunks))) as pool:
+            # workers keep the caller's llm_job (priority, budget) and span
+            results = list(pool.map(in_current_context(self.extract_chunk), chunks))
+
+        items = []
+        usage = self.usage_by_site.setdefault(site or "unknown", {
+            "requests": 0,
+            "chunks": 0,
+            "text_tokens_estimate": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "items_raw": 0,
+            "items": 0,
+        })
+        for chunk_items, chunk_usage in results:
+            items.extend(chunk_items)
+            usage["requests"] += 1
+            usage["prompt_tokens"] += chunk_usage["prompt_tokens"]
+            usage["completion_tokens"] += chunk_usage["completion_tokens"]
+        usage["chunks"] += len(chunks)
+        usage["text_tokens_estimate"] += estimate_tokens(text)
+        usage["items_raw"] += len(items)
+
+        merged = dedupe_items(items)
+        usage["items"] += len(merged)
+
+        print(
+            f"[EXTRACT] {site or 'unknown'}: {len(chunks)} chunk(s), "
+            f"{len(items)} raw -> {len(merged)} unique, "
+            f"{usage['prompt_tokens']} prompt + {usage['completion_tokens']} completion tokens"
+        )
+        return merged
@@ -0,0 +1,152 @@
+import math
+import os
+import re
+import unicodedata
+from collections import Counter
+
+DEFAULT_CAEN_FILE = os.path.join(os.path.dirname(__file__), "..", "config", "caen.txt")
+
+# Romanian is heavily inflected ("construcții", "construcțiilor"...), a crude
+# prefix stem keeps the index small and matches most word forms.
+STEM_LENGTH = 6
+
+STOPWORDS = {
+    "si", "sau", "de", "din", "la", "cu", "in", "pe", "pentru", "al", "ale", "a",
+    "ai", "unor", "unei", "prin", "fara", "alte", "altor", "the", "and", "of",
+    "for", "to", "or", "with", "activitati", "other",
+}
+
+
+def normalize_text(text):
+    """Lowercase, strip diacritics (ș/ş, ț/ţ, ă, â, î) and punctuation."""
+    if not isinstance(text, str):
+        return ""
+    text = unicodedata.normalize("NFD", text.lower())
+    text = "".join(c for c in text if unicodedata.category(c) != "Mn")
+    return re.sub(r"[^a-z0-9]+", " ", text).strip()
+
+
+def tokenize(text):
+    return [
+        tok[:STEM_LENGTH]
+        for tok in normalize_text(text).split()
+        if len(tok) > 2 and tok not in STOPWORDS and not tok.isdigit()
+    ]
+
+
+def normalize_code(code):
+    """
+    '62.01', 6201, ' 6201 ' -> '6201'; divisions ('62') and groups ('62.0' ->
+    '620') are kept as they are; None if it does not look like a CAEN code.
+    """
+    digits = re.sub(r"\D", "", str(code or ""))
+    if not 2 <= len(digits) <= 4:
+        return None
+    return digits
+
+
+def load_caen_reference(path=DEFAULT_CAEN_FILE):
+    """Parse 'CODE – description' lines into an ordered {code: description} dict."""
+    codes = {}
+    if not os.path.exists(path):
+        return codes
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            match = re.match(r"\s*([\d.]+)\s*[–—-]\s*(.+)", line)
+            if not match:
+                continue
+            code = normalize_code(match.group(1))
+            if code and code not in codes:
+                codes[code] = match.group(2).strip()
+    return codes
+
+
+class CaenIndex:
+    """
+    Local TF-IDF index over the CAEN reference.
+
+    Proposes candidate codes for a piece of opportunity text so prompts only
+    carry a short list instead of the whole reference, and validates codes
+    returned by the LLM (malformed codes are dropped, codes the reference
+    does not list are only flagged).
+    """
+
+    def __init__(self, path=DEFAULT_CAEN_FILE):
+        self.codes = load_caen_reference(path)
+
+        docs = {code: Counter(tokenize(desc)) for code, desc in self.codes.items()}
+        df = Counter()
+        for counts in docs.values():
+            df.update(counts.keys())
+        n_docs = max(len(docs), 1)
+        self.idf = {term: math.log((1 + n_docs) / (1 + n)) + 1 for term, n in df.items()}
+
+        self.vectors = {}
+        for code, counts in docs.items():
+            vec = {term: tf * self.idf[term] for term, tf in counts.items()}
+            norm = math.sqrt(sum(w * w for w in vec.values())) or 1.0
+            self.vectors[code] = {term: w / norm for term, w in vec.items()}
+
+        # inverted index term -> [(code, weight)] so scoring only touches
+        # codes sharing at least one term with the text
+        self.postings = {}
+        for code, vec in self.vectors.items():
+            for term, w in vec.items():
+                self.postings.setdefault(term, []).append((code, w))
+
+    def __len__(self):
+        return len(self.codes)
+
+    def explicit_codes(self, text):
+        """Codes literally mentioned in the text, e.g. 'CAEN 6201' or '62.01'."""
+        found = []
+        # only look right after a "CAEN" mention, bare 4-digit numbers are
+        # mostly years and amounts
+        for window in re.findall(r"caen(.{0,80})", text or "", flags=re.IGNORECASE | re.DOTALL):
+            for raw in re.findall(r"\b\d{2}\.?\d{2}\b", window):
+                code = normalize_code(raw)
+                if code in self.codes and code not in found:
+                    found.append(code)
+        return found
+
+    def suggest(self, text, top_n=15):
+        """Return [(code, description, score)] best matching the text."""
+        counts = Counter(t for t in tokenize(text) if t in self.idf)
+        scores = Counter()
+        if counts:
+            query = {term: tf * self.idf[term] for term, tf in counts.items()}
+            norm = math.sqrt(sum(w * w for w in query.values())) or 1.0
+            for term, qw in query.items():
+                for code, w in self.postings.get(term, []):
+                    scores[code] += qw / norm * w
+
+        for code in self.explicit_codes(text):
+            scores[code] += 1.0
+
+        ranked = [(code, score) for code, score in scores.most_common() if score > 0]
+        return [(code, self.codes[code], round(score, 4)) for code, score in ranked[:top_n]]
+
+    def candidates_block(self, text, top_n=15):
+        """Prompt-ready 'CODE – description' lines for the best candidates."""
+        if len(self.codes) <= top_n:
+            pairs = list(self.codes.items())
+        else:
+            pairs = [(code, desc) for code, desc, _ in self.suggest(text, top_n)]
+        return "\n".join(f"{code} – {desc}" for code, desc in pairs)
+
+    def validate(self, codes):
+        """
+        Normalise LLM-returned codes and drop the malformed ones. Codes
+        missing from the reference are kept, it is not the full CAEN list
+        (see unverified()).
+        """
+        valid = []
+        for code in codes or []:
+            code = normalize_code(code)
+            if code and code not in valid:
+                valid.append(code)
+        return valid
+
+    def unverified(self, codes):
+        """Well-formed codes the reference does not list."""
+        return [code for code in self.validate(codes) if self.codes and code not in self.codes]
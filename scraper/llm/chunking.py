@@ -0,0 +1,172 @@
+import json
+import re
+
+# Rough average for mixed Romanian/English web text with the cl100k/o200k
+# tokenizers; good enough for budgeting, real usage comes from the API.
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    if not text:
+        return 0
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def _split_oversized(paragraph, max_tokens):
+    """Split a single paragraph that does not fit the budget on word boundaries."""
+    words = paragraph.split()
+    pieces = []
+    current = []
+    current_tokens = 0
+    for word in words:
+        word_tokens = estimate_tokens(word) + 1
+        if current and current_tokens + word_tokens > max_tokens:
+            pieces.append(" ".join(current))
+            current = []
+            current_tokens = 0
+        current.append(word)
+        current_tokens += word_tokens
+    if current:
+        pieces.append(" ".join(current))
+    return pieces
+
+
+def _tail(text, overlap_tokens):
+    """Last ~overlap_tokens worth of text, cut on a word boundary."""
+    if overlap_tokens <= 0:
+        return ""
+    max_chars = overlap_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    tail = text[-max_chars:]
+    space = tail.find(" ")
+    return tail[space + 1:] if space != -1 else tail
+
+
+def chunk_text(text, max_tokens, overlap_tokens=0):
+    """
+    Split crawled text into chunks of at most ~max_tokens.
+
+    Pages/paragraphs (blank-line separated, as produced by
+    SiteCrawler.get_text) are packed greedily; each chunk after the first
+    starts with the tail of the previous one so that an opportunity cut at a
+    boundary is still seen whole by at least one request.
+    """
+    if max_tokens <= 0:
+        raise ValueError("max_tokens must be positive")
+    overlap_tokens = min(overlap_tokens, max_tokens // 2)
+
+    paragraphs = []
+    for para in re.split(r"\n\s*\n", text or ""):
+        para = para.strip()
+        if not para:
+            continue
+        if estimate_tokens(para) > max_tokens - overlap_tokens:
+            paragraphs.extend(_split_oversized(para, max_tokens - overlap_tokens))
+        else:
+            paragraphs.append(para)
+
+    chunks = []
+    current = []
+    current_tokens = 0
+    for para in paragraphs:
+        para_tokens = estimate_tokens(para)
+        if current and current_tokens + para_tokens > max_tokens:
+            chunk = "\n\n".join(current)
+            chunks.append(chunk)
+            overlap = _tail(chunk, overlap_tokens)
+            current = [overlap] if overlap else []
+            current_tokens = estimate_tokens(overlap)
+        current.append(para)
+        current_tokens += para_tokens
+    if current:
+        chunks.append("\n\n".join(current))
+
+    return chunks
+
+
+def _is_empty(value):
+    return value is None or value == "" or value == [] or value == {}
+
+
+def _norm(value):
+    if not isinstance(value, str):
+        return ""
+    return re.sub(r"\s+", " ", value).strip().lower()
+
+
+def _item_keys(item):
+    keys = []
+    if _norm(item.get("id")):
+        keys.append("id:" + _norm(item.get("id")))
+    title = _norm(item.get("title") or item.get("name"))
+    if title:
+        keys.append("title:" + title)
+    elif _norm(item.get("source_url")):
+        # A bare portal URL is shared by many calls, only use it when
+        # there is nothing better to identify the item with.
+        keys.append("url:" + _norm(item.get("source_url")))
+    return keys
+
+
+def _merge_lists(a, b):
+    merged = list(a)
+    seen = {json.dumps(x, sort_keys=True, ensure_ascii=False) for x in a}
+    for x in b:
+        key = json.dumps(x, sort_keys=True, ensure_ascii=False)
+        if key not in seen:
+            seen.add(key)
+            merged.append(x)
+    return merged
+
+
+def merge_items(target, other):
+    """Fill the gaps of `target` with data from a duplicate extraction."""
+    for key, value in other.items():
+        current = target.get(key)
+        if _is_empty(current):
+            target[key] = value
+        elif isinstance(current, list) and isinstance(value, list):
+            target[key] = _merge_lists(current, value)
+        elif key in ("raw_text", "summary") and isinstance(value, str) and len(value) > len(current):
+            target[key] = value
+    return target
+
+
+def items_from_response(data):
+    """
+    Normalise an extraction response to a list of opportunity dicts.
+
+    The model answers with a JSON object which is either a single
+    opportunity or a wrapper such as {"grants": [...]}.
+    """
+    if isinstance(data, list):
+        return [x for x in data if isinstance(x, dict)]
+    if not isinstance(data, dict):
+        return []
+    if "id" in data or "title" in data or "name" in data:
+        return [data]
+    items = []
+    for value in data.values():
+        if isinstance(value, list):
+            items.extend(x for x in value if isinstance(x, dict))
+        elif isinstance(value, dict):
+            items.extend(items_from_response(value))
+    return items
+
+
+def dedupe_items(items):
+    """Merge opportunities extracted more than once (overlapping chunks, repeated pages)."""
+    merged = []
+    index = {}
+    for item in items:
+        keys = _item_keys(item)
+        slot = next((index[k] for k in keys if k in index), None)
+        if slot is None:
+            slot = len(merged)
+            merged.append(dict(item))
+        else:
+            merge_items(merged[slot], item)
+        for k in _item_keys(merged[slot]) + keys:
+            index.setdefault(k, slot)
+    return merged
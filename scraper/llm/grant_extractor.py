@@ -25,6 +25,18 @@ GRANT_SCHEMA = json.dumps({
   "raw_text": "string",
 
   "eligibility_criteria": ["string"],
+  "constraints": {
+    "caen_codes": ["string"],
+    "regions": ["string"],
+    "min_employees": "number | null",
+    "max_employees": "number | null",
+    "min_turnover": "number | null",
+    "max_turnover": "number | null",
+    "turnover_currency": "string | null",
+    "min_company_age_years": "number | null",
+    "max_company_age_years": "number | null"
+  },
+
   "required_documents": ["string"],
 
   "required_documents_full": [
@@ -1,21 +1,38 @@
 import json
 from scraper.crawler import SiteCrawler
 from llm.acc_extractor import AcceleratorExtractor
-from utils.file_saver import save_json
+from utils.file_saver import compact_store, save_json, save_usage
+from rag import tracing
+from rag.llm_gateway import BudgetExceeded
 
 def run_accelerators():
     with open("config/websites_acc.json") as f:
         sites = json.load(f)
 
     extractor = AcceleratorExtractor()
+    completed = True
 
     for site in sites:
         print(f"=== ACCELERATORS: Crawling {site['name']} ===")
 
-        crawler = SiteCrawler(site["domain"], site["start_url"])
-        crawler.crawl()
+        with tracing.span("scrape.site", kind="accelerators", site=site["name"]):
+            crawler = SiteCrawler(site["domain"], site["start_url"])
+            crawler.crawl()
 
-        text = crawler.get_text()
-        accelerators = extractor.extract(text)
+            text = crawler.get_text()
+            try:
+                accelerators = extractor.extract(text, site=site["name"])
+            except BudgetExceeded as e:
+                # the rest of the run is over budget too; the store is still
+                # compacted and the usage written below
+                print(f"[BUDGET] {e}: stopping at {site['name']}, remaining sites skipped")
+                completed = False
+                break
 
-        save_json("output/accelerators/", accelerators)
+            with tracing.span("scrape.save", site=site["name"], items=len(accelerators)):
+                save_json("output/accelerators/", accelerators)
+
+    with tracing.span("scrape.save", kind="accelerators", compact=True):
+        compact_store("output/accelerators/")
+    save_usage("output/usage/", "accelerators", extractor.usage_by_site)
+    return completed
@@ -1,21 +1,38 @@
 import json
 from scraper.crawler import SiteCrawler
 from llm.grant_extractor import GrantExtractor
-from utils.file_saver import save_json
+from utils.file_saver import compact_store, save_json, save_usage
+from rag import tracing
+from rag.llm_gateway import BudgetExceeded
 
 def run_grants():
     with open("config/websites_grants.json") as f:
         sites = json.load(f)
 
     extractor = GrantExtractor()
+    completed = True
 
     for site in sites:
         print(f"=== GRANTS: Crawling {site['name']} ===")
 
-        crawler = SiteCrawler(site["domain"], site["start_url"])
-        crawler.crawl()
+        with tracing.span("scrape.site", kind="grants", site=site["name"]):
+            crawler = SiteCrawler(site["domain"], site["start_url"])
+            crawler.crawl()
 
-        text = crawler.get_text()
-        grants = extractor.extract(text)
+            text = crawler.get_text()
+            try:
+                grants = extractor.extract(text, site=site["name"])
+            except BudgetExceeded as e:
+                # the rest of the run is over budget too; the store is still
+                # compacted and the usage written below
+                print(f"[BUDGET] {e}: stopping at {site['name']}, remaining sites skipped")
+                completed = False
+                break
 
-        save_json("output/grants/", grants)
+            with tracing.span("scrape.save", site=site["name"], items=len(grants)):
+                save_json("output/grants/", grants)
+
+    with tracing.span("scrape.save", kind="grants", compact=True):
+        compact_store("output/grants/")
+    save_usage("output/usage/", "grants", extractor.usage_by_site)
+    return completed
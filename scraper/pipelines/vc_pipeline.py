@@ -1,21 +1,38 @@
 import json
 from scraper.crawler import SiteCrawler
 from llm.vc_extractor import VCExtractor
-from utils.file_saver import save_json
+from utils.file_saver import compact_store, save_json, save_usage
+from rag import tracing
+from rag.llm_gateway import BudgetExceeded
 
 def run_vc():
     with open("config/websites_vc.json") as f:
         sites = json.load(f)
 
     extractor = VCExtractor()
+    completed = True
 
     for site in sites:
         print(f"=== VC: Crawling {site['name']} ===")
 
-        crawler = SiteCrawler(site["domain"], site["start_url"])
-        crawler.crawl()
+        with tracing.span("scrape.site", kind="vcs", site=site["name"]):
+            crawler = SiteCrawler(site["domain"], site["start_url"])
+            crawler.crawl()
 
-        text = crawler.get_text()
-        vcs = extractor.extract(text)
+            text = crawler.get_text()
+            try:
+                vcs = extractor.extract(text, site=site["name"])
+            except BudgetExceeded as e:
+                # the rest of the run is over budget too; the store is still
+                # compacted and the usage written below
+                print(f"[BUDGET] {e}: stopping at {site['name']}, remaining sites skipped")
+                completed = False
+                break
 
-        save_json("output/vcs/", vcs)
+            with tracing.span("scrape.save", site=site["name"], items=len(vcs)):
+                save_json("output/vcs/", vcs)
+
+    with tracing.span("scrape.save", kind="vcs", compact=True):
+        compact_store("output/vcs/")
+    save_usage("output/usage/", "vcs", extractor.usage_by_site)
+    return completed
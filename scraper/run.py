@@ -1,4 +1,8 @@
+import argparse
 import os
+import sys
+from contextlib import nullcontext
+from datetime import datetime
 from dotenv import load_dotenv
 
 # Load .env from the scraper directory
@@ -6,11 +10,30 @@ SCRAPER_DIR = os.path.dirname(__file__)
 ROOT_DIR = os.path.dirname(SCRAPER_DIR)
 load_dotenv(os.path.join(ROOT_DIR, ".env"))
 
-from pipelines.grants_pipeline import run_grants
-from pipelines.acc_pipeline import run_accelerators
-from pipelines.vc_pipeline import run_vc
+# the extractors call the LLM through rag.llm_gateway
+sys.path.append(ROOT_DIR)
+
+from pipelines.grants_pipeline import run_grants  # noqa: E402
+from pipelines.acc_pipeline import run_accelerators  # noqa: E402
+from pipelines.vc_pipeline import run_vc  # noqa: E402
+from rag import tracing  # noqa: E402
+from rag.llm_gateway import BATCH, llm_job  # noqa: E402
+from rag.profiling import Profiler  # noqa: E402
 
 if __name__ == "__main__":
-    run_grants()
-    run_accelerators()
-    run_vc()
+    parser = argparse.ArgumentParser(description="Scraping + extragere LLM pentru granturi, acceleratoare și VC.")
+    parser.add_argument("--token-budget", type=int, default=None,
+                        help="Numărul maxim de tokeni LLM pentru această rulare.")
+    parser.add_argument("--profile", action="store_true",
+                        help="Profilează rularea (timp pe etape, rețea vs. calcul, flamegraph) în outputs/profiles/.")
+    args = parser.parse_args()
+
+    job = f"scrape-{datetime.now():%Y%m%d-%H%M%S}"
+    profiler = Profiler(job) if args.profile else nullcontext()
+    # background work: leaves rate-limit headroom to the frontend
+    with profiler, tracing.span("scrape.run"), llm_job(job, priority=BATCH, max_tokens=args.token_budget):
+        # each pipeline returns False once the token budget ran out
+        for pipeline in (run_grants, run_accelerators, run_vc):
+            if not pipeline():
+                print(f"[BUDGET] token budget of {job} exhausted, remaining pipelines skipped")
+                break
@@ -8,6 +8,8 @@ from io import BytesIO
 import requests
 import time
 
+from rag import tracing
+
 
 class SiteCrawler:
     def __init__(self, domain, start_url, driver=None, headless=True):
@@ -54,8 +56,9 @@ class SiteCrawler:
 
     def fetch_pdf_and_extract(self, url):
         try:
-            res = self.session.get(url, timeout=15)
-            res.raise_for_status()
+            with tracing.span("scrape.fetch", url=url, kind="pdf"):
+                res = self.session.get(url, timeout=15)
+                res.raise_for_status()
         except Exception as e:
             print(f"[PDF REQUEST ERROR] {url} -> {e}")
             return
@@ -89,10 +92,11 @@ class SiteCrawler:
 
         # Use Selenium to render JS and get final page source
         try:
-            self.driver.get(url)
-            # crude wait for JS/XHRs; tune or replace with WebDriverWait if needed
-            time.sleep(3)
-            html = self.driver.page_source
+            with tracing.span("scrape.fetch", url=url, kind="page"):
+                self.driver.get(url)
+                # crude wait for JS/XHRs; tune or replace with WebDriverWait if needed
+                time.sleep(3)
+                html = self.driver.page_source
         except TimeoutException:
             print(f"[TIMEOUT] {url}")
             return
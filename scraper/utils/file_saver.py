@@ -1,6 +1,102 @@
 import os
 import json
-import uuid
+import re
+import hashlib
+import unicodedata
+from datetime import date, datetime, timezone
+
+from rag.deadlines import closing_date
+
+# Bookkeeping fields added by the store, ignored when comparing content
+STORE_FIELDS = ("id", "extracted_id", "first_seen", "last_seen", "changed_at", "content_hash")
+
+STABLE_ID_RE = re.compile(r"^[0-9a-f]{16}$")
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def _norm(value):
+    if not isinstance(value, str):
+        return ""
+    value = unicodedata.normalize("NFD", value.lower())
+    value = "".join(c for c in value if unicodedata.category(c) != "Mn")
+    return re.sub(r"[^a-z0-9]+", " ", value).strip()
+
+
+def _norm_url(url):
+    if not isinstance(url, str):
+        return ""
+    url = url.strip().lower()
+    url = re.sub(r"^https?://(www\.)?", "", url)
+    return url.rstrip("/")
+
+
+def stable_id(item):
+    """Deterministic id from source URL + title, identical across scraper runs."""
+    title = _norm(item.get("title") or item.get("name") or item.get("program_name"))
+    key = f"{_norm_url(item.get('source_url'))}|{title}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+
+def content_hash(item):
+    payload = {k: v for k, v in item.items() if k not in STORE_FIELDS}
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _write_atomic(path, item):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(item, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def _read(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def upsert(output_dir, item, seen_at=None):
+    """
+    Store one opportunity as <stable_id>.json.
+
+    New records get first_seen/last_seen/changed_at; an existing record only
+    has last_seen bumped unless its content changed. Returns
+    "added", "changed" or "unchanged".
+    """
+    seen_at = seen_at or _now()
+    item = dict(item)
+    new_id = stable_id(item)
+    if item.get("id") and item["id"] != new_id and not item.get("extracted_id"):
+        item["extracted_id"] = item["id"]
+    item["id"] = new_id
+    item["content_hash"] = content_hash(item)
+
+    path = os.path.join(output_dir, f"{new_id}.json")
+    previous = _read(path) if os.path.exists(path) else None
+
+    if previous is None:
+        item["first_seen"] = seen_at
+        item["changed_at"] = seen_at
+        status = "added"
+    else:
+        item["first_seen"] = previous.get("first_seen") or seen_at
+        if previous.get("content_hash", content_hash(previous)) == item["content_hash"]:
+            item = previous
+            status = "unchanged"
+        else:
+            item["changed_at"] = seen_at
+            status = "changed"
+    item["last_seen"] = seen_at
+
+    _write_atomic(path, item)
+    return status
+
 
 def save_json(output_dir, data_list):
     os.makedirs(output_dir, exist_ok=True)
@@ -8,11 +104,57 @@ def save_json(output_dir, data_list):
     if isinstance(data_list, dict):
         data_list = [data_list]
 
+    seen_at = _now()
     for item in data_list:
-        filename = f"{uuid.uuid4()}.json"
+        status = upsert(output_dir, item, seen_at)
+        print(f"[SAVED] {os.path.join(output_dir, stable_id(item) + '.json')} ({status})")
+
+
+def compact_store(output_dir, today=None):
+    """
+    Housekeeping for an upsert store directory:
+      - folds legacy <uuid4>.json files from older runs into stable records
+      - removes calls whose last deadline has passed
+    """
+    if not os.path.isdir(output_dir):
+        return {"migrated": 0, "expired": 0}
+
+    today = today or date.today()
+    migrated = 0
+    expired = 0
+
+    for filename in sorted(os.listdir(output_dir)):
+        if not filename.endswith(".json"):
+            continue
         path = os.path.join(output_dir, filename)
+        item = _read(path)
+        if not isinstance(item, dict):
+            continue
+
+        if not STABLE_ID_RE.match(filename[:-len(".json")]):
+            upsert(output_dir, item)
+            os.remove(path)
+            migrated += 1
+            item = _read(os.path.join(output_dir, f"{stable_id(item)}.json")) or item
+            path = os.path.join(output_dir, f"{stable_id(item)}.json")
+
+        closes = closing_date(item)
+        if closes and closes < today and os.path.exists(path):
+            os.remove(path)
+            expired += 1
+            print(f"[EXPIRED] {path} (closed {closes.isoformat()})")
+
+    if migrated or expired:
+        print(f"[STORE] {output_dir}: migrated {migrated} legacy file(s), removed {expired} expired")
+    return {"migrated": migrated, "expired": expired}
+
+
+def save_usage(output_dir, kind, usage_by_site):
+    """Write per-site extraction token accounting for one pipeline run."""
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, f"{kind}.json")
 
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(item, f, indent=2, ensure_ascii=False)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(usage_by_site, f, indent=2, ensure_ascii=False)
 
-        print(f"[SAVED] {path}")
+    print(f"[USAGE] {path}")